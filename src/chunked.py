@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+# Copyright 2016 - 2019 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+import tempfile
+import numpy as np
+import hypercomplex as hc
+
+#########################################################################
+# Processing of data in chunks along the axes that are not processed,
+# so that only a part of the data has to be in memory at the same time.
+
+CHUNKSIZE = None # Default maximum size of a chunk in bytes, None to process all data at once
+TODISK = False # Write the results of chunked processing to a temporary file
+TEMPDIR = None # Directory for the temporary files, None for the system default
+
+
+def setChunking(chunkSize, toDisk=False, tempDir=None):
+    global CHUNKSIZE, TODISK, TEMPDIR
+    if chunkSize is not None and chunkSize <= 0:
+        chunkSize = None
+    CHUNKSIZE = chunkSize
+    TODISK = bool(toDisk)
+    TEMPDIR = tempDir
+
+
+def dataBytes(data):
+    return int(np.prod(data.shape())) * len(data.hyper) * data.dtype().itemsize
+
+
+def needsChunks(data, axes, chunkSize):
+    if chunkSize is None:
+        return False
+    if len(axes) >= data.ndim():
+        return False
+    axes = [axis % data.ndim() for axis in axes]
+    if np.prod([n for i, n in enumerate(data.shape()) if i not in axes]) <= 1:
+        return False # A single trace cannot be split, even if it is larger than chunkSize
+    return dataBytes(data) > chunkSize
+
+
+def chunkSlices(shape, axes, chunkSize):
+    # Yields the keys of the chunks, each chunk contains at most chunkSize elements
+    # but always contains at least one full trace along the axes
+    axes = [axis % len(shape) for axis in axes]
+    free = [i for i in range(len(shape)) if i not in axes]
+    inner = int(np.prod([shape[i] for i in axes]))
+    split = len(free)
+    while split > 0 and inner * shape[free[split - 1]] <= chunkSize:
+        split -= 1
+        inner *= shape[free[split]]
+    if split == 0:
+        yield (slice(None), ) * len(shape)
+        return
+    splitAxis = free[split - 1]
+    loopAxes = free[:split - 1]
+    step = max(1, chunkSize // inner)
+    loopShape = [shape[i] for i in loopAxes]
+    for index in np.ndindex(*loopShape):
+        for start in range(0, shape[splitAxis], step):
+            key = [slice(None)] * len(shape)
+            for i, axis in enumerate(loopAxes):
+                key[axis] = slice(index[i], index[i] + 1)
+            key[splitAxis] = slice(start, start + step)
+            yield tuple(key)
+
+
+def emptyData(shape, hyper, dtype, toDisk=False):
+    fullShape = (len(hyper), ) + tuple(shape)
+    if toDisk:
+        # The temporary file is removed by the system once the data is no longer used
+        tmpData = np.memmap(tempfile.TemporaryFile(prefix='ssnake_', dir=TEMPDIR), dtype=dtype, mode='w+', shape=fullShape)
+    else:
+        tmpData = np.empty(fullShape, dtype=dtype)
+    out = hc.HComplexData()
+    out.data = tmpData
+    out.hyper = np.copy(hyper)
+    return out
+
+
+def applyChunked(data, func, axes, chunkSize, toDisk=False, inPlace=True):
+    # Calls func on every chunk of data, func should return the processed chunk as HComplexData.
+    # The result is written into data itself when inPlace is set and the data is in memory,
+    # otherwise a new (disk backed if toDisk) HComplexData is returned.
+    shape = data.shape()
+    axes = [axis % len(shape) for axis in axes]
+    itemBytes = len(data.hyper) * data.dtype().itemsize
+    out = None
+    for key in chunkSlices(shape, axes, max(1, chunkSize // itemBytes)):
+        result = func(data[key])
+        if out is None:
+            # The length along the processed axes can be changed by func
+            outShape = [result.shape()[i] if i in axes else n for i, n in enumerate(shape)]
+            if inPlace and not toDisk and not data.isLazy() and np.array_equal(result.hyper, data.hyper) and result.data.dtype == data.data.dtype and tuple(outShape) == tuple(shape):
+                out = data
+            else:
+                out = emptyData(outShape, result.hyper, result.data.dtype, toDisk)
+        if np.array_equal(out.hyper, result.hyper):
+            out.data[(slice(None), ) + key] = result.data
+        else:
+            out[key] = result
+    return out
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+
+# Copyright 2016 - 2019 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import time
+import sqlite3
+from multiprocessing.pool import ThreadPool
+import specIO as io
+
+#########################################################################
+# A persistent index of the datasets in directory trees, stored in an
+# SQLite database. The directories are walked by a pool of threads, and
+# the datasets are identified with specIO.probe, which only reads headers.
+# Datasets of which only the format is known are stored without a shape.
+# When the index is updated, the listing of a directory of which the
+# modification time did not change is taken from the index, and datasets
+# are only probed again when their data file has changed.
+
+INDEXFILE = os.path.join(os.path.expanduser('~'), '.ssNakeIndex.sqlite') # Default location of the index
+WALKTHREADS = 16 # Number of threads that walk the directories, the walk is limited by the file system and not by the cpu
+FILEEXTENSIONS = ('.json', '.mat', '.jdf', '.dx', '.jdx', '.jcamp', '.sig', '.ima', '.1r', '.mrc', '.ssnake',
+                  '.fid', '.spe', '.ft', '.ft1', '.ft2', '.ft3', '.ft4') # Files that are probed, directories are always probed
+COLUMNS = ['path', 'directory', 'format', 'dataPath', 'shape', 'ndim', 'nucleus', 'pulseProgram',
+           'scans', 'acquisitionTime', 'completed', 'freq', 'mtime']
+
+
+class IndexException(Exception):
+    pass
+
+
+def getMtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def probeDataset(path, directory):
+    # Returns the row of the index for a dataset found in directory, or None if path is not a dataset
+    try:
+        info = io.probe(path, allowLoad=False)
+    except Exception:
+        return None
+    if info is None or (info['shape'] is None and info['format'] == 'ASCII'): # Files that are not recognised are read as ASCII
+        return None
+    metaData = info['metaData']
+    freq = None
+    if info['freq']:
+        freq = info['freq'][-1]
+    shape = ndim = None
+    if info['shape'] is not None:
+        shape = json.dumps(list(info['shape']))
+        ndim = len(info['shape'])
+    return {'path': path,
+            'directory': directory,
+            'format': info['format'],
+            'dataPath': info['filePath'],
+            'shape': shape,
+            'ndim': ndim,
+            'nucleus': info['nucleus'],
+            'pulseProgram': metaData.get('Experiment Name'),
+            'scans': metaData.get('# Scans'),
+            'acquisitionTime': metaData.get('Acquisition Time [s]'),
+            'completed': metaData.get('Time Completed'),
+            'freq': freq,
+            'mtime': getMtime(info['filePath'])}
+
+
+def scanDirectory(path, known, datasets, seen):
+    # Runs in the walking threads. known is the (mtime, children, files) of the directory
+    # in the index, or None, and datasets maps the dataset paths in the index to their
+    # (dataPath, mtime). Returns the (st_dev, st_ino) of the directory, the new directory entry,
+    # the datasets that are still present and the rows of the datasets that have to be probed again.
+    # Returns None if the directory no longer exists, or if its (st_dev, st_ino) is in seen.
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    identity = (stat.st_dev, stat.st_ino)
+    if identity in seen: # Already visited through a symbolic link
+        return None
+    mtime = stat.st_mtime
+    if known is not None and known[0] == mtime:
+        changed = False
+        children, files = known[1], known[2]
+    else:
+        changed = True
+        children = []
+        files = []
+        try:
+            names = sorted(os.listdir(path))
+        except OSError:
+            names = []
+        for name in names:
+            fullName = os.path.join(path, name)
+            if os.path.isdir(fullName):
+                children.append(name)
+            elif name.lower().endswith(FILEEXTENSIONS):
+                files.append(name)
+    present = []
+    rows = []
+    for candidate in [path] + [os.path.join(path, name) for name in files]:
+        stored = datasets.get(candidate)
+        if stored is not None and getMtime(stored[0]) == stored[1]:
+            present.append(candidate)
+            continue
+        if stored is None and not changed:
+            continue # The directory did not change, so this was already found not to be a dataset
+        row = probeDataset(candidate, path)
+        if row is not None:
+            present.append(candidate)
+            rows.append(row)
+    return identity, (path, mtime, children, files), present, rows
+
+
+class DatasetIndex(object):
+
+    def __init__(self, fileName=None):
+        if fileName is None:
+            fileName = INDEXFILE
+        self.fileName = fileName
+        self.connection = sqlite3.connect(fileName)
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, updated REAL);
+            CREATE TABLE IF NOT EXISTS directories (path TEXT PRIMARY KEY, mtime REAL, children TEXT, files TEXT);
+            CREATE TABLE IF NOT EXISTS datasets (path TEXT PRIMARY KEY, directory TEXT, format TEXT, dataPath TEXT,
+                                                 shape TEXT, ndim INTEGER, nucleus TEXT, pulseProgram TEXT, scans TEXT,
+                                                 acquisitionTime TEXT, completed TEXT, freq REAL, mtime REAL);
+            CREATE INDEX IF NOT EXISTS datasetsDirectory ON datasets (directory);
+            """)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def roots(self):
+        return [row[0] for row in self.connection.execute('SELECT path FROM roots ORDER BY path')]
+
+    def underRoot(self, table, root):
+        # Rows of table for root and everything below it
+        prefix = os.path.join(root, '')
+        return self.connection.execute('SELECT * FROM ' + table + ' WHERE path = ? OR substr(path, 1, ?) = ?', (root, len(prefix), prefix))
+
+    def update(self, root, progress=None, threads=None):
+        """ Walks the directory tree below root and updates the index.
+            progress(numDirectories, numDatasets) is called after every level of directories.
+            Returns the number of datasets below root. """
+        root = os.path.abspath(root)
+        if not os.path.isdir(root):
+            raise IndexException('Not a directory: ' + root)
+        if threads is None:
+            threads = WALKTHREADS
+        known = dict()
+        for path, mtime, children, files in self.underRoot('directories', root):
+            known[path] = (mtime, json.loads(children), json.loads(files))
+        datasets = dict()
+        for row in self.underRoot('datasets', root):
+            datasets.setdefault(row[1], dict())[row[0]] = (row[3], row[12])
+        visited = set()
+        seen = set() # The (st_dev, st_ino) of the visited directories, as symbolic links can form loops
+        found = set()
+        pool = ThreadPool(max(1, threads))
+        try:
+            level = [root]
+            while level:
+                results = pool.map(lambda path: scanDirectory(path, known.get(path), datasets.get(path, dict()), seen), level)
+                level = []
+                with self.connection:
+                    for result in results:
+                        if result is None:
+                            continue
+                        identity, (path, mtime, children, files), present, rows = result
+                        if identity in seen: # Reached twice in the same level
+                            continue
+                        seen.add(identity)
+                        visited.add(path)
+                        found.update(present)
+                        level += [os.path.join(path, name) for name in children]
+                        if known.get(path) != (mtime, children, files):
+                            self.connection.execute('INSERT OR REPLACE INTO directories VALUES (?, ?, ?, ?)', (path, mtime, json.dumps(children), json.dumps(files)))
+                        self.connection.executemany('INSERT OR REPLACE INTO datasets VALUES (' + ', '.join(['?'] * len(COLUMNS)) + ')',
+                                                    [[row[key] for key in COLUMNS] for row in rows])
+                if progress is not None:
+                    progress(len(visited), len(found))
+        finally:
+            pool.close()
+            pool.join()
+        with self.connection:
+            # Remove what no longer exists
+            self.connection.executemany('DELETE FROM directories WHERE path = ?', [(path, ) for path in known if path not in visited])
+            self.connection.executemany('DELETE FROM datasets WHERE path = ?', [(path, ) for paths in datasets.values() for path in paths if path not in found])
+            self.connection.execute('INSERT OR REPLACE INTO roots VALUES (?, ?)', (root, time.time()))
+        return len(found)
+
+    def updateAll(self, progress=None, threads=None):
+        for root in self.roots():
+            if os.path.isdir(root):
+                self.update(root, progress, threads)
+
+    def remove(self, root):
+        root = os.path.abspath(root)
+        prefix = os.path.join(root, '')
+        with self.connection:
+            for table in ['directories', 'datasets']:
+                self.connection.execute('DELETE FROM ' + table + ' WHERE path = ? OR substr(path, 1, ?) = ?', (root, len(prefix), prefix))
+            self.connection.execute('DELETE FROM roots WHERE path = ?', (root, ))
+
+    def search(self, text='', root=None, fileFormat=None, nucleus=None, ndim=None, limit=None):
+        """ Returns the datasets of which the path, format, nucleus or pulse program contain
+            all words of text, as a list of dictionaries. The shape is None if it is not known. """
+        query = 'SELECT * FROM datasets WHERE 1'
+        args = []
+        for word in text.split():
+            word = '%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            query += " AND (path LIKE ? ESCAPE '\\' OR format LIKE ? ESCAPE '\\' OR nucleus LIKE ? ESCAPE '\\' OR pulseProgram LIKE ? ESCAPE '\\')"
+            args += [word] * 4
+        if root is not None:
+            prefix = os.path.join(os.path.abspath(root), '')
+            query += ' AND substr(path, 1, ?) = ?'
+            args += [len(prefix), prefix]
+        if fileFormat is not None:
+            query += ' AND format = ?'
+            args.append(fileFormat)
+        if nucleus is not None:
+            query += ' AND nucleus = ?'
+            args.append(nucleus)
+        if ndim is not None:
+            query += ' AND ndim = ?'
+            args.append(ndim)
+        query += ' ORDER BY path'
+        if limit is not None:
+            query += ' LIMIT ?'
+            args.append(int(limit))
+        results = []
+        for row in self.connection.execute(query, args):
+            result = dict(zip(COLUMNS, row))
+            if result['shape'] is not None:
+                result['shape'] = tuple(json.loads(result['shape']))
+            results.append(result)
+        return results
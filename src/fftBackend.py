@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+# Copyright 2016 - 2019 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+import multiprocessing
+from collections import OrderedDict
+import numpy as np
+try:
+    import scipy.fft as scipyFft
+except ImportError:
+    scipyFft = None
+try:
+    import pyfftw
+except ImportError:
+    pyfftw = None
+
+#########################################################################
+# Fourier transform backends
+# All routines work along a single axis and give the same results as np.fft.
+# fft(..., shift=True) is equal to fftshift(fft(...)), and
+# ifft(..., shift=True) is equal to ifft(ifftshift(...)).
+
+BACKENDLIST = ['numpy']
+if scipyFft is not None:
+    BACKENDLIST.append('scipy')
+if pyfftw is not None:
+    BACKENDLIST.append('pyfftw')
+
+MAXPLANS = 32 # Number of pyfftw plans that are kept
+
+DEFAULTBACKEND = 'scipy' if scipyFft is not None else 'numpy'
+
+backend = DEFAULTBACKEND
+workers = -1 # Number of threads, -1 uses all cpu cores
+planCache = OrderedDict()
+shiftCache = OrderedDict()
+
+
+class FftBackendException(Exception):
+    pass
+
+
+def setBackend(name):
+    global backend
+    if name not in BACKENDLIST:
+        raise FftBackendException("FFT backend '" + str(name) + "' is not available")
+    backend = name
+    planCache.clear()
+
+
+def getBackend():
+    return backend
+
+
+def setWorkers(num):
+    global workers
+    num = int(num)
+    if num == 0 or num < -1:
+        raise FftBackendException("Number of FFT workers should be positive or -1")
+    workers = num
+    planCache.clear()
+
+
+def numThreads():
+    if workers == -1:
+        return multiprocessing.cpu_count()
+    return workers
+
+
+def shiftVector(length, axis, ndim, inverse, dtype):
+    # Phase modulation that is equal to an fftshift after the transform
+    key = (length, axis, ndim, inverse, np.dtype(dtype).str)
+    if key in shiftCache:
+        shiftCache[key] = shiftCache.pop(key)
+        return shiftCache[key]
+    shift = length // 2
+    if length % 2 == 0: # Alternating +1 and -1, which is exact
+        vector = (1 - 2 * (np.arange(length) % 2)).astype(dtype)
+    else:
+        sign = -1 if inverse else 1
+        vector = np.exp(sign * 2j * np.pi * (np.arange(length) * shift % length) / length).astype(dtype)
+    vector = vector.reshape((length, ) + (1, ) * (ndim - axis - 1))
+    vector.flags.writeable = False
+    shiftCache[key] = vector
+    while len(shiftCache) > MAXPLANS:
+        shiftCache.popitem(last=False)
+    return vector
+
+
+def getPlan(data, axis, inverse):
+    key = (data.shape, data.dtype.str, axis, inverse, numThreads())
+    if key in planCache:
+        planCache[key] = planCache.pop(key)
+        return planCache[key]
+    inArray = pyfftw.empty_aligned(data.shape, dtype=data.dtype)
+    outArray = pyfftw.empty_aligned(data.shape, dtype=data.dtype)
+    direction = 'FFTW_BACKWARD' if inverse else 'FFTW_FORWARD'
+    plan = pyfftw.FFTW(inArray, outArray, axes=(axis, ), direction=direction, flags=('FFTW_ESTIMATE', ), threads=numThreads())
+    planCache[key] = plan
+    while len(planCache) > MAXPLANS:
+        planCache.popitem(last=False)
+    return plan
+
+
+def transform(data, axis, inverse, overwrite=False):
+    if backend == 'scipy':
+        if inverse:
+            return scipyFft.ifft(data, axis=axis, overwrite_x=overwrite, workers=workers)
+        return scipyFft.fft(data, axis=axis, overwrite_x=overwrite, workers=workers)
+    if backend == 'pyfftw' and data.dtype in (np.complex64, np.complex128):
+        axis = axis % data.ndim
+        plan = getPlan(data, axis, inverse)
+        out = pyfftw.empty_aligned(data.shape, dtype=data.dtype)
+        return plan(data, out)
+    if inverse:
+        return np.fft.ifft(data, axis=axis)
+    return np.fft.fft(data, axis=axis)
+
+
+def fft(data, axis=-1, shift=False):
+    data = np.asarray(data)
+    if not shift:
+        return transform(data, axis, False)
+    axis = axis % data.ndim
+    data = data * shiftVector(data.shape[axis], axis, data.ndim, False, np.result_type(data.dtype, np.complex64))
+    return transform(data, axis, False, True)
+
+
+def ifft(data, axis=-1, shift=False):
+    data = np.asarray(data)
+    data = transform(data, axis, True)
+    if shift:
+        axis = axis % data.ndim
+        data *= shiftVector(data.shape[axis], axis, data.ndim, True, data.dtype)
+    return data
@@ -627,7 +627,8 @@ class FitPlotFrame(Current1D):
         self.rootwindow.paramframe.togglePick()
 
     def getData1D(self):
-        return np.real(self.getDataType(self.data1D.getHyperData(0)))
+        # Fitting is always done in double precision
+        return np.real(self.getDataType(self.data1D.getHyperData(0))).astype(float)
 
     def showFid(self):
         extraX = []
@@ -18,10 +18,71 @@
 # along with ssNake. If not, see <http://www.gnu.org/licenses/>.
 
 
+import threading
+from collections import OrderedDict
 import numpy as np
 from scipy.special import wofz
 import scipy.constants as SC
 import scipy.linalg
+import scipy.optimize
+import scipy.sparse
+import scipy.interpolate
+import fftBackend as fftb
+
+AUTOPHASEGRID = 24 # Number of phase0 values that are tried to find the start value of the autophasing
+VECTORCACHE = 64 # Number of frequency and apodization vectors that are kept
+VECTORCACHEBYTES = 64 * 1024**2 # Maximum memory used by the cached vectors
+PHASEBUFFERS = 4 # Number of vector lengths for which phaseVector keeps an output buffer
+REGRIDCACHE = 8 # Number of regrid matrices that are kept
+REGRIDMETHODS = ['linear', 'spline', 'sinc']
+SINCTAPS = 8 # Number of points on each side used by sinc interpolation
+BASELINEMETHODS = ['polynomial', 'als', 'arpls']
+BASELINETOL = 1e-3 # Relative change of the weights at which the iterative baselines are converged
+ALIGNMETHODS = ['maximum', 'parabolic', 'phase']
+
+regridCache = OrderedDict()
+
+vectorCache = OrderedDict()
+
+phaseBuffers = threading.local() # Output buffers of phaseVector, per thread and vector length
+
+def cachedVector(key, create):
+    # Returns the vector for key from the cache, or calls create to make it.
+    # The vectors are read-only, as they are shared between calls.
+    if key in vectorCache:
+        vectorCache[key] = vectorCache.pop(key)
+        return vectorCache[key]
+    vector = create()
+    vector.flags.writeable = False
+    vectorCache[key] = vector
+    while len(vectorCache) > 1 and (len(vectorCache) > VECTORCACHE or sum([item.nbytes for item in vectorCache.values()]) > VECTORCACHEBYTES):
+        vectorCache.popitem(last=False)
+    return vector
+
+def frequencyVector(axLen, sw, offset=0):
+    # The frequency axis in units of the spectral width, as used for first order phasing
+    return cachedVector(('frequency', axLen, sw, offset), lambda: (np.fft.fftshift(np.fft.fftfreq(axLen, 1.0 / sw)) + offset) / sw)
+
+def phaseVector(axLen, sw, offset, phase0, phase1):
+    # The phases change with every call (e.g. when phasing with the sliders), so only the frequency
+    # axis is cached. The result is written into a buffer that is reused by the next call with
+    # the same length in the same thread, so it should be used before phaseVector is called again.
+    buffers = getattr(phaseBuffers, 'buffers', None)
+    if buffers is None:
+        buffers = phaseBuffers.buffers = OrderedDict()
+    if axLen in buffers:
+        angle, vector = buffers.pop(axLen)
+    else:
+        angle = np.empty(axLen)
+        vector = np.empty(axLen, dtype=complex)
+    buffers[axLen] = (angle, vector)
+    while len(buffers) > PHASEBUFFERS:
+        buffers.popitem(last=False)
+    np.multiply(frequencyVector(axLen, sw, offset), phase1, out=angle)
+    angle += phase0
+    np.cos(angle, out=vector.real)
+    np.sin(angle, out=vector.imag)
+    return vector
 
 def apodize(t, shift, sw, axLen, lor, gauss, cos2, hamming, wholeEcho=False):
     t2 = t - shift
@@ -39,12 +100,89 @@ def apodize(t, shift, sw, axLen, lor, gauss, cos2, hamming, wholeEcho=False):
         x[-1:-(int(len(x) / 2) + 1):-1] = x[:int(len(x) / 2)]
     return x
 
+def apodizeVector(axLen, sw, shift, lor, gauss, cos2, hamming, wholeEcho=False):
+    # apodize for t = np.arange(axLen) / sw, every window and their product are cached separately
+    cos2 = tuple(cos2)
+    def window(lor=None, gauss=None, cos2=(None, None), hamming=None):
+        key = ('apodize', axLen, sw, shift, lor, gauss, cos2, hamming, wholeEcho)
+        return cachedVector(key, lambda: apodize(np.arange(0, axLen) / sw, shift, sw, axLen, lor, gauss, cos2, hamming, wholeEcho))
+    windows = []
+    if lor is not None:
+        windows.append(window(lor=lor))
+    if gauss is not None:
+        windows.append(window(gauss=gauss))
+    if cos2[0] is not None and cos2[1] is not None:
+        windows.append(window(cos2=cos2))
+    if hamming is not None:
+        windows.append(window(hamming=hamming))
+    if not windows:
+        return window()
+    if len(windows) == 1:
+        return windows[0]
+    return cachedVector(('apodize', axLen, sw, shift, lor, gauss, cos2, hamming, wholeEcho), lambda: np.prod(windows, axis=0))
+
+def regridMatrix(newX, oldX, method='linear'):
+    # Sparse matrix that interpolates data on the axis oldX to the axis newX,
+    # points outside of oldX are set to zero. The matrices are cached, as the same
+    # axes are often used repeatedly (e.g. in fitting).
+    newX = np.asarray(newX, dtype=float)
+    oldX = np.asarray(oldX, dtype=float)
+    key = (method, newX.tobytes(), oldX.tobytes())
+    if key in regridCache:
+        regridCache[key] = regridCache.pop(key)
+        return regridCache[key]
+    n = len(oldX)
+    if n < 2:
+        raise ValueError("Regrid needs at least two points")
+    order = np.argsort(oldX, kind='mergesort')
+    sortX = oldX[order]
+    valid = np.flatnonzero((newX >= sortX[0]) & (newX <= sortX[-1]))
+    x = newX[valid]
+    if method == 'linear':
+        index = np.clip(np.searchsorted(sortX, x, side='right') - 1, 0, n - 2)
+        frac = (x - sortX[index]) / (sortX[index + 1] - sortX[index])
+        rows = np.concatenate((valid, valid))
+        cols = np.concatenate((index, index + 1))
+        weights = np.concatenate((1 - frac, frac))
+    elif method == 'sinc':
+        # Lanczos windowed sinc on the (equidistant) old axis, normalised to keep constant signals constant
+        pos = (x - sortX[0]) / ((sortX[-1] - sortX[0]) / (n - 1))
+        cols = np.floor(pos).astype(int)[:, np.newaxis] + np.arange(-SINCTAPS + 1, SINCTAPS + 1)
+        dist = pos[:, np.newaxis] - cols
+        weights = np.sinc(dist) * np.sinc(dist / SINCTAPS)
+        weights[(cols < 0) | (cols >= n)] = 0
+        weights /= np.sum(weights, axis=1)[:, np.newaxis]
+        rows = np.repeat(valid, cols.shape[1])
+        cols = np.clip(cols, 0, n - 1).ravel()
+        weights = weights.ravel()
+    else:
+        raise ValueError("Unknown regrid method '" + str(method) + "'")
+    matrix = scipy.sparse.csr_matrix((weights, (rows, order[cols])), shape=(len(newX), n))
+    regridCache[key] = matrix
+    while len(regridCache) > REGRIDCACHE:
+        regridCache.popitem(last=False)
+    return matrix
+
+def regrid(data, newX, oldX, axis=-1, method='linear'):
+    # Interpolates data from the axis oldX to newX along axis, for all traces at once
+    data = np.moveaxis(np.asarray(data), axis, 0)
+    shape = data.shape
+    data = data.reshape((shape[0], -1))
+    if method == 'spline':
+        oldX = np.asarray(oldX, dtype=float)
+        order = np.argsort(oldX, kind='mergesort')
+        result = scipy.interpolate.interp1d(oldX[order], data[order], kind='cubic', axis=0, bounds_error=False, fill_value=0, assume_sorted=True)(newX)
+    else:
+        result = regridMatrix(newX, oldX, method).dot(data)
+    result = result.reshape((len(newX), ) + shape[1:])
+    return np.moveaxis(result, 0, axis)
+
 def lpsvd(fullFid, nPredict, maxFreq, forward=False, L=None):
-    fid = fullFid[:L]
+    fid = np.asarray(fullFid[:L], dtype=complex) # Always use double precision
     N = len(fid)
     M = int(np.floor(N * 3 / 4.0))
     H = scipy.linalg.hankel(fid[1:N-M+1], fid[N-M:])
-    U, S, Vh = np.linalg.svd(H, full_matrices=1)
+    U, S, Vh = np.linalg.svd(H, full_matrices=False) # Only the first sigVal vectors are used
     sigVal = len(S[S>(S[0]*1e-6)]) # Number of significant singular values
     if sigVal > maxFreq:
         sigVal = maxFreq
@@ -79,6 +217,192 @@ def lpsvd(fullFid, nPredict, maxFreq, forward=False, L=None):
         data = np.concatenate((reconstructed, fullFid))
     return data
 
+def acmeEntropy(phase0, phase1, data, x):
+    # ACME entropy of every trace (row) of data and its gradient with respect to phase0 and phase1
+    L = data.shape[1]
+    if np.any(phase1):
+        s0 = data * np.exp(1j * (phase0[:, np.newaxis] + phase1[:, np.newaxis] * x))
+    else:
+        s0 = data * np.exp(1j * phase0)[:, np.newaxis]
+    s2 = np.real(s0)
+    ds2 = -np.imag(s0) # Derivative of s2 with respect to phase0
+    diff = (s2[:, 3:L] - s2[:, 1:L - 2]) / 2.0
+    dDiff = (ds2[:, 3:L] - ds2[:, 1:L - 2]) / 2.0
+    dDiff1 = (ds2[:, 3:L] * x[3:L] - ds2[:, 1:L - 2] * x[1:L - 2]) / 2.0
+    ds1 = np.abs(diff)
+    total = np.sum(ds1, axis=1)
+    total[total == 0] = 1
+    p1 = ds1 / total[:, np.newaxis]
+    p1[p1 == 0] = 1
+    logP = np.log(p1)
+    H1 = -np.sum(p1 * logP, axis=1)
+    dH = -np.sign(diff) * (logP + H1[:, np.newaxis]) / total[:, np.newaxis]
+    grad = np.zeros((data.shape[0], 2))
+    grad[:, 0] = np.sum(dH * dDiff, axis=1)
+    grad[:, 1] = np.sum(dH * dDiff1, axis=1)
+    as1 = np.minimum(s2, 0) * 2
+    penalty = np.any(as1 < 0, axis=1)
+    Pfun = np.sum(as1**2, axis=1) / 4 / L**2 * penalty
+    grad[:, 0] += 1000 * np.sum(as1 * ds2, axis=1) / L**2 * penalty
+    grad[:, 1] += 1000 * np.sum(as1 * ds2 * x, axis=1) / L**2 * penalty
+    return H1 + 1000 * Pfun, grad
+
+def acmeTrace(phases, trace, x, phaseNum):
+    # ACME entropy and gradient of a single trace, for the minimisation
+    phase1 = phases[1:2] if phaseNum == 1 else np.zeros(1)
+    val, grad = acmeEntropy(phases[:1], phase1, trace, x)
+    return val[0], grad[0, :phaseNum + 1]
+
+def autoPhaseBlock(data, x, phaseNum, gridSize=AUTOPHASEGRID):
+    # Autophases every trace (row) of data, returns phase0 and phase1 for every trace.
+    # The start values are the best point of a coarse grid, which is evaluated for all traces at once.
+    data = np.asarray(data, dtype=complex)
+    zeros = np.zeros(data.shape[0])
+    best = np.full(data.shape[0], np.inf)
+    start = np.zeros((data.shape[0], 2))
+    grid1 = [0.0]
+    if phaseNum == 1:
+        grid1 = np.linspace(-np.pi, np.pi, gridSize // 4 + 1)
+    rotated = [data * np.exp(1j * phase1 * x) for phase1 in grid1]
+    for phase0 in np.linspace(-np.pi, np.pi, gridSize, endpoint=False):
+        for j, phase1 in enumerate(grid1):
+            val = acmeEntropy(zeros + phase0, zeros, rotated[j], x)[0]
+            better = val < best
+            best[better] = val[better]
+            start[better] = [phase0, phase1]
+    phases = np.zeros((data.shape[0], 2))
+    for i in range(data.shape[0]):
+        guess = start[i, :phaseNum + 1]
+        res = scipy.optimize.minimize(acmeTrace, guess, (data[i:i + 1], x, phaseNum), jac=True, method='L-BFGS-B')
+        phases[i, :phaseNum + 1] = res['x']
+    return phases
+
+def lpsvdBlock(data, nPredict, maxFreq, forward=False, L=None):
+    # lpsvd for every trace (row) of data, traces for which it fails are returned as NaN
+    result = np.full((data.shape[0], data.shape[1] + nPredict), np.nan, dtype=complex)
+    for i, trace in enumerate(data):
+        try:
+            with np.errstate(all='ignore'):
+                tmp = lpsvd(trace, nPredict, maxFreq, forward, L)
+        except Exception:
+            continue
+        if np.all(np.isfinite(tmp)):
+            result[i] = tmp
+    return result
+
+def regionSum(data, starts, ends, axis=-1):
+    # Sums of data[starts[i]:ends[i]] along axis for all regions in a single reduceat
+    # The regions can overlap, but should have starts < ends
+    axis = axis % data.ndim
+    axLen = data.shape[axis]
+    starts = np.asarray(starts, dtype=int)
+    ends = np.asarray(ends, dtype=int)
+    atEnd = ends == axLen # reduceat cannot use the length of the axis as an index
+    indices = np.column_stack((starts, np.where(atEnd, axLen - 1, ends))).flatten()
+    result = np.add.reduceat(data, indices, axis=axis)
+    result = result[(slice(None), ) * axis + (slice(None, None, 2), )]
+    addLast = atEnd & (starts < axLen - 1)
+    if np.any(addLast):
+        slicing = (slice(None), ) * axis
+        result[slicing + (addLast, )] += data[slicing + (slice(axLen - 1, axLen), )]
+    return result
+
+def regionArgExtreme(data, starts, ends, axis=-1, findMax=True):
+    # Index of the first maximum (or minimum) of data[starts[i]:ends[i]] along axis for all regions
+    # There is no reduceat for argmax, and gathering all regions is slower for complex data,
+    # so the regions are looped over, but written into a single output array
+    axis = axis % data.ndim
+    shape = list(data.shape)
+    shape[axis] = len(starts)
+    result = np.empty(shape, dtype=int)
+    argFunc = np.argmax if findMax else np.argmin
+    slicing = (slice(None), ) * axis
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        result[slicing + (i, )] = argFunc(data[slicing + (slice(start, end), )], axis=axis) + start
+    return result
+
+def baselinePolynomial(x, data, bArray, degree):
+    # Polynomial baselines of all traces (rows of data), fitted to the points in bArray with a single least squares solve
+    x = np.asarray(x, dtype=float)
+    half = (np.max(x) - np.min(x)) / 2.0
+    if half == 0:
+        half = 1.0
+    # Scaling x to [-1, 1] keeps the Vandermonde matrix well conditioned
+    vander = np.polynomial.polynomial.polyvander((x - np.min(x)) / half - 1, degree)
+    coeff = np.linalg.lstsq(vander[bArray], np.transpose(data[:, bArray]), rcond=None)[0]
+    return np.transpose(vander.dot(coeff))
+
+def smoothnessBand(axLen, lam):
+    # lam * D^T D for the second order difference matrix D, as upper band for scipy.linalg.solveh_banded
+    diff = scipy.sparse.diags([1.0, -2.0, 1.0], [0, 1, 2], shape=(axLen - 2, axLen))
+    penalty = (diff.T.dot(diff)).todia()
+    band = np.zeros((3, axLen))
+    band[0, 2:] = penalty.diagonal(2)
+    band[1, 1:] = penalty.diagonal(1)
+    band[2] = penalty.diagonal(0)
+    return lam * band
+
+def baselineBlock(data, method, bArray, lam, p, maxIter):
+    # Asymmetric least squares ('als') or asymmetrically reweighted penalized least squares ('arpls')
+    # baselines of all traces (rows of data). Only the points in bArray are used for the fit.
+    # The matrix is banded, so every iteration is a single banded Cholesky solve.
+    band = smoothnessBand(data.shape[1], lam)
+    mask = np.asarray(bArray, dtype=float)
+    result = np.empty(data.shape, dtype=float)
+    for i, trace in enumerate(np.real(data)):
+        weights = mask
+        for j in range(maxIter):
+            tmpBand = band.copy()
+            tmpBand[-1] += weights
+            baseline = scipy.linalg.solveh_banded(tmpBand, weights * trace, check_finite=False)
+            diff = trace - baseline
+            if method == 'als':
+                newWeights = np.where(diff > 0, p, 1 - p) * mask
+            else:
+                negDiff = diff[(diff < 0) & (mask > 0)]
+                if len(negDiff) < 2 or np.std(negDiff) == 0:
+                    break
+                mean = np.mean(negDiff)
+                std = np.std(negDiff)
+                newWeights = mask / (1 + np.exp(np.clip(2 * (diff - (2 * std - mean)) / std, -500, 500)))
+            converged = np.linalg.norm(newWeights - weights) <= BASELINETOL * np.linalg.norm(weights)
+            weights = newWeights
+            if converged:
+                break
+        result[i] = baseline
+    return result
+
+def correlationShifts(data, reference, refine='parabolic'):
+    # Shift in points of every trace (row of data) with respect to reference, returned as a column.
+    # The integer shift is the maximum of the cross correlation, which is refined to a fraction of a point
+    # with a parabola through the maximum ('parabolic') or the slope of the phase of the cross spectrum ('phase').
+    size = 2 * data.shape[1] # Zero filling prevents the wrap around of the correlation
+    tmpData = np.zeros((data.shape[0], size))
+    tmpData[:, :data.shape[1]] = np.real(data)
+    tmpRef = np.zeros(size)
+    tmpRef[:data.shape[1]] = np.real(reference)
+    cross = fftb.fft(tmpData, 1) * np.conj(fftb.fft(tmpRef))
+    corr = np.real(fftb.ifft(cross, 1))
+    index = np.argmax(corr, axis=1)
+    lag = np.where(index > size // 2, index - size, index)
+    if refine == 'parabolic':
+        rows = np.arange(data.shape[0])
+        left = corr[rows, index - 1]
+        right = corr[rows, (index + 1) % size]
+        denom = left - 2 * corr[rows, index] + right
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = np.where(denom < 0, 0.5 * (left - right) / denom, 0.0)
+    elif refine == 'phase':
+        freq = np.fft.fftfreq(size)
+        phase = np.angle(cross * np.exp(2j * np.pi * freq * lag[:, np.newaxis]))
+        weight = np.abs(cross)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = -np.sum(weight * freq * phase, axis=1) / (2 * np.pi * np.sum(weight * freq**2, axis=1))
+        delta = np.where(np.isfinite(delta), np.clip(delta, -0.5, 0.5), 0.0)
+    else:
+        delta = 0.0
+    return (lag + delta)[:, np.newaxis]
+
 def euro(val, num):
     firstDigit = '%.0e' % val
     firstDigit = int(firstDigit[0])
@@ -19,6 +19,20 @@
 
 import numpy as np
 import warnings
+import fftBackend as fftb
+import functions as func
+
+DTYPE = np.complex128 # Storage type of new data, np.complex64 halves the memory use
+
+def setSinglePrecision(val):
+    global DTYPE
+    if val:
+        DTYPE = np.complex64
+    else:
+        DTYPE = np.complex128
+
+def getDtype():
+    return DTYPE
 
 def parity(x):
     # Find the parity of an integer
@@ -34,34 +48,131 @@ def parity(x):
 class HComplexException(Exception):
     pass
 
+#########################################################################
+# Lazily read data
+
+
+class MemmapSource(object):
+    # Complex data stored on disk as pairs of real and imaginary values.
+    # raw is a (memory mapped) array with an extra last axis of length 2.
+    # Only the requested part of the data is read and converted.
+
+    def __init__(self, raw, imagSign=1, scale=None, dtype=None):
+        if raw.shape[-1] != 2:
+            raise HComplexException('Last axis of the raw data should contain the real and imaginary values')
+        if dtype is None:
+            dtype = DTYPE
+        self.raw = raw
+        self.imagSign = imagSign
+        self.scale = scale
+        self.dtype = np.dtype(dtype)
+        self.shape = raw.shape[:-1]
+
+    def __deepcopy__(self, memo):
+        # The source is read only, so it can be shared
+        return self
+
+    def read(self, key=()):
+        raw = self.raw[key]
+        tmpData = np.empty(raw.shape[:-1], dtype=self.dtype)
+        tmpData.real = raw[..., 0]
+        if self.imagSign == 1:
+            tmpData.imag = raw[..., 1]
+        else:
+            tmpData.imag = -raw[..., 1]
+        if self.scale is not None:
+            tmpData *= self.scale
+        return tmpData
+
+
+class ViewSource(object):
+    # Read-only view on data that is already in memory, used for slices that are only displayed.
+    # The view is copied as soon as the data is changed, which makes the data writable.
+
+    def __init__(self, view):
+        view = view.view()
+        view.flags.writeable = False
+        self.view = view
+        self.dtype = view.dtype
+        self.shape = view.shape
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def read(self, key=()):
+        return self.view[key]
+
 #########################################################################
 # the hyper complex data class
 
 
 class HComplexData(object):
 
-    def __init__(self, data=None, hyper=None):
-        if data is None:
-            self.data = np.array([], dtype=complex)
+    def __init__(self, data=None, hyper=None, dtype=None, source=None):
+        self.source = None
+        if dtype is None:
+            dtype = DTYPE
+        if source is not None:
+            # Data is read from the source when it is needed
+            self._data = None
+            self.source = source
+            self.hyper = np.array([0])
+        elif data is None:
+            self.data = np.array([], dtype=dtype)
             self.hyper = np.array([])
         else:
             if hyper is None:
                 # Data is not hypercomplex
-                self.data = np.array([data], dtype=complex)
+                self.data = np.array([data], dtype=dtype)
                 self.hyper = np.array([0])
             else:
                 if len(hyper) != len(data):
                     raise HComplexException('Length of hyper and data mismatch')
-                self.data = np.array(data, dtype=complex)
+                self.data = np.array(data, dtype=dtype)
                 self.hyper = np.array(hyper)
 
+    @property
+    def data(self):
+        if self.source is not None:
+            self.materialise()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self.source = None
+
+    def isLazy(self):
+        return self.source is not None
+
+    def dtype(self):
+        if self.source is not None:
+            return self.source.dtype
+        return self.data.dtype
+
+    def materialise(self):
+        # Read all data from the source
+        if self.source is not None:
+            source = self.source
+            tmpData = source.read()
+            if not tmpData.flags.writeable: # Copy on write for views
+                tmpData = tmpData.copy()
+            self._data = tmpData[np.newaxis]
+            self.source = None
+
     def ndim(self):
+        if self.source is not None:
+            return len(self.source.shape)
         return self.data.ndim - 1 # One extra dimension to contain the hypercomplex information
 
     def shape(self):
+        if self.source is not None:
+            return self.source.shape
         return self.data[0].shape
 
     def getHyperData(self, hyperVal):
+        if self.source is not None and hyperVal == 0:
+            return self.source.read()
         return self.data[hyperVal == self.hyper][0]
 
     def __repr__(self, *args):
@@ -82,13 +193,13 @@ class HComplexData(object):
         return True
         
     def __neg__(self):
-        return HComplexData(-self.data, np.copy(self.hyper))
+        return HComplexData(-self.data, np.copy(self.hyper), self.data.dtype)
 
     def __pos__(self):
-        return HComplexData(+self.data, np.copy(self.hyper))
+        return HComplexData(+self.data, np.copy(self.hyper), self.data.dtype)
 
     def __abs__(self):
-        return HComplexData(np.abs(self.data), np.copy(self.hyper))
+        return HComplexData(np.abs(self.data), np.copy(self.hyper), self.data.dtype)
 
     def __add__(self, other):
         tmpData = self.copy()
@@ -101,7 +212,7 @@ class HComplexData(object):
         if isinstance(other, HComplexData):
             tmpHyper = np.unique(np.concatenate((self.hyper, other.hyper)))
             tmpHyper.sort()
-            tmpData = np.zeros((len(tmpHyper),) + np.broadcast(self.data[0], other.data[0]).shape, dtype=complex)
+            tmpData = np.zeros((len(tmpHyper),) + np.broadcast(self.data[0], other.data[0]).shape, dtype=np.result_type(self.data, other.data))
             for i in self.hyper:
                 tmpData[i==tmpHyper] = self.data[i==self.hyper]
             for i in other.hyper:
@@ -140,7 +251,7 @@ class HComplexData(object):
                 tmpHyper = np.concatenate((tmpHyper, xorHyper))
             tmpHyper = np.unique(tmpHyper)
             tmpHyper.sort()
-            tmpData = np.zeros((len(tmpHyper),) + np.broadcast(self.data[0], other.data[0]).shape, dtype=complex)
+            tmpData = np.zeros((len(tmpHyper),) + np.broadcast(self.data[0], other.data[0]).shape, dtype=np.result_type(self.data, other.data))
             for i, idim in enumerate(self.hyper):
                 for j, jdim in enumerate(other.hyper):
                     if parity(idim & jdim):
@@ -164,9 +275,9 @@ class HComplexData(object):
             if len(other.hyper) > 1:
                 # Recursive calculation of the multicomplex division
                 warnings.warn("Calculation of multicomplex data may not result in the correct value")
-                tmpOther = HComplexData(np.copy(other.data), np.copy(other.hyper))
+                tmpOther = HComplexData(np.copy(other.data), np.copy(other.hyper), other.data.dtype)
                 while not tmpOther.isAllReal():
-                    tmpObj = HComplexData(np.copy(tmpOther.data), np.copy(tmpOther.hyper))
+                    tmpObj = HComplexData(np.copy(tmpOther.data), np.copy(tmpOther.hyper), tmpOther.data.dtype)
                     tmpObj = tmpObj.conjAll()
                     tmpOther *= tmpObj
                     self *= tmpObj
@@ -206,7 +317,10 @@ class HComplexData(object):
                 key = tuple(key)
             except TypeError:
                 key = (key, )
-        return HComplexData(self.data[(slice(None), ) + key], self.hyper)
+        if self.source is not None:
+            # Only read the requested part
+            return HComplexData(self.source.read(key)[np.newaxis], self.hyper, self.source.dtype)
+        return HComplexData(self.data[(slice(None), ) + key], self.hyper, self.data.dtype)
 
     def __setitem__(self, key, value):
         if not isinstance(key, tuple):
@@ -215,12 +329,17 @@ class HComplexData(object):
             except TypeError:
                 key = (key, )
         if isinstance(value, HComplexData):
-            self.data[(slice(None), ) + key] = 0
             diffList = np.setdiff1d(value.hyper, self.hyper, assume_unique=True)
-            insertOrder = np.searchsorted(self.hyper, diffList)
-            self.data = np.insert(self.data, insertOrder, 0, axis=0)
-            self.hyper = np.insert(self.hyper, insertOrder, diffList)
-            self.data[(np.in1d(self.hyper, value.hyper), ) + key] = value.data
+            if len(diffList) > 0:
+                # np.insert copies all data, so only use it when there are new hypercomplex parts
+                insertOrder = np.searchsorted(self.hyper, diffList)
+                self.data = np.insert(self.data, insertOrder, 0, axis=0)
+                self.hyper = np.insert(self.hyper, insertOrder, diffList)
+            for i, idim in enumerate(self.hyper):
+                if idim in value.hyper:
+                    self.data[(i, ) + key] = value.data[value.hyper == idim][0]
+                else:
+                    self.data[(i, ) + key] = 0
         else:
             self.data[(slice(0,1), ) + key] = value
             self.data[(slice(1,None), ) + key] = 0
@@ -229,17 +348,17 @@ class HComplexData(object):
         if axis < 0:
             axis = self.ndim() + axis
         if not self.isHyperComplex(axis) or axis == (self.ndim()-1):
-            return HComplexData(np.conj(self.data), np.copy(self.hyper))
+            return HComplexData(np.conj(self.data), np.copy(self.hyper), self.data.dtype)
         else:
             tmpData = np.copy(self.data)
             imagBool = np.array(self.hyper & (2**axis), dtype=bool)
             tmpData[imagBool] = -tmpData[imagBool]
-            return HComplexData(tmpData, np.copy(self.hyper))
+            return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def conjAll(self):
         tmpData = np.conj(self.data)
         tmpData[1:] = -tmpData[1:]
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def isAllReal(self):
         tmp = 0
@@ -281,31 +400,31 @@ class HComplexData(object):
         if axis < 0:
             axis = self.ndim() + axis
         if not self.isHyperComplex(axis):
-            return HComplexData(np.real(self.data), np.copy(self.hyper))
+            return HComplexData(np.real(self.data), np.copy(self.hyper), self.data.dtype)
         bit = 2**axis
         select = np.logical_not(self.hyper & bit)
-        return HComplexData(self.data[select], self.hyper[select])
+        return HComplexData(self.data[select], self.hyper[select], self.data.dtype)
         
     def imag(self, axis=-1):
         if axis < 0:
             axis = self.ndim() + axis
         if not self.isHyperComplex(axis):
-            return HComplexData(np.imag(self.data), np.copy(self.hyper))
+            return HComplexData(np.imag(self.data), np.copy(self.hyper), self.data.dtype)
         bit = 2**axis
         select = np.array(self.hyper & bit, dtype=bool)
-        return HComplexData(self.data[select], self.hyper[select]-bit)
+        return HComplexData(self.data[select], self.hyper[select]-bit, self.data.dtype)
 
     def abs(self, axis=-1):
         if axis < 0:
             axis = self.ndim() + axis
         if not self.isHyperComplex(axis):
-            return HComplexData(np.abs(self.data), np.copy(self.hyper))
+            return HComplexData(np.abs(self.data), np.copy(self.hyper), self.data.dtype)
         bit = 2**axis
         bArray = np.array(self.hyper & bit, dtype=bool)
         tmpHyper = np.concatenate((self.hyper[np.logical_not(bArray)], self.hyper[bArray] - bit))
         tmpHyper = np.unique(tmpHyper)
         tmpHyper.sort()
-        tmpData = np.zeros((len(tmpHyper),) + self.data[0].shape, dtype=complex)
+        tmpData = np.zeros((len(tmpHyper),) + self.data[0].shape, dtype=self.data.dtype)
         for i, idim in enumerate(tmpHyper):
             if idim in self.hyper and (idim+bit) in self.hyper:
                 tmpData[i] += np.sqrt(np.real(self.data[idim==self.hyper][0])**2 + np.real(self.data[(idim+bit)==self.hyper][0])**2)
@@ -314,7 +433,7 @@ class HComplexData(object):
                 tmpData[i] = self.data[idim==self.hyper]
             elif (idim+bit) in self.hyper:
                 tmpData[i] = self.data[idim==self.hyper]
-        return HComplexData(tmpData, tmpHyper)
+        return HComplexData(tmpData, tmpHyper, self.data.dtype)
 
     def complexReorder(self, axis=0):
         tmpData = self.copy()
@@ -329,7 +448,17 @@ class HComplexData(object):
         tmpHyper = np.concatenate((self.hyper, self.hyper[bArray] - bit, self.hyper[np.logical_not(bArray)] + bit))
         tmpHyper = np.unique(tmpHyper)
         tmpHyper.sort()
-        tmpData = np.zeros((len(tmpHyper),) + self.data[0].shape, dtype=complex)
+        if np.array_equal(tmpHyper, self.hyper) and np.iscomplexobj(self.data) and self.data.flags.writeable:
+            # Every part has its partner along axis, so the reorder only swaps
+            # the imaginary part of the one with the real part of the other
+            for idim in self.hyper[np.logical_not(bArray)]:
+                index1 = np.searchsorted(self.hyper, idim)
+                index2 = np.searchsorted(self.hyper, idim + bit)
+                tmpImag = np.copy(self.data[index1].imag)
+                self.data[index1].imag = self.data[index2].real
+                self.data[index2].real = tmpImag
+            return self
+        tmpData = np.zeros((len(tmpHyper),) + self.data[0].shape, dtype=self.data.dtype)
         tmpBArray = np.array(self.hyper & bit, dtype=bool)
         tmpData[np.logical_not(tmpBArray)] = np.real(self.data[np.logical_not(bArray)]) + 1j*np.real(self.data[bArray])
         tmpData[tmpBArray] = np.imag(self.data[np.logical_not(bArray)]) + 1j*np.imag(self.data[bArray])
@@ -347,7 +476,7 @@ class HComplexData(object):
         axis1[axis1 >= 0] += 1
         axis2[axis2 >= 0] += 1
         tmpData = np.moveaxis(self.data, axis1, axis2)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
     
     def insert(self, pos, other, axis=-1):
         if axis < 0:
@@ -366,24 +495,24 @@ class HComplexData(object):
                 tmpData.append(np.insert(np.zeros_like(self.data[0]), [pos], other.data[idim==other.hyper][0], axis=axis))
             else:
                 tmpData.append(np.insert(np.zeros_like(self.data[0]), [pos], np.zeros_like(other.data[0]), axis=axis))
-        return HComplexData(np.array(tmpData), tmpHyper)
+        return HComplexData(np.array(tmpData), tmpHyper, np.result_type(self.data, other.data))
 
     def delete(self, pos, axis):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.delete(self.data, pos, axis), np.copy(self.hyper))
+        return HComplexData(np.delete(self.data, pos, axis), np.copy(self.hyper), self.data.dtype)
     
     def concatenate(self, axis):
         if axis >= 0:
             axis += 1
         tmpData = np.swapaxes(self.data, 0, 1)
         tmpData = np.concatenate(tmpData, axis)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def split(self, sections, axis):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.swapaxes(np.split(self.data, sections, axis), 0, 1), np.copy(self.hyper))
+        return HComplexData(np.swapaxes(np.split(self.data, sections, axis), 0, 1), np.copy(self.hyper), self.data.dtype)
 
     def states(self, axis, TPPI=False):
         if axis < 0:
@@ -423,24 +552,24 @@ class HComplexData(object):
     def mean(self, axis=-1, **kwargs):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.mean(self.data, axis=axis, **kwargs), np.copy(self.hyper))
+        return HComplexData(np.mean(self.data, axis=axis, **kwargs), np.copy(self.hyper), self.data.dtype)
 
     def sum(self, axis=-1, **kwargs):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.sum(self.data, axis=axis, **kwargs), np.copy(self.hyper))
+        return HComplexData(np.sum(self.data, axis=axis, **kwargs), np.copy(self.hyper), self.data.dtype)
 
     def max(self, axis=-1):
         argVals = np.argmax(self.data[0], axis=axis)
         ind = list(np.indices(argVals.shape))
         ind.insert(axis, argVals)
-        return HComplexData(self.data[(slice(None), ) + tuple(ind)], np.copy(self.hyper))
+        return HComplexData(self.data[(slice(None), ) + tuple(ind)], np.copy(self.hyper), self.data.dtype)
 
     def min(self, axis=-1):
         argVals = np.argmin(self.data[0], axis=axis)
         ind = list(np.indices(argVals.shape))
         ind.insert(axis, argVals)
-        return HComplexData(self.data[(slice(None), ) + tuple(ind)], np.copy(self.hyper))
+        return HComplexData(self.data[(slice(None), ) + tuple(ind)], np.copy(self.hyper), self.data.dtype)
 
     def argmax(self, axis=-1):
         return HComplexData(np.argmax(self.data[0], axis=axis))
@@ -451,44 +580,43 @@ class HComplexData(object):
     def expand_dims(self, axis=-1):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.expand_dims(self.data, axis), np.copy(self.hyper))
+        return HComplexData(np.expand_dims(self.data, axis), np.copy(self.hyper), self.data.dtype)
 
     def append(self, values, axis=-1):
         if axis >= 0:
             axis += 1
         if isinstance(values, HComplexData):
             # Fix for unequal hyper
-            return HComplexData(np.append(self.data, values.data, axis=axis), np.copy(self.hyper))
+            return HComplexData(np.append(self.data, values.data, axis=axis), np.copy(self.hyper), self.data.dtype)
         else:
-            return HComplexData(np.append(self.data, values, axis=axis), np.copy(self.hyper))
+            return HComplexData(np.append(self.data, values, axis=axis), np.copy(self.hyper), self.data.dtype)
 
     def reshape(self, shape):
         newShape = tuple(len(self.data)) + shape
-        return HComplexData(self.data.reshape(newShape), np.copy(self.hyper))
+        return HComplexData(self.data.reshape(newShape), np.copy(self.hyper), self.data.dtype)
         
     def diff(self, axis=-1):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.diff(self.data, axis=axis), np.copy(self.hyper))
+        return HComplexData(np.diff(self.data, axis=axis), np.copy(self.hyper), self.data.dtype)
 
     def cumsum(self, axis=-1):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.cumsum(self.data, axis=axis), np.copy(self.hyper))
+        return HComplexData(np.cumsum(self.data, axis=axis), np.copy(self.hyper), self.data.dtype)
 
     def hilbert(self, axis=-1):
         import scipy.signal
         if axis >= 0:
             axis += 1
         tmpData = scipy.signal.hilbert(np.real(self.data), axis=axis)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
-    def regrid(self, newX, oldX, axis=-1):
-        from scipy import interpolate as intp
+    def regrid(self, newX, oldX, axis=-1, method='linear'):
         if axis >= 0:
             axis += 1
-        tmpData = np.apply_along_axis(lambda data, newX, oldX: intp.interp1d(oldX, data, fill_value=0, bounds_error=False)(newX), axis, self.data, newX, oldX)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        tmpData = func.regrid(self.data, newX, oldX, axis, method)
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def resize(self, size, pos, axis):
         if axis >= 0:
@@ -499,7 +627,7 @@ class HComplexData(object):
             slicing2 = (slice(None), ) * axis + (slice(pos, None), )
             zeroShape = np.array(self.data.shape)
             zeroShape[axis] = size - oldSize
-            tmpData = np.concatenate((self.data[slicing1], np.zeros(zeroShape), self.data[slicing2]), axis=axis)
+            tmpData = np.concatenate((self.data[slicing1], np.zeros(zeroShape, dtype=self.data.dtype), self.data[slicing2]), axis=axis)
         else:
             difference = oldSize - size
             removeBegin = int(np.floor(difference / 2))
@@ -514,7 +642,7 @@ class HComplexData(object):
                 slicing1 = (slice(None), ) * axis + (slice(None, pos - removeBegin), )
                 slicing2 = (slice(None), ) * axis + (slice(pos + removeEnd, None), )
                 tmpData = np.append(self.data[slicing1], self.data[slicing2], axis=axis)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def reorder(self, pos, newLength=None, axis=-1):
         if axis >= 0:
@@ -525,42 +653,62 @@ class HComplexData(object):
             raise HComplexException("Positions out of bounds in reorder")
         newShape = np.array(self.data.shape)
         newShape[axis] = newLength
-        tmpData = np.zeros(newShape, dtype=complex)
         slicing = (slice(None), ) * axis + (pos, )
-        tmpData = np.zeros(newShape, dtype=complex)
+        tmpData = np.zeros(newShape, dtype=self.data.dtype)
         tmpData[slicing] = self.data
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def apply_along_axis(self, func, axis, *args, **kwargs):
         if axis >= 0:
             axis += 1
         tmpData = np.apply_along_axis(func, axis, self.data, *args, **kwargs)
-        return HComplexData(tmpData, np.copy(self.hyper))
+        return HComplexData(tmpData, np.copy(self.hyper), self.data.dtype)
 
     def roll(self, shift, axis):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.roll(self.data, shift, axis=axis), np.copy(self.hyper))
+        return HComplexData(np.roll(self.data, shift, axis=axis), np.copy(self.hyper), self.data.dtype)
+
+    def rollFraction(self, shift, axis):
+        # Roll over a (fractional) number of points with a phase ramp in the Fourier domain
+        # shift is a number, or has the shape of the data without axis to roll every trace separately
+        if axis < 0:
+            axis = self.ndim() + axis
+        shift = np.asarray(shift)
+        if shift.ndim > 0:
+            shift = np.expand_dims(shift, axis)
+        length = self.shape()[axis]
+        freq = np.fft.fftfreq(length).reshape((length, ) + (1, ) * (self.ndim() - axis - 1))
+        tmpData = self.copy()
+        tmpData.icomplexReorder(axis)
+        ramp = np.exp(-2j * np.pi * freq * shift)
+        tmpData.data = fftb.ifft(fftb.fft(tmpData.data, axis + 1) * ramp, axis + 1).astype(self.data.dtype, copy=False)
+        tmpData.icomplexReorder(axis)
+        return tmpData
     
-    def fft(self, axis):
+    def fft(self, axis, shift=False):
+        # With shift=True the result is also fftshifted, without an extra pass over the data
         if axis >= 0:
             axis += 1
-        return HComplexData(np.fft.fft(self.data, axis=axis), np.copy(self.hyper))
+        return HComplexData(fftb.fft(self.data, axis, shift), np.copy(self.hyper), self.data.dtype)
 
-    def ifft(self, axis):
+    def ifft(self, axis, shift=False):
+        # With shift=True the data is ifftshifted before the transform
         if axis >= 0:
             axis += 1
-        return HComplexData(np.fft.ifft(self.data, axis=axis), np.copy(self.hyper))
+        return HComplexData(fftb.ifft(self.data, axis, shift), np.copy(self.hyper), self.data.dtype)
 
     def fftshift(self, axis):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.fft.fftshift(self.data, axes=axis), np.copy(self.hyper))
+        return HComplexData(np.fft.fftshift(self.data, axes=axis), np.copy(self.hyper), self.data.dtype)
 
     def ifftshift(self, axis):
         if axis >= 0:
             axis += 1
-        return HComplexData(np.fft.ifftshift(self.data, axes=axis), np.copy(self.hyper))
+        return HComplexData(np.fft.ifftshift(self.data, axes=axis), np.copy(self.hyper), self.data.dtype)
 
     def copy(self):
-        return HComplexData(np.copy(self.data), np.copy(self.hyper))
+        if self.source is not None:
+            return HComplexData(source=self.source)
+        return HComplexData(np.copy(self.data), np.copy(self.hyper), self.data.dtype)
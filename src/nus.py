@@ -41,23 +41,7 @@ def ffm(inp):
 
 
 def clean(inp):
-    residuals = inp[0]
-    mask = inp[1]
-    gamma = inp[2]
-    stopLevel = inp[3]
-    maxIter = inp[4]
-    replica = np.zeros(len(residuals), dtype=complex)
-    for i in range(maxIter):
-        findMax = np.argmax(np.abs(residuals))
-        maxAmp = residuals[findMax]
-        if np.abs(maxAmp) < np.abs(np.mean(residuals)) * stopLevel:
-            break
-        replica[findMax] += maxAmp * gamma
-        residuals -= maxAmp * gamma * np.roll(mask, findMax)
-    replica += residuals
-    replica = np.real(np.fft.fftshift(replica))
-    #Return 'good' spectrum
-    return replica
+    return cleanBlock(inp[0][np.newaxis], inp[1], inp[2], inp[3], inp[4])[0]
 
 
 def ist(inp):  # Iterative soft thresholding
@@ -88,3 +72,107 @@ def ist(inp):  # Iterative soft thresholding
 
     result = np.fft.fftshift(result,axes=0)
     return result
+
+
+#########################################################################
+# Versions that process a 2D block of traces (one trace per row), for use with workers.mapTraces
+
+
+def ffmBlock(data, posList):
+    return np.array([ffm((trace, posList)) for trace in data])
+
+
+def cleanBlock(data, mask, gamma, stopLevel, maxIter):
+    # All traces are iterated at the same time, a trace is no longer updated once it reaches the stop level
+    residuals = np.array(data, dtype=complex)
+    replica = np.zeros_like(residuals)
+    length = residuals.shape[1]
+    # Row s of rolled is np.roll(mask, -s), as a view on the doubled mask
+    double = np.concatenate((mask, mask)).astype(complex)
+    rolled = np.lib.stride_tricks.as_strided(double, shape=(length, length), strides=double.strides * 2)
+    active = np.arange(residuals.shape[0])
+    res = residuals
+    for i in range(maxIter):
+        if len(active) == 0:
+            break
+        findMax = np.argmax(res.real**2 + res.imag**2, axis=1)
+        maxAmp = res[np.arange(len(active)), findMax]
+        keep = np.abs(maxAmp) >= np.abs(np.mean(res, axis=1)) * stopLevel
+        if not np.all(keep):
+            residuals[active] = res
+            active = active[keep]
+            res = residuals[active]
+            findMax = findMax[keep]
+            maxAmp = maxAmp[keep]
+        maxAmp = maxAmp * gamma
+        replica[active, findMax] += maxAmp
+        res -= maxAmp[:, np.newaxis] * rolled[(length - findMax) % length]
+    residuals[active] = res
+    replica += residuals
+    #Return 'good' spectrum
+    return np.real(np.fft.fftshift(replica, axes=1))
+
+
+def istBlock(data, posList, threshold, ittnum, tracelimit, NDmax):
+    return np.array([ist((trace, posList, threshold, ittnum, tracelimit, NDmax)) for trace in data])
+
+
+def swapPlaneParts(planes):
+    # Moves the numpy complex unit from the second to the first plane axis, or back (the swap is its own inverse).
+    # The parts (axis 1) are the real and imaginary part along the one axis, each complex along the other axis.
+    return np.stack((planes[:, 0].real + 1j * planes[:, 1].real, planes[:, 0].imag + 1j * planes[:, 1].imag), axis=1)
+
+
+def planeFft(planes):
+    # 2D FFT of planes of shape (n, parts, n1, n2). With one part the planes are complex along both axes.
+    # With two parts these are the real and imaginary part along n1, each complex along n2 (hypercomplex data),
+    # the spectrum then has its parts along n2 and is complex along n1.
+    if planes.shape[1] == 1:
+        return np.fft.fftn(planes, axes=(2, 3))
+    return np.fft.fft(swapPlaneParts(np.fft.fft(planes, axis=3)), axis=2)
+
+
+def planeIfft(spectrum):
+    # Inverse of planeFft
+    if spectrum.shape[1] == 1:
+        return np.fft.ifftn(spectrum, axes=(2, 3))
+    return np.fft.ifft(swapPlaneParts(np.fft.ifft(spectrum, axis=2)), axis=3)
+
+
+def istPlaneBlock(data, shape, sampled, threshold, ittnum, tracelimit, NDmax):
+    # Joint IST of planes that are sampled non-uniformly along both axes.
+    # Every row of data is the flattened planeFft spectrum (with the first points along both axes scaled by 0.5)
+    # of the parts of a plane, shape is (parts, n1, n2) and sampled is a boolean array of shape (n1, n2).
+    # The thresholding is done on the magnitude of all parts together. The result is the spectrum in
+    # the representation of the input planes (for two parts: real and imaginary part along n1, complex along n2).
+    # All planes are iterated at the same time, a plane stops once its maximum is below NDmax * tracelimit.
+    spectrum = np.array(data, dtype=complex).reshape((data.shape[0], ) + tuple(shape))
+    result = np.zeros(spectrum.shape, dtype=complex)
+    residual = np.zeros(spectrum.shape, dtype=complex)
+    active = np.arange(spectrum.shape[0])
+    for itt in range(ittnum):
+        if len(active) == 0:
+            break
+        if itt > 0:
+            spectrum = planeFft(planes)
+        absSpectrum = np.sqrt(np.sum(spectrum.real**2 + spectrum.imag**2, axis=1))
+        height = np.max(absSpectrum, axis=(1, 2))
+        keep = height >= NDmax * tracelimit
+        residual[active[~keep]] = spectrum[~keep]
+        active = active[keep]
+        spectrum = spectrum[keep]
+        absSpectrum = absSpectrum[keep]
+        scale = absSpectrum - threshold * height[keep][:, np.newaxis, np.newaxis]
+        scale[scale < 0] = 0  # Zero all not used parts
+        absSpectrum[absSpectrum == 0] = 1
+        tmpspectrum = spectrum * (scale / absSpectrum)[:, np.newaxis]
+        result[active] += tmpspectrum
+        spectrum -= tmpspectrum
+        residual[active] = spectrum
+        planes = planeIfft(spectrum)
+        planes[:, :, ~sampled] = 0
+    result += residual
+    if result.shape[1] == 2:
+        result = swapPlaneParts(result)
+    result = np.fft.fftshift(result, axes=(2, 3))
+    return result.reshape(data.shape)
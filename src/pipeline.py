@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+
+# Copyright 2016 - 2019 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import functions as func
+import hypercomplex as hc
+import fftBackend as fftb
+
+#########################################################################
+# A processing pipeline records apodization, resizing, Fourier transform and
+# phasing steps along a single axis. Spectrum.processPipeline executes them.
+# When the steps are in the usual order (apodize, resize, Fourier transform,
+# phase) on time domain data, they are done in a single pass with one new
+# array and one FFT. Otherwise the steps are run one by one.
+
+
+class PipelineException(Exception):
+    pass
+
+
+class Pipeline(object):
+
+    def __init__(self, axis=-1):
+        self.axis = axis
+        self.steps = []
+
+    def apodize(self, lor=None, gauss=None, cos2=[None, None], hamming=None, shift=0.0):
+        self.steps.append(('apodize', (lor, gauss, cos2, hamming, shift)))
+        return self
+
+    def resize(self, size, pos):
+        self.steps.append(('resize', (int(size), int(pos))))
+        return self
+
+    def fourier(self):
+        self.steps.append(('fourier', ()))
+        return self
+
+    def phase(self, phase0=0.0, phase1=0.0):
+        self.steps.append(('phase', (phase0, phase1)))
+        return self
+
+    def isFusable(self, spec):
+        # Only apodize* resize? (fourier phase*)? on time domain data
+        if spec:
+            return False
+        order = {'apodize': 0, 'resize': 1, 'fourier': 2, 'phase': 3}
+        last = -1
+        names = [step[0] for step in self.steps]
+        if names.count('resize') > 1 or names.count('fourier') > 1:
+            return False
+        if 'phase' in names and 'fourier' not in names:
+            return False
+        for name in names:
+            if order[name] < last:
+                return False
+            last = order[name]
+        return True
+
+    def message(self, axis):
+        parts = []
+        for name, args in self.steps:
+            if name == 'apodize':
+                labels = ['Lorentzian', 'Gaussian', 'Cos2', 'Hamming', 'shift']
+                text = ', '.join([labels[i] + ' = ' + str(val) for i, val in enumerate(args) if val is not None and val != [None, None] and not (i == 4 and val == 0.0)])
+                parts.append('apodization (' + text + ')')
+            elif name == 'resize':
+                parts.append('resize to ' + str(args[0]) + ' points at position ' + str(args[1]))
+            elif name == 'fourier':
+                parts.append('Fourier transform')
+            elif name == 'phase':
+                parts.append('phasing (phase0 = ' + str(args[0] * 180 / np.pi) + ', phase1 = ' + str(args[1] * 180 / np.pi) + ')')
+        return "Processing pipeline for dimension " + str(axis + 1) + ": " + '; '.join(parts)
+
+    def runSteps(self, spectrum, axis):
+        # Run the steps one by one with the normal Spectrum methods
+        for name, args in self.steps:
+            if name == 'apodize':
+                spectrum.apodize(*args, axis=axis)
+            elif name == 'resize':
+                spectrum.resize(args[0], args[1], axis)
+            elif name == 'fourier':
+                spectrum.complexFourier(axis)
+            elif name == 'phase':
+                spectrum.phase(args[0], args[1], axis)
+
+    def run(self, spectrum, axis):
+        # The fused version of runSteps, for pipelines for which isFusable is True
+        data = spectrum.data
+        axLen = data.shape()[axis]
+        window = None
+        size = None
+        fourier = False
+        phase0 = 0.0
+        phase1 = 0.0
+        for name, args in self.steps:
+            if name == 'apodize':
+                lor, gauss, cos2, hamming, shift = args
+                x = func.apodizeVector(axLen, spectrum.sw[axis], shift, lor, gauss, cos2, hamming, spectrum.wholeEcho[axis])
+                window = x if window is None else window * x
+            elif name == 'resize':
+                size, pos = args
+            elif name == 'fourier':
+                fourier = True
+            elif name == 'phase':
+                phase0 += args[0]
+                phase1 += args[1]
+        if size is not None:
+            # Resizing only moves and inserts points, so the window can be resized the same way
+            out = data.resize(size, pos, axis)
+            if window is not None:
+                window = np.real(hc.HComplexData(window).resize(size, pos, 0).getHyperData(0))
+        else:
+            out = data.copy()
+        dataAxis = axis + 1 # Index along the hypercomplex axis is first
+        if window is not None:
+            out.data *= window.reshape(window.shape + (1, ) * (out.ndim() - axis - 1))
+        if fourier:
+            out.icomplexReorder(axis)
+            if not spectrum.wholeEcho[axis]:
+                out.data[(slice(None), ) * dataAxis + (0, )] *= 0.5
+            out.data = fftb.fft(out.data, dataAxis, shift=True)
+            if phase0 != 0.0 or phase1 != 0.0:
+                if spectrum.ref[axis] is None:
+                    offset = 0
+                else:
+                    offset = spectrum.freq[axis] - spectrum.ref[axis]
+                newLen = out.shape()[axis]
+                vector = func.phaseVector(newLen, spectrum.sw[axis], offset, phase0, phase1)
+                out.data *= vector.reshape(vector.shape + (1, ) * (out.ndim() - axis - 1))
+            out.icomplexReorder(axis)
+            spectrum.spec[axis] = 1
+        spectrum.data = out
+        spectrum.resetXax(axis)
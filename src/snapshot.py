@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+
+# Copyright 2016 - 2019 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import copy
+import tempfile
+import weakref
+from collections import OrderedDict
+import numpy as np
+
+DEFAULTBUDGET = None # Maximum number of bytes of undo data kept in memory per workspace, None for no limit
+COMPRESS = False # Compress the undo data that is moved to disk
+STORES = weakref.WeakSet() # All SnapshotStores, so a new default budget can be applied to the open workspaces
+
+#########################################################################
+# Undo information for Spectrum operations that cannot be inverted
+# by simply running another operation with different parameters.
+# Every class has a restore(spectrum) method, which is called from
+# Spectrum.restoreData.
+
+
+def isFullSelect(select):
+    if isinstance(select, slice):
+        return select == slice(None)
+    return False
+
+
+def setDefaultBudget(budget, compress=None):
+    global DEFAULTBUDGET, COMPRESS
+    if budget is not None and budget <= 0:
+        budget = None
+    DEFAULTBUDGET = budget
+    if compress is not None:
+        COMPRESS = bool(compress)
+    for store in list(STORES):
+        store.enforce()
+
+
+class SnapshotStore(object):
+    # Keeps track of the undo data of a single workspace.
+    # When the budget is exceeded, the least recently used data is written to a temporary file.
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.spills = 0
+        self.loads = 0
+        STORES.add(self)
+
+    def __deepcopy__(self, memo):
+        # A copied workspace starts with its own, empty, store
+        return SnapshotStore(self.budget)
+
+    def getBudget(self):
+        if self.budget is None:
+            return DEFAULTBUDGET
+        return self.budget
+
+    def setBudget(self, budget):
+        if budget is not None and budget <= 0:
+            budget = None
+        self.budget = budget
+        self.enforce()
+
+    def add(self, item):
+        key = id(item)
+        self.entries[key] = weakref.ref(item, lambda ref, key=key: self.entries.pop(key, None))
+        self.enforce()
+
+    def touch(self, item):
+        key = id(item)
+        if key in self.entries:
+            self.entries[key] = self.entries.pop(key)
+
+    def items(self):
+        items = [ref() for ref in list(self.entries.values())]
+        return [item for item in items if item is not None]
+
+    def memoryBytes(self):
+        return sum([item.nbytes() for item in self.items() if not item.spilled()])
+
+    def diskBytes(self):
+        return sum([item.nbytes() for item in self.items() if item.spilled()])
+
+    def enforce(self):
+        budget = self.getBudget()
+        if budget is None:
+            return
+        inMemory = self.memoryBytes()
+        for item in self.items(): # Oldest first
+            if inMemory <= budget:
+                break
+            if item.spilled() or item.nbytes() == 0:
+                continue
+            inMemory -= item.nbytes()
+            item.spill(COMPRESS)
+            self.spills += 1
+
+    def stats(self):
+        return {'entries': len(self.items()),
+                'memory': self.memoryBytes(),
+                'disk': self.diskBytes(),
+                'budget': self.getBudget(),
+                'spills': self.spills,
+                'loads': self.loads}
+
+
+class Snapshot(object):
+    # Base class for undo data that can be moved to disk
+
+    data = None
+    spillFile = None
+    store = None
+
+    def register(self, spectrum):
+        if self.store is not None: # Already registered
+            return
+        store = getattr(spectrum, 'undoStore', None)
+        if store is not None:
+            self.store = weakref.ref(store)
+            store.add(self)
+
+    def nbytes(self):
+        if self.data is None or self.data.isLazy() or isinstance(self.data.data, np.memmap): # Data that is already on disk
+            return 0
+        if self.spillFile is not None:
+            return self.spillBytes
+        return self.data.data.nbytes
+
+    def spilled(self):
+        return self.spillFile is not None
+
+    def spill(self, compress=False):
+        if self.nbytes() == 0 or self.spillFile is not None:
+            return
+        fd, fileName = tempfile.mkstemp(prefix='ssnake_undo_', suffix='.npz' if compress else '.npy')
+        with os.fdopen(fd, 'wb') as f:
+            if compress:
+                np.savez_compressed(f, data=self.data.data)
+            else:
+                np.save(f, self.data.data)
+        self.spillBytes = self.data.data.nbytes
+        self.spillCompressed = compress
+        self.spillFile = fileName
+        self.data.data = None
+
+    def load(self):
+        store = None
+        if self.store is not None:
+            store = self.store()
+        if self.spillFile is not None:
+            if self.spillCompressed:
+                with np.load(self.spillFile) as f:
+                    self.data.data = f['data']
+            else:
+                self.data.data = np.load(self.spillFile)
+            self.removeSpill()
+            if store is not None:
+                store.loads += 1
+        if store is not None:
+            store.touch(self)
+
+    def removeSpill(self):
+        if self.spillFile is not None:
+            try:
+                os.remove(self.spillFile)
+            except OSError:
+                pass
+            self.spillFile = None
+
+    def __del__(self):
+        self.removeSpill()
+
+
+class DataSnapshot(Snapshot):
+    # Stores the data (or only the selected part of it) together with the axis information
+
+    def __init__(self, spectrum, select=slice(None), copyData=True):
+        # Use copyData=False only when the operation replaces the data object of the spectrum.
+        # The shared data is then still in use by the spectrum, so it cannot be moved to disk yet,
+        # and the caller should call register(spectrum) once the data object has been replaced.
+        shared = False
+        if isFullSelect(select):
+            self.select = None
+            if copyData:
+                self.data = spectrum.data.copy()
+            else:
+                self.data = spectrum.data
+                shared = True
+        else:
+            if not isinstance(select, tuple):
+                select = tuple(select)
+            self.select = select
+            self.data = spectrum.data[select].copy()
+        self.filePath = spectrum.filePath
+        self.freq = np.copy(spectrum.freq)
+        self.sw = np.copy(spectrum.sw)
+        self.spec = copy.copy(spectrum.spec)
+        self.wholeEcho = copy.copy(spectrum.wholeEcho)
+        self.ref = np.copy(spectrum.ref)
+        self.xaxArray = [copy.copy(xax) for xax in spectrum.xaxArray]
+        if not shared:
+            self.register(spectrum)
+
+    def restore(self, spectrum):
+        self.load()
+        if self.select is None:
+            spectrum.data = self.data
+            self.data = None # The data is in use by the spectrum now, so it should no longer be moved to disk
+        else:
+            spectrum.data[self.select] = self.data
+        spectrum.filePath = self.filePath
+        spectrum.freq = self.freq
+        spectrum.sw = self.sw
+        spectrum.spec = self.spec
+        spectrum.wholeEcho = self.wholeEcho
+        spectrum.ref = self.ref
+        spectrum.xaxArray = self.xaxArray
+
+
+class DeleteSnapshot(Snapshot):
+    # Stores only the datapoints that are removed by a delete
+
+    def __init__(self, spectrum, pos, axis):
+        length = spectrum.shape()[axis]
+        self.axis = axis
+        self.pos = np.unique(np.mod(np.array(pos, dtype=int).flatten(), length))
+        self.data = spectrum.data[(slice(None), ) * axis + (self.pos, )]
+        self.xax = np.copy(np.array(spectrum.xaxArray[axis])[self.pos])
+        self.register(spectrum)
+
+    def restore(self, spectrum):
+        self.load()
+        axis = self.axis
+        length = spectrum.shape()[axis] + len(self.pos)
+        keep = np.ones(length, dtype=bool)
+        keep[self.pos] = False
+        tmpShape = list(spectrum.data.data.shape)
+        tmpShape[axis + 1] = length
+        tmpData = np.zeros(tmpShape, dtype=spectrum.data.data.dtype)
+        slicing = (slice(None), ) * (axis + 1)
+        tmpData[slicing + (keep, )] = spectrum.data.data
+        tmpData[slicing + (self.pos, )] = self.data.data
+        spectrum.data.data = tmpData
+        xax = np.zeros(length, dtype=np.result_type(spectrum.xaxArray[axis], self.xax))
+        xax[keep] = spectrum.xaxArray[axis]
+        xax[self.pos] = self.xax
+        spectrum.xaxArray[axis] = xax
+
+
+class InverseOperation(object):
+    # Restores the data by running an inverse function, for operations that are
+    # invertible, but have no Spectrum method that does the inverse
+
+    def __init__(self, func):
+        self.func = func
+
+    def restore(self, spectrum):
+        self.func(spectrum)
@@ -24,10 +24,21 @@ from six import string_types
 import spectrum as sc
 import hypercomplex as hc
 
+SSNAKEMAGIC = b'SSNAKE01'
+SSNAKEDATASTART = 64 # The data starts at this offset, so it is aligned for memory mapping
+SSNAKECHUNK = 16 * 1024**2 # Size of the data chunks in bytes
+SSNAKECOMPRESSLEVEL = 1 # zlib level, low levels are much faster with almost the same size for noisy data
+JSONVERSION = 2 # Version of the JSON files with binary data blocks, files without a version are lists of numbers
+JSONBLOCK = 3 * 1024**2 # Number of bytes that is encoded at a time, must be a multiple of 3
+LOADTHREADS = None # Number of threads that load the files that are combined, None uses all cpu cores
+
 class LoadException(sc.SpectrumException):
     pass
 
-def autoLoad(filePathList, asciiInfoList=None):
+def autoLoad(filePathList, asciiInfoList=None, progress=None):
+    """ Loads a file, or combines a list of files with the same shape along a new first dimension.
+        The files after the first are loaded by a pool of threads and copied into
+        a single preallocated array. progress(done, total) is called after every file. """
     if isinstance(filePathList, string_types):
         filePathList = [filePathList]
     if asciiInfoList is None:
@@ -35,17 +46,58 @@ def autoLoad(filePathList, asciiInfoList=None):
     masterData = autoLoadSingle(filePathList[0], asciiInfoList[0])
     if isinstance(masterData, int) and len(filePathList) > 1:
         raise LoadException("ASCII data cannot be combined")
-    if len(filePathList) == 1:
+    total = len(filePathList)
+    if progress is not None:
+        progress(1, total)
+    if total == 1:
         return masterData
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
     shapeRequired = masterData.shape()
-    masterData.split(1, -1)
-    for i in range(len(filePathList)-1):
-        addData = autoLoad(filePathList[i+1], asciiInfoList[i+1])
-        if addData is None:
-            continue
-        if addData.shape() != shapeRequired:
-            raise LoadException("Not all the data has the required shape")
-        masterData.insert(addData.data, masterData.shape()[0], 0)
+    first = masterData.data
+    combined = hc.HComplexData()
+    combined.data = np.empty((len(first.hyper), total) + tuple(shapeRequired), dtype=first.dtype())
+    combined.hyper = np.copy(first.hyper)
+    combined[0] = first
+    count = 1
+    nThreads = LOADTHREADS
+    if nThreads is None:
+        nThreads = multiprocessing.cpu_count()
+    nThreads = max(1, min(nThreads, total - 1))
+    pool = ThreadPool(nThreads)
+    try:
+        # Load in batches, so that only a few loaded files are waiting to be copied
+        batchSize = 4 * nThreads
+        for start in range(1, total, batchSize):
+            stop = min(start + batchSize, total)
+            batch = pool.map(lambda i: autoLoadSingle(filePathList[i], asciiInfoList[i]), range(start, stop))
+            for addData in batch:
+                if addData is None:
+                    continue
+                if not isinstance(addData, sc.Spectrum) or addData.shape() != shapeRequired:
+                    raise LoadException("Not all the data has the required shape")
+                dtype = np.result_type(combined.data, addData.data.dtype())
+                if dtype != combined.data.dtype:
+                    combined.data = combined.data.astype(dtype)
+                combined[count] = addData.data
+                count += 1
+            if progress is not None:
+                progress(stop, total)
+    finally:
+        pool.close()
+        pool.join()
+    if count < total: # Files that could not be loaded are skipped
+        combined.data = np.copy(combined.data[:, :count])
+    # The new first axis is added without undo information, as the data is replaced afterwards
+    noUndo = masterData.noUndo
+    masterData.noUndo = True
+    try:
+        masterData.split(1, -1)
+    finally:
+        masterData.noUndo = noUndo
+    masterData.data = combined
+    masterData.resetXax(0)
+    masterData.addHistory("Combined " + str(count) + " files in dimension 1")
     masterData.filePath = (filePathList, asciiInfoList)
     return masterData
 
@@ -60,6 +112,8 @@ def autoLoadSingle(filePath, asciiInfo=None):
             for i in os.listdir(temp_dir):
                 tmpSpec = loadFile(os.path.join(temp_dir, i), realpath=filePath, asciiInfo=asciiInfo)
                 if tmpSpec:
+                    if isinstance(tmpSpec, sc.Spectrum):
+                        tmpSpec.data.materialise() # The temporary files are removed
                     break
         finally:
             shutil.rmtree(temp_dir)
@@ -115,9 +169,103 @@ def loadFile(filePath, realpath=False, asciiInfo=None):
         masterData = loadBrukerWinNMR(filePath)
     elif num == 16:
         masterData = loadMestreC(filePath)
+    elif num == 17:
+        masterData = loadSsnakeFile(filePath)
     masterData.rename(name)
     return masterData
 
+def probe(filePath, allowLoad=True):
+    """ Returns the information of a data file without loading the data.
+        Only the headers and parameter files are read. The result is a
+        dictionary with the format, the path of the data, the shape, the dtype
+        of the stored values (None for text formats), the hypercomplex parts,
+        freq, sw, spec, ref, the metaData and the nucleus of the direct
+        dimension (if it is known). None is returned for files that
+        are not recognised. MATLAB, Siemens IMA, MestreC and JSON files without
+        binary data blocks are loaded fully, or give only the format if allowLoad
+        is False. ASCII files only give the format. """
+    val = fileTypeCheck(filePath)
+    num = val[0]
+    filePath = val[1]
+    if num is None:
+        return None
+    if not allowLoad and num in (6, 14, 16):
+        return probeResult(['MATLAB', 'Siemens IMA', 'MestreC'][(6, 14, 16).index(num)], filePath, None, None, None, None, None)
+    if num == 0:
+        return probeVarianFile(filePath)
+    elif num == 1:
+        return probeBrukerTopspin(filePath)
+    elif num == 2:
+        return probeChemFile(filePath)
+    elif num == 3:
+        return probeMagritek(filePath)
+    elif num == 4:
+        return probeSimpsonFile(filePath)
+    elif num == 5:
+        return probeJSONFile(filePath, allowLoad)
+    elif num == 6:
+        return probeSpectrum('MATLAB', filePath, loadMatlabFile(filePath))
+    elif num == 7:
+        return probeBrukerSpectrum(filePath)
+    elif num == 8:
+        return probePipe(filePath)
+    elif num == 9:
+        return probeJEOLDelta(filePath)
+    elif num == 10:
+        return probeJCAMP(filePath)
+    elif num == 11:
+        return probeResult('ASCII', filePath, None, None, None, None, None)
+    elif num == 12:
+        return probeMinispec(filePath)
+    elif num == 13:
+        return probeBrukerEPR(filePath)
+    elif num == 14:
+        return probeSpectrum('Siemens IMA', filePath, loadSiemensIMA(filePath))
+    elif num == 15:
+        return probeBrukerWinNMR(filePath)
+    elif num == 16:
+        return probeSpectrum('MestreC', filePath, loadMestreC(filePath))
+    elif num == 17:
+        return probeSsnakeFile(filePath)
+
+def probeResult(fileFormat, filePath, shape, dtype, freq, sw, spec, ref=None, hyper=None, metaData=None, nucleus=None):
+    if shape is not None:
+        shape = tuple(int(x) for x in shape)
+        if ref is None:
+            ref = [None] * len(shape)
+        if hyper is None:
+            hyper = [0]
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+    if freq is not None:
+        freq = [float(x) for x in freq]
+    if sw is not None:
+        sw = [float(x) for x in sw]
+    if spec is not None:
+        spec = [bool(x) for x in spec]
+    if ref is not None:
+        ref = [None if x is None or np.isnan(x) else float(x) for x in ref]
+    if hyper is not None:
+        hyper = [int(x) for x in hyper]
+    if metaData is None:
+        metaData = dict()
+    return {'format': fileFormat,
+            'filePath': filePath,
+            'shape': shape,
+            'dtype': dtype,
+            'hyper': hyper,
+            'freq': freq,
+            'sw': sw,
+            'spec': spec,
+            'ref': ref,
+            'metaData': metaData,
+            'nucleus': nucleus}
+
+def probeSpectrum(fileFormat, filePath, spectrum):
+    # For formats of which the header cannot be read separately
+    return probeResult(fileFormat, filePath, spectrum.shape(), spectrum.data.dtype(), spectrum.freq, spectrum.sw,
+                       spectrum.spec, spectrum.ref, spectrum.data.hyper, dict(spectrum.metaData))
+
 def fileTypeCheck(filePath):
     returnVal = 0
     fileBase = ''
@@ -156,6 +304,8 @@ def fileTypeCheck(filePath):
             return (15, filePath, returnVal)        
         elif filename.lower().endswith('.mrc') :  # MestreC
             return (16, filePath, returnVal)        
+        elif filename.lower().endswith('.ssnake'):  # Binary ssNake format
+            return (17, filePath, returnVal)
         returnVal = 1
         direc = os.path.dirname(filePath)
     if os.path.exists(direc + os.path.sep + 'procpar') and os.path.exists(direc + os.path.sep + 'fid'):
@@ -265,7 +415,17 @@ def loadVarianFile(filePath):
             else:
                 bitType = ['>h', np.int16, 14]
         totalpoints = (ntraces * npoints + nbheaders**2 * bitType[2])*nblocks
-        fid = np.fromfile(f, bitType[1], totalpoints).newbyteorder(bitType[0]).astype(np.complex128)
+        dataStart = f.tell()
+        if not spec and os.path.getsize(filePath) >= dataStart + totalpoints * np.dtype(bitType[1]).itemsize:
+            # Map the file to memory, data is only read when it is needed
+            raw = np.memmap(filePath, np.dtype(bitType[1]).newbyteorder('>'), 'r', dataStart, (nblocks, int(totalpoints / nblocks)))
+            raw = raw[:, bitType[2]::] # Cut off block headers
+            raw = raw.reshape((nblocks, -1, 2))
+            if SizeTD1 == 1:
+                raw = raw[0]
+            fid = hc.HComplexData(source=hc.MemmapSource(raw, -1, np.exp((rp + phfid) / 180 * np.pi * 1j)))
+            return varianSpectrum(fid, filePath, SizeTD1, spec, freq, sw, reffreq, freq1, sw1, reffreq1, pars)
+        fid = np.fromfile(f, bitType[1], totalpoints).newbyteorder(bitType[0]).astype(hc.getDtype())
         if not spec or (spec and not hypercomplex):
             fid = fid.reshape(nblocks, int(totalpoints / nblocks))
             fid = fid[:, bitType[2]::] # Cut off block headers
@@ -281,24 +441,76 @@ def loadVarianFile(filePath):
         fid = fid[0][:]
         if spec:  # flip if spectrum
             fid = np.flipud(fid)
+    return varianSpectrum(fid, filePath, SizeTD1, spec, freq, sw, reffreq, freq1, sw1, reffreq1, pars)
+
+def probeVarianFile(filePath):
+    if os.path.isfile(filePath):
+        Dir = os.path.dirname(filePath)
+    else:
+        Dir = filePath
+    if os.path.exists(Dir + os.path.sep + 'procpar'):
+        pars = varianGetPars(Dir + os.path.sep + 'procpar')
+    else:
+        pars = varianGetPars(Dir + os.path.sep + '..' + os.path.sep + 'procpar')
+    if os.path.exists(Dir + os.path.sep + 'fid'):
+        filePath = Dir + os.path.sep + 'fid'
+    else:
+        filePath = Dir + os.path.sep + 'data'
+    with open(filePath, "rb") as f:
+        nblocks, ntraces, npoints, ebytes, tbytes, bbytes  = np.fromfile(f, np.int32, 6).newbyteorder('>l')
+        status = np.fromfile(f, np.int16, 2).newbyteorder('>h')[1]
+    status = '{0:016b}'.format(status)[::-1]
+    spec, fid32, fidfloat, hypercomplex, flipped = np.array([bool(int(x)) for x in status])[[1,2,3,5,9]]
+    SizeTD1 = nblocks * ntraces
+    if fidfloat:
+        dtype = '>f4'
+    elif fid32:
+        dtype = '>i4'
+    else:
+        dtype = '>i2'
+    if spec and hypercomplex:
+        shape = (SizeTD1 // 4, npoints)
+    else:
+        shape = (nblocks, ntraces * npoints // 2)
+    freq = pars['sfrq'] * 1e6
+    sw = pars['sw']
+    reffreq = pars['reffrq'] * 1e6
+    if SizeTD1 == 1:
+        return probeResult('Varian', filePath, shape[1:], dtype, [freq], [sw], [spec], [reffreq], metaData=varianMetaData(pars), nucleus=pars.get('tn'))
+    sw1, reffreq1, freq1 = (1, None, 0)
+    if 'sw1' in pars:
+        indirectRef = pars.get('refsource1', 'dfrq')
+        reffreq1 = pars['reffrq1'] * 1e6
+        sw1 = pars['sw1']
+        freq1 = pars[indirectRef] * 1e6
+    return probeResult('Varian', filePath, shape, dtype, [freq1, freq], [sw1, sw], [spec] * 2, [reffreq1, reffreq], metaData=varianMetaData(pars), nucleus=pars.get('tn'))
+
+def varianSpectrum(fid, filePath, SizeTD1, spec, freq, sw, reffreq, freq1, sw1, reffreq1, pars):
+    if SizeTD1 == 1:
         masterData = sc.Spectrum(fid, (filePath, None), [freq], [sw], [bool(int(spec))], ref=[reffreq])
     else:
         masterData = sc.Spectrum(fid, (filePath, None), [freq1, freq], [sw1, sw], [bool(int(spec))] * 2, ref=[reffreq1, reffreq])
     masterData.addHistory("Varian data loaded from " + filePath)
+    masterData.metaData.update(varianMetaData(pars))
+    return masterData
+
+def varianMetaData(pars):
+    metaData = dict()
     try:
-        masterData.metaData['# Scans'] = str(pars['nt'])
-        masterData.metaData['Acquisition Time [s]'] = str(pars['at'])
-        masterData.metaData['Experiment Name'] = pars['seqfil']
-        masterData.metaData['Receiver Gain'] = str(pars['gain'])
-        masterData.metaData['Recycle Delay [s]'] = str(pars['d1'])
-        masterData.metaData['Time Completed'] = pars['time_complete']
-        masterData.metaData['Offset [Hz]'] = str(pars['tof'])
-        masterData.metaData['Sample'] = pars['samplename']
+        metaData['# Scans'] = str(pars['nt'])
+        metaData['Acquisition Time [s]'] = str(pars['at'])
+        metaData['Experiment Name'] = pars['seqfil']
+        metaData['Receiver Gain'] = str(pars['gain'])
+        metaData['Recycle Delay [s]'] = str(pars['d1'])
+        metaData['Time Completed'] = pars['time_complete']
+        metaData['Offset [Hz]'] = str(pars['tof'])
+        metaData['Sample'] = pars['samplename']
     except Exception:
         pass
-    return masterData
+    return metaData
 
-def loadPipe(filePath):
+def pipeGetHeader(filePath):
+    """ Reads the axis information from the header of an NMRpipe file """
     with open(filePath, 'r') as f:
         header = np.fromfile(f, np.float32, 512)
     NDIM = int(header[9])
@@ -314,6 +526,10 @@ def loadPipe(filePath):
     for i in range(len(spec)): #get reference frequencies
         sidefreq = -np.floor(SIZE[i] / 2) / SIZE[i] * sw[i]  # frequency of last point on axis
         ref[i] = sidefreq + freq[i] - ref[i]
+    return NDIM, SIZE, quadFlag, spec, freq, sw, ref, numFiles, pipeFlag, cubeFlag
+
+def loadPipe(filePath):
+    NDIM, SIZE, quadFlag, spec, freq, sw, ref, numFiles, pipeFlag, cubeFlag = pipeGetHeader(filePath)
     TotP = SIZE[3] * SIZE[2] #Max file size
     if quadFlag[3] == 0:  # if complex direct axis
         TotP = TotP * 2
@@ -373,6 +589,18 @@ def loadPipe(filePath):
     masterData.addHistory("NMRpipe data loaded from " + filePath)
     return masterData
 
+def probePipe(filePath):
+    NDIM, SIZE, quadFlag, spec, freq, sw, ref, numFiles, pipeFlag, cubeFlag = pipeGetHeader(filePath)
+    shape = list(SIZE[4 - NDIM:4])
+    if NDIM > 2 and pipeFlag == 0: # The first axis is split over the files
+        shape[0] = numFiles
+    hyper = np.array([0])
+    for dim in range(NDIM - 1):
+        if quadFlag[4 - NDIM + dim] == 0: # Hypercomplex axis, real and imaginary parts are interleaved
+            shape[dim] = (shape[dim] + 1) // 2
+            hyper = np.append(hyper, hyper + 2**dim)
+    return probeResult('NMRpipe', filePath, shape, np.float32, freq[4 - NDIM:4], sw[4 - NDIM:4], spec[4 - NDIM:4], ref[4 - NDIM:4], hyper)
+
 def getJEOLpars(filePath,endian,start,length):
     from struct import unpack
     with open(filePath, "rb") as f:
@@ -421,7 +649,9 @@ def multiUP(header,typ, bit, num, start):
     from struct import unpack
     return np.array([unpack(typ,header[start + x:start + bit + x])[0] for x in range(0,num * bit,bit)])
 
-def loadJEOLDelta(filePath):
+def jeolGetHeader(filePath):
+    """ Reads the header of a JEOL Delta file, returns a dictionary with the
+        values that are needed to read the data and the axis information """
     with open(filePath, "rb") as f:
         header = f.read(1296)
     endian =['>d','<d'][multiUP(header,'>B', 1, 1, 8)[0]]
@@ -445,7 +675,39 @@ def loadJEOLDelta(filePath):
     #data_length = multiUP(header,'>Q', 8, 1, 1288)[0]
     hdrPars = getJEOLpars(filePath,endian,paramStart,paramLength)
     dFilter = getJEOLdFilter(hdrPars)
+    freq = baseFreq[0:NDIM][::-1] * 1e6
+    spec = dataUnits[0:NDIM,1][::-1] != 28 #If not 28 (sec), then spec = true
+    sw = []
+    ref = []
+    for axisNum in reversed(range(NDIM)):
+        axisType = dataUnits[axisNum][1]  # Sec = 28, Hz = 13, PPM = 26
+        axisScale = dataUnits[axisNum][0]
+        if axisType == 28:  # Sec
+            scale = convJEOLunit(axisScale)
+            dw = (axisStop[axisNum] - axisStart[axisNum]) / (dataStop[axisNum] + 1 - 1) * scale  
+            sw.append(1.0 / dw)
+            ref.append(baseFreq[axisNum] * 1e6)
+        if axisType == 13:  # Hz
+            sw.append(np.abs(axisStart[axisNum] - axisStop[axisNum]))
+            sidefreq = -np.floor((dataStop[axisNum] + 1) / 2) / (dataStop[axisNum] + 1) * sw[-1]  # frequency of last point on axis
+            ref.append(sidefreq + baseFreq[axisNum] * 1e6 - axisStop[axisNum])
+        if axisType == 26:  # ppm
+            sw.append(np.abs(axisStart[axisNum] - axisStop[axisNum]) * baseFreq[axisNum])
+            sidefreq = -np.floor((dataStop[axisNum] + 1) / 2) / (dataStop[axisNum] + 1) * sw[-1]  # frequency of last point on axis
+            ref.append(sidefreq + baseFreq[axisNum] * 1e6 - axisStop[axisNum] * baseFreq[axisNum])
+    return {'endian': endian, 'NDIM': NDIM, 'dataType': dataType, 'NP': NP, 'dataStop': dataStop,
+            'readStart': readStart, 'dFilter': dFilter, 'pars': hdrPars,
+            'freq': freq, 'spec': spec, 'sw': sw, 'ref': ref}
 
+def loadJEOLDelta(filePath):
+    header = jeolGetHeader(filePath)
+    endian = header['endian']
+    NDIM = header['NDIM']
+    dataType = header['dataType']
+    NP = header['NP']
+    dataStop = header['dataStop']
+    readStart = header['readStart']
+    spec = header['spec']
     loadSize = np.prod(NP[:NDIM])
     if NDIM == 1 and (dataType[0] == 3 or dataType[0] == 4): #Complex 1D
         loadSize *= 2
@@ -482,69 +744,145 @@ def loadJEOLDelta(filePath):
         useSlice = eS * (NDIM - dim - 1) +(slice(0,dataStop[dim] + 1,None),) + eS * dim
         for i in range(len(data)):
             data[i] = data[i][useSlice]
-    freq = baseFreq[0:NDIM][::-1] * 1e6
-    spec = dataUnits[0:NDIM,1][::-1] != 28 #If not 28 (sec), then spec = true
-    sw = []
-    ref = []
-    for axisNum in reversed(range(NDIM)):
-        axisType = dataUnits[axisNum][1]  # Sec = 28, Hz = 13, PPM = 26
-        axisScale = dataUnits[axisNum][0]
-        if axisType == 28:  # Sec
-            scale = convJEOLunit(axisScale)
-            dw = (axisStop[axisNum] - axisStart[axisNum]) / (dataStop[axisNum] + 1 - 1) * scale  
-            sw.append(1.0 / dw)
-            ref.append(baseFreq[axisNum] * 1e6)
-        if axisType == 13:  # Hz
-            sw.append(np.abs(axisStart[axisNum] - axisStop[axisNum]))
-            sidefreq = -np.floor((dataStop[axisNum] + 1) / 2) / (dataStop[axisNum] + 1) * sw[-1]  # frequency of last point on axis
-            ref.append(sidefreq + baseFreq[axisNum] * 1e6 - axisStop[axisNum])
-        if axisType == 26:  # ppm
-            sw.append(np.abs(axisStart[axisNum] - axisStop[axisNum]) * baseFreq[axisNum])
-            sidefreq = -np.floor((dataStop[axisNum] + 1) / 2) / (dataStop[axisNum] + 1) * sw[-1]  # frequency of last point on axis
-            ref.append(sidefreq + baseFreq[axisNum] * 1e6 - axisStop[axisNum] * baseFreq[axisNum])
     for k in range(len(data)): #Flip LR if spectrum axis
         for i in range(NDIM):
             if spec[-1 - i] == 1:
                 data[k] = np.flip(data[k], NDIM -1 - i)
-    masterData = sc.Spectrum(hc.HComplexData(np.array(data), hyper), (filePath, None), freq, sw, spec, ref=ref, dFilter = dFilter)
+    masterData = sc.Spectrum(hc.HComplexData(np.array(data), hyper), (filePath, None), header['freq'], header['sw'], spec, ref=header['ref'], dFilter = header['dFilter'])
     masterData.addHistory("JEOL Delta data loaded from " + filePath)
     return masterData
 
-def saveJSONFile(filePath, spectrum):
+def probeJEOLDelta(filePath):
+    header = jeolGetHeader(filePath)
+    NDIM = header['NDIM']
+    dataType = header['dataType']
+    shape = [header['dataStop'][NDIM - 1 - i] + 1 for i in range(NDIM)]
+    hyper = [0]
+    if NDIM == 2 and dataType[0] == 3 and dataType[1] == 3:
+        hyper = [0, 1]
+    return probeResult('JEOL Delta', filePath, shape, header['endian'], header['freq'], header['sw'], header['spec'], header['ref'], hyper)
+
+def saveJSONFile(filePath, spectrum, binary=False):
+    """ Saves a spectrum as JSON.
+        With binary the data and axes are stored as base64 encoded blocks
+        with their dtype and shape, which are written in parts, instead of
+        as lists of numbers. """
     import json
     struct = {}
     item = spectrum.data
-    struct['dataReal'] = np.real(item.data).tolist()
-    struct['dataImag'] = np.imag(item.data).tolist()
+    tmpData = item.data
     struct['hyper'] = item.hyper.tolist()
     struct['freq'] = spectrum.freq.tolist()
     struct['sw'] = list(spectrum.sw)
     struct['spec'] = list(1.0 * np.array(spectrum.spec))
     struct['wholeEcho'] = list(1.0 * np.array(spectrum.wholeEcho))
-    struct['ref'] = np.array(spectrum.ref, dtype=np.float).tolist()
+    struct['ref'] = np.array(spectrum.ref, dtype=float).tolist()
     struct['history'] = spectrum.history
     struct['metaData'] = spectrum.metaData
     if spectrum.dFilter is not None:
         struct['dFilter'] = spectrum.dFilter
-    tmpXax = []
-    for i in spectrum.xaxArray:
-        tmpXax.append(i.tolist())
-    struct['xaxArray'] = tmpXax
+    if not binary:
+        struct['dataReal'] = np.real(tmpData).tolist()
+        struct['dataImag'] = np.imag(tmpData).tolist()
+        tmpXax = []
+        for i in spectrum.xaxArray:
+            tmpXax.append(i.tolist())
+        struct['xaxArray'] = tmpXax
+        with open(filePath, 'w') as outfile:
+            json.dump(struct, outfile)
+        return
+    struct['version'] = JSONVERSION
     with open(filePath, 'w') as outfile:
-        json.dump(struct, outfile)
+        outfile.write(json.dumps(struct)[:-1])
+        outfile.write(', "dataReal": ')
+        writeJSONBlock(outfile, np.real(tmpData))
+        outfile.write(', "dataImag": ')
+        writeJSONBlock(outfile, np.imag(tmpData))
+        outfile.write(', "xaxArray": [')
+        for i, xax in enumerate(spectrum.xaxArray):
+            if i > 0:
+                outfile.write(', ')
+            writeJSONBlock(outfile, np.asarray(xax, dtype=float))
+        outfile.write(']}')
+
+def writeJSONBlock(outfile, data):
+    import json
+    import base64
+    dtype = np.dtype(data.dtype).newbyteorder('<')
+    flat = data.reshape(-1)
+    outfile.write('{"dtype": ' + json.dumps(dtype.str) + ', "shape": ' + json.dumps(list(data.shape)) + ', "base64": "')
+    step = 3 * max(1, JSONBLOCK // (3 * dtype.itemsize)) # A multiple of 3 bytes gives base64 without padding in between
+    for start in range(0, len(flat), step):
+        block = np.ascontiguousarray(flat[start:start + step], dtype=dtype).tobytes()
+        outfile.write(base64.b64encode(block).decode('ascii'))
+    outfile.write('"}')
+
+def readJSONBlock(inputfile, block, out=None):
+    # Decodes a binary block of a JSON file in parts, into out if it is given
+    import base64
+    begin, end = block['base64']
+    dtype = np.dtype(str(block['dtype']))
+    shape = tuple(block['shape'])
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    flat = out.reshape(-1)
+    step = 3 * max(1, JSONBLOCK // (3 * dtype.itemsize))
+    nChars = step * dtype.itemsize * 4 // 3
+    pos = 0
+    for start in range(begin, end, nChars):
+        part = np.frombuffer(base64.b64decode(inputfile[start:min(start + nChars, end)]), dtype=dtype)
+        flat[pos:pos + len(part)] = part
+        pos += len(part)
+    if pos != flat.size:
+        raise LoadException('Binary data in JSON file is incomplete')
+    return out
+
+def splitJSONFile(inputfile):
+    # Returns the JSON text with the base64 strings replaced by their positions in the file
+    marker = b'"base64": "'
+    parts = []
+    pos = 0
+    while True:
+        begin = inputfile.find(marker, pos)
+        if begin == -1:
+            break
+        begin += len(marker)
+        end = inputfile.find(b'"', begin)
+        parts.append(inputfile[pos:begin - 1])
+        parts.append(('[' + str(begin) + ', ' + str(end) + ']').encode('ascii'))
+        pos = end + 1
+    parts.append(inputfile[pos:])
+    return b''.join(parts).decode('utf-8')
 
 def loadJSONFile(filePath):
+    """ Loads a JSON file, both with lists of numbers and with binary data blocks. """
     import json
-    with open(filePath, 'r') as inputfile:
-        struct = json.load(inputfile)
+    import mmap
+    with open(filePath, 'rb') as f:
+        inputfile = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        struct = json.loads(splitJSONFile(inputfile))
+        if struct.get('version', 1) > JSONVERSION:
+            raise LoadException('JSON file version ' + str(struct['version']) + ' is not supported')
+        if isinstance(struct['dataReal'], dict):
+            data = np.empty(tuple(struct['dataReal']['shape']), dtype=complex)
+            readJSONBlock(inputfile, struct['dataReal'], data.real)
+            readJSONBlock(inputfile, struct['dataImag'], data.imag)
+        else:
+            data = np.array(struct['dataReal']) + 1j * np.array(struct['dataImag'])
+        xaxA = []
+        for i in struct['xaxArray']:
+            if isinstance(i, dict):
+                xaxA.append(readJSONBlock(inputfile, i).astype(float))
+            else:
+                xaxA.append(np.array(i))
+    finally:
+        inputfile.close()
     if 'hyper' in struct.keys():
         hyper = list(struct['hyper'])
-        tmpReal = struct['dataReal']
-        tmpImag = struct['dataImag']
-        data = np.array(tmpReal) + 1j * np.array(tmpImag)
     else:
         hyper = [0]
-        data = np.array([np.array(struct['dataReal']) + 1j * np.array(struct['dataImag'])])
+        data = np.array([data])
     ref = np.where(np.isnan(struct['ref']), None, struct['ref'])
     if 'dFilter' in struct.keys():
         dFilter = struct['dFilter']
@@ -554,9 +892,6 @@ def loadJSONFile(filePath):
         history = struct['history']
     else:
         history = None
-    xaxA = []
-    for i in struct['xaxArray']:
-        xaxA.append(np.array(i))
     metaData = dict()
     if 'metaData' in struct:
         tmp = struct['metaData']
@@ -576,6 +911,74 @@ def loadJSONFile(filePath):
     masterData.addHistory("JSON data loaded from " + filePath)
     return masterData
 
+def readJSONHeader(inputfile):
+    # For JSON files with the data as lists of numbers: returns the JSON without parsing dataReal and dataImag.
+    # These lists contain no quotes, so their end is found by searching for the next key. They are replaced
+    # by None, and their number of opening brackets and the length of their first row are stored in 'dataLists'.
+    import json
+    pattern = re.compile(b'"(dataReal|dataImag)"\\s*:\\s*')
+    parts = []
+    dataLists = dict()
+    pos = 0
+    while True:
+        match = pattern.search(inputfile, pos)
+        if match is None:
+            break
+        begin = match.end()
+        end = inputfile.find(b'"', begin)
+        if end == -1:
+            end = len(inputfile)
+        end = inputfile.rfind(b']', begin, end) + 1
+        firstRow = inputfile[begin:inputfile.find(b']', begin)]
+        numBrackets = firstRow.count(b'[')
+        firstRow = firstRow.replace(b'[', b'').strip()
+        dataLists[match.group(1).decode('ascii')] = (numBrackets, firstRow.count(b',') + 1 if firstRow else 0)
+        parts.append(inputfile[pos:begin])
+        parts.append(b'null')
+        pos = end
+    parts.append(inputfile[pos:])
+    struct = json.loads(b''.join(parts).decode('utf-8'))
+    struct['dataLists'] = dataLists
+    return struct
+
+def probeJSONFile(filePath, allowLoad=True):
+    import json
+    import mmap
+    with open(filePath, 'rb') as f:
+        inputfile = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # Files with binary blocks have a version before the first data
+        first = re.search(b'"(dataReal|dataImag|xaxArray)"\\s*:', inputfile)
+        if first is not None and re.search(b'"version"\\s*:', inputfile[:first.start()]) is not None:
+            struct = json.loads(splitJSONFile(inputfile))
+        else:
+            struct = readJSONHeader(inputfile)
+    finally:
+        inputfile.close()
+    if 'dataLists' in struct:
+        # The number of dimensions and the last length follow from the lists, the other lengths from the axes
+        numBrackets, rowLength = struct['dataLists'].get('dataReal', (0, 0))
+        ndim = numBrackets - ('hyper' in struct.keys())
+        if 'xaxArray' in struct.keys() and len(struct['xaxArray']) == ndim:
+            shape = [len(xax) for xax in struct['xaxArray']]
+        elif ndim == 1:
+            shape = [rowLength]
+        elif allowLoad:
+            return probeSpectrum('JSON', filePath, loadJSONFile(filePath))
+        else:
+            return probeResult('JSON', filePath, None, None, None, None, None)
+        dtype = None
+    else:
+        shape = struct['dataReal']['shape']
+        dtype = struct['dataReal']['dtype']
+        if 'hyper' in struct.keys():
+            shape = shape[1:]
+    hyper = struct.get('hyper', [0])
+    metaData = dict()
+    for elem in struct.get('metaData', {}).keys():
+        metaData[str(elem)] = str(struct['metaData'][elem])
+    return probeResult('JSON', filePath, shape, dtype, struct['freq'], struct['sw'], struct['spec'], struct['ref'], hyper, metaData)
+
 def saveMatlabFile(filePath, spectrum, name='spectrum'):
     import scipy.io
     struct = {}
@@ -733,6 +1136,190 @@ def loadMatlabFile(filePath):
         return masterData
 
 
+def saveSsnakeFile(filePath, spectrum, compress=False):
+    """ Saves a spectrum in the binary ssNake format.
+        The file starts with SSNAKEMAGIC, followed by the data in chunks of
+        rows (all points along the last axes), optionally compressed with zlib.
+        The file ends with a JSON header with the shape, the chunk table and
+        the axis information, the length of the header and SSNAKEMAGIC.
+        The file is written to a temporary file first, because an existing file with
+        the same name can still be memory mapped by lazily loaded data. """
+    import shutil
+    import tempfile
+    filePath = os.path.abspath(filePath)
+    fd, tmpPath = tempfile.mkstemp(prefix='.ssnake_', suffix='.tmp', dir=os.path.dirname(filePath))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writeSsnakeData(f, spectrum, compress)
+        if os.path.exists(filePath):
+            shutil.copymode(filePath, tmpPath)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmpPath, 0o666 & ~umask)
+        getattr(os, 'replace', os.rename)(tmpPath, filePath)
+    except Exception:
+        os.remove(tmpPath)
+        raise
+
+def writeSsnakeData(f, spectrum, compress=False):
+    import json
+    import zlib
+    import struct
+    item = spectrum.data
+    tmpData = item.data
+    shape = item.shape()
+    dtype = np.dtype(tmpData.dtype).newbyteorder('<')
+    nRows = shape[0] if len(shape) > 1 else 1
+    rowBytes = int(np.prod(shape)) // nRows * dtype.itemsize
+    step = max(1, SSNAKECHUNK // rowBytes)
+    chunks = []
+    f.write(SSNAKEMAGIC)
+    f.write(b'\0' * (SSNAKEDATASTART - len(SSNAKEMAGIC)))
+    offset = SSNAKEDATASTART
+    for i in range(len(item.hyper)):
+        for start in range(0, nRows, step):
+            stop = min(start + step, nRows)
+            if len(shape) > 1:
+                block = tmpData[i, start:stop]
+            else:
+                block = tmpData[i]
+            block = np.ascontiguousarray(block, dtype=dtype).tobytes()
+            if compress:
+                block = zlib.compress(block, SSNAKECOMPRESSLEVEL)
+            f.write(block)
+            chunks.append([i * nRows + start, i * nRows + stop, offset, len(block)])
+            offset += len(block)
+    header = {'version': 1,
+              'dtype': dtype.str,
+              'shape': list(shape),
+              'hyper': [int(x) for x in item.hyper],
+              'compression': 'zlib' if compress else None,
+              'chunks': chunks,
+              'freq': [float(x) for x in spectrum.freq],
+              'sw': [float(x) for x in spectrum.sw],
+              'spec': [int(x) for x in spectrum.spec],
+              'wholeEcho': [bool(x) for x in spectrum.wholeEcho],
+              'ref': [None if x is None else float(x) for x in spectrum.ref],
+              'history': list(spectrum.history),
+              'metaData': spectrum.metaData,
+              'dFilter': None if spectrum.dFilter is None else float(spectrum.dFilter),
+              'xaxArray': [np.asarray(x, dtype=float).tolist() for x in spectrum.xaxArray]}
+    header = json.dumps(header).encode('utf-8')
+    f.write(header)
+    f.write(struct.pack('<Q', len(header)))
+    f.write(SSNAKEMAGIC)
+
+def probeSsnakeFile(filePath):
+    header = readSsnakeHeader(filePath)
+    metaData = dict()
+    if header['metaData'] is not None:
+        for elem in header['metaData'].keys():
+            metaData[str(elem)] = str(header['metaData'][elem])
+    return probeResult('ssNake', filePath, header['shape'], header['dtype'], header['freq'], header['sw'], header['spec'], header['ref'], header['hyper'], metaData)
+
+def readSsnakeHeader(filePath):
+    """ Returns the JSON header of a binary ssNake file as a dictionary """
+    import json
+    import struct
+    with open(filePath, 'rb') as f:
+        if f.read(len(SSNAKEMAGIC)) != SSNAKEMAGIC:
+            raise LoadException("Not an ssNake file: " + filePath)
+        f.seek(-8 - len(SSNAKEMAGIC), os.SEEK_END)
+        headerLen = struct.unpack('<Q', f.read(8))[0]
+        if f.read(len(SSNAKEMAGIC)) != SSNAKEMAGIC:
+            raise LoadException("The ssNake file is incomplete: " + filePath)
+        f.seek(-8 - len(SSNAKEMAGIC) - headerLen, os.SEEK_END)
+        return json.loads(f.read(headerLen).decode('utf-8'))
+
+class SsnakeSource(object):
+    """ Reads the first hypercomplex part of the data of a binary ssNake file.
+        Only the chunks with the requested rows are read, so a slice can be loaded
+        without reading all data. Used as source for HComplexData. """
+
+    def __init__(self, filePath, header):
+        self.filePath = filePath
+        self.chunks = header['chunks']
+        self.compressed = header['compression'] is not None
+        self.dtype = np.dtype(header['dtype'])
+        self.shape = tuple(header['shape'])
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def readRows(self, start, stop):
+        import zlib
+        rowShape = self.shape[1:] if len(self.shape) > 1 else self.shape
+        tmpData = np.empty((stop - start, ) + rowShape, dtype=self.dtype)
+        with open(self.filePath, 'rb') as f:
+            for rowStart, rowStop, offset, nbytes in self.chunks:
+                if rowStop <= start or rowStart >= stop:
+                    continue
+                f.seek(offset)
+                block = f.read(nbytes)
+                if self.compressed:
+                    block = zlib.decompress(block)
+                block = np.frombuffer(block, dtype=self.dtype).reshape((rowStop - rowStart, ) + rowShape)
+                first = max(start, rowStart)
+                last = min(stop, rowStop)
+                tmpData[first - start:last - start] = block[first - rowStart:last - rowStart]
+        return tmpData
+
+    def read(self, key=()):
+        if not isinstance(key, tuple):
+            key = (key, )
+        if len(self.shape) == 1:
+            return self.readRows(0, 1)[0][key]
+        if len(key) == 0 or not isinstance(key[0], (slice, int, np.integer)):
+            return self.readRows(0, self.shape[0])[key]
+        if isinstance(key[0], slice):
+            rows = np.arange(*key[0].indices(self.shape[0]))
+        else:
+            rows = np.array([key[0] % self.shape[0]])
+        if len(rows) == 0:
+            return self.readRows(0, 0)[key]
+        start = np.min(rows)
+        tmpData = self.readRows(start, np.max(rows) + 1)
+        if isinstance(key[0], slice):
+            return tmpData[(rows - start, ) + key[1:]]
+        return tmpData[(rows[0] - start, ) + key[1:]]
+
+def loadSsnakeFile(filePath, lazy=True):
+    """ Loads a binary ssNake file. With lazy, data without hypercomplex parts is
+        only read when it is needed, uncompressed data is memory mapped. """
+    header = readSsnakeHeader(filePath)
+    shape = tuple(header['shape'])
+    hyper = header['hyper']
+    source = SsnakeSource(filePath, header)
+    if lazy and hyper == [0]:
+        if header['compression'] is None:
+            # The complex values are stored as pairs of real values
+            raw = np.memmap(filePath, source.dtype.str[0] + 'f' + str(source.dtype.itemsize // 2), 'r', SSNAKEDATASTART, shape + (2, ))
+            data = hc.HComplexData(source=hc.MemmapSource(raw, dtype=source.dtype))
+        else:
+            data = hc.HComplexData(source=source)
+    else:
+        nRows = shape[0] if len(shape) > 1 else 1
+        data = hc.HComplexData(source.readRows(0, nRows * len(hyper)).reshape((len(hyper), ) + shape), hyper, source.dtype)
+    ref = [None if x is None else x for x in header['ref']]
+    metaData = dict()
+    if header['metaData'] is not None:
+        for elem in header['metaData'].keys():
+            metaData[str(elem)] = str(header['metaData'][elem])
+    masterData = sc.Spectrum(data,
+                             (filePath, None),
+                             list(header['freq']),
+                             list(header['sw']),
+                             list(header['spec']),
+                             list(header['wholeEcho']),
+                             ref,
+                             [np.array(x) for x in header['xaxArray']],
+                             history=list(header['history']),
+                             metaData=metaData,
+                             dFilter=header['dFilter'])
+    masterData.addHistory("ssNake data loaded from " + filePath)
+    return masterData
+
 def brukerTopspinGetPars(file):
     """ A routine to load all pars to a dictionary for Bruker Topsin acqus type
         file """
@@ -819,10 +1406,26 @@ def loadBrukerTopspin(filePath):
         if os.path.exists(Dir + os.path.sep + file):
             if file == 'ser':
                 totsize = int(totsize / SIZE[0]) * directSize #Always load full 1024 byte blocks (256 data points) for >1D
-            with open(Dir + os.path.sep + file, "rb") as f:
-                raw = np.fromfile(f, np.int32, totsize)
-            raw = raw.newbyteorder(ByteOrder) #Load with right byte order
-    ComplexData = np.array(raw[0:len(raw):2]) + 1j * np.array(raw[1:len(raw):2])
+            dataFile = Dir + os.path.sep + file
+    if dim <= 3 and os.path.getsize(dataFile) >= totsize * 4:
+        # Map the file to memory, data is only read when it is needed
+        raw = np.memmap(dataFile, np.dtype(np.int32).newbyteorder(ByteOrder), 'r', shape=(totsize, ))
+        if dim >= 2:
+            newSize = list(SIZE)
+            newSize[0] = int(directSize / 2)
+            raw = raw.reshape(tuple(newSize[-1::-1]) + (2, ))
+            raw = raw[..., 0:int(SIZE[0]/2), :] #Cut off placeholder data
+        else:
+            raw = raw.reshape((-1, 2))
+        ComplexData = hc.HComplexData(source=hc.MemmapSource(raw))
+        return brukerTopspinSpectrum(ComplexData, filePath, pars, FREQ, SW, REF, dim, dFilter)
+    with open(dataFile, "rb") as f:
+        raw = np.fromfile(f, np.int32, totsize)
+    raw = raw.newbyteorder(ByteOrder) #Load with right byte order
+    ComplexData = np.empty(len(raw) // 2, dtype=hc.getDtype())
+    ComplexData.real = raw[0:len(raw):2]
+    ComplexData.imag = raw[1:len(raw):2]
+    del raw
     if dim >= 2:
         newSize = list(SIZE)
         newSize[0] = int(directSize / 2)
@@ -831,30 +1434,58 @@ def loadBrukerTopspin(filePath):
         ComplexData = ComplexData[:,0:int(SIZE[0]/2)] #Cut off placeholder data
     elif dim == 3:
         ComplexData = ComplexData[:,:,0:int(SIZE[0]/2)] #Cut off placeholder data
+    return brukerTopspinSpectrum(ComplexData, filePath, pars, FREQ, SW, REF, dim, dFilter)
+
+def probeBrukerTopspin(filePath):
+    if os.path.isfile(filePath):
+        Dir = os.path.dirname(filePath)
+    else:
+        Dir = filePath
+    pars = []
+    for File in ['acqus','acqu2s','acqu3s']:
+        if os.path.exists(Dir + os.path.sep + File):
+            pars.append(brukerTopspinGetPars(Dir + os.path.sep + File))
+    SIZE = [x['TD'] for x in pars]
+    FREQ = [x['SFO1'] * 1e6 for x in pars]
+    SW = [x['SW_h'] for x in pars]
+    REF = list(- np.array([x['O1'] for x in pars]) + np.array(FREQ))
+    dtype = np.dtype(np.int32).newbyteorder(['l','b'][pars[0]['BYTORDA']])
+    shape = SIZE[-1:0:-1] + [int(SIZE[0] / 2)]
+    for file in ['fid','ser']:
+        if os.path.exists(Dir + os.path.sep + file):
+            dataFile = Dir + os.path.sep + file
+    return probeResult('Bruker TopSpin', dataFile, shape, dtype, FREQ[-1::-1], SW[-1::-1], [False] * len(SIZE), REF[-1::-1], metaData=brukerMetaData(pars[0]), nucleus=pars[0].get('NUC1'))
+
+def brukerTopspinSpectrum(ComplexData, filePath, pars, FREQ, SW, REF, dim, dFilter):
     masterData = sc.Spectrum(ComplexData, (filePath, None), FREQ[-1::-1], SW[-1::-1], [False] * dim, ref = REF[-1::-1], dFilter = dFilter)
-    # TODO: Inserting metadata should be made more generic
+    masterData.metaData.update(brukerMetaData(pars[0]))
+    masterData.addHistory("Bruker TopSpin data loaded from " + filePath)
+    return masterData
+
+def brukerMetaData(pars):
+    """ Returns the metadata from the parameters of a Bruker acqus file """
+    metaData = dict()
     try:
-        masterData.metaData['# Scans'] = str(pars[0]['NS'])
+        metaData['# Scans'] = str(pars['NS'])
     except Exception:
         pass
     try:
-        masterData.metaData['Receiver Gain'] = str(pars[0]['RG'])
+        metaData['Receiver Gain'] = str(pars['RG'])
     except Exception:
         pass
     try:
-        masterData.metaData['Experiment Name'] = pars[0]['PULPROG']
+        metaData['Experiment Name'] = pars['PULPROG']
     except Exception:
         pass
     try:        
-        masterData.metaData['Offset [Hz]'] = str(pars[0]['O1'])
+        metaData['Offset [Hz]'] = str(pars['O1'])
     except Exception:
         pass
     try:
-        masterData.metaData['Recycle Delay [s]'] = str(pars[0]['D'][1])
+        metaData['Recycle Delay [s]'] = str(pars['D'][1])
     except Exception:
         pass
-    masterData.addHistory("Bruker TopSpin data loaded from " + filePath)
-    return masterData
+    return metaData
 
 def loadBrukerWinNMR(filePath):
     base, extension = os.path.splitext(filePath)
@@ -902,18 +1533,30 @@ def loadBrukerWinNMR(filePath):
         ComplexData = np.array(raw[0:len(raw):2]) + 1j * np.array(raw[1:len(raw):2])
     masterData = sc.Spectrum(ComplexData, (filePath, None), [FREQ], [SW], [spec], ref = [REF])
     if not spec:
-        try:
-            masterData.metaData['# Scans'] = str(pars['NS'])
-            masterData.metaData['Receiver Gain'] = str(pars['RG'])
-            masterData.metaData['Experiment Name'] = pars['PULPROG']
-            masterData.metaData['Offset [Hz]'] = str(pars['O1'])
-            masterData.metaData['Recycle Delay [s]'] = str(pars['D'][1])
-        except Exception:
-            pass
+        masterData.metaData.update(brukerMetaData(pars))
     masterData.addHistory("Bruker WinNMR data loaded from " + filePath)
 
     return masterData
 
+def probeBrukerWinNMR(filePath):
+    base, extension = os.path.splitext(filePath)
+    names = ['.fqs','.aqs','.fid','.1r','.1i']
+    if extension == extension.upper(): #If uppercase
+        names = [x.upper() for x in names]
+    if extension == names[3] or extension == names[4]: #If spec loaded
+        pars = brukerTopspinGetPars(base + names[0])
+        SIZE = pars['XDIM']
+        FREQ = pars['SF'] * 1e6
+        SW = pars['SW_p']
+        pos = np.fft.fftshift(np.fft.fftfreq(SIZE, 1.0 / SW))[-1] #Get last point of axis
+        REF = FREQ + pos - pars['OFFSET'] * 1e-6 * FREQ
+        dtype = np.dtype(np.float32).newbyteorder(['l','b'][pars['BYTORDP']])
+        return probeResult('Bruker WinNMR', filePath, [SIZE], dtype, [FREQ], [SW], [True], [REF])
+    pars = brukerTopspinGetPars(base + names[1])
+    FREQ = pars['SFO1'] * 1e6
+    dtype = np.dtype(np.float32).newbyteorder(['l','b'][pars['BYTORDA']])
+    return probeResult('Bruker WinNMR', filePath, [(pars['TD'] + 1) // 2], dtype, [FREQ], [pars['SW_h']], [False], [FREQ - pars['O1']], metaData=brukerMetaData(pars), nucleus=pars.get('NUC1'))
+
 def loadBrukerSpectrum(filePath):
     if os.path.isfile(filePath):
         Dir = os.path.dirname(filePath)
@@ -972,15 +1615,44 @@ def loadBrukerSpectrum(filePath):
     #Try to load main acqus and get some additional pars
     try:
         parsExtra = brukerTopspinGetPars(Dir + os.path.sep  + '..' + os.path.sep + '..'+ os.path.sep + 'acqus')
-        masterData.metaData['# Scans'] = str(parsExtra['NS'])
-        masterData.metaData['Receiver Gain'] = str(parsExtra['RG'])
-        masterData.metaData['Experiment Name'] = parsExtra['PULPROG']
-        masterData.metaData['Offset [Hz]'] = str(parsExtra['O1'])
-        masterData.metaData['Recycle Delay [s]'] = str(parsExtra['D'][1])
+        masterData.metaData.update(brukerMetaData(parsExtra))
     except Exception:
         pass #Do nothing on error
     return masterData
 
+def probeBrukerSpectrum(filePath):
+    if os.path.isfile(filePath):
+        Dir = os.path.dirname(filePath)
+    else:
+        Dir = filePath
+    pars = []
+    for File in ['procs','proc2s','proc3s']:
+        if os.path.exists(Dir + os.path.sep + File):
+            pars.append(brukerTopspinGetPars(Dir + os.path.sep + File))
+    SIZE = [x['SI'] for x in pars]
+    SW = [x['SW_p'] for x in pars]
+    FREQ = [x['SF'] * 1e6 for x in pars]
+    REF = []
+    for index in range(len(SIZE)): #For each axis
+        pos = np.fft.fftshift(np.fft.fftfreq(SIZE[index], 1.0 / SW[index]))[-1] #Get last point of axis
+        REF.append(FREQ[index] + pos - pars[index]['OFFSET'] * 1e-6 * FREQ[index])
+    dim = len(SIZE)
+    files = [['1r','1i'],['2rr','2ir','2ri','2ii'],['3rrr','3irr','3rir','3iir','3rri','3iri','3rii','3iii']]
+    numFiles = len([x for x in files[dim - 1] if os.path.exists(Dir + os.path.sep + x)])
+    hyper = [0]
+    if dim == 2 and numFiles > 2: # Every real file and the next imaginary file form a part
+        hyper = [0, 1]
+    metaData = dict()
+    nucleus = None
+    try:
+        parsExtra = brukerTopspinGetPars(Dir + os.path.sep  + '..' + os.path.sep + '..'+ os.path.sep + 'acqus')
+        metaData = brukerMetaData(parsExtra)
+        nucleus = parsExtra.get('NUC1')
+    except Exception:
+        pass
+    dtype = np.dtype(np.int32).newbyteorder(['l','b'][pars[0]['BYTORDP']])
+    return probeResult('Bruker spectrum', Dir, SIZE[-1::-1], dtype, FREQ[-1::-1], SW[-1::-1], [True] * dim, REF[-1::-1], hyper, metaData, nucleus)
+
 def chemGetPars(folder):
     import collections
     with open(folder + os.path.sep + 'acq', 'r') as f:
@@ -1019,14 +1691,10 @@ def convertChemVal(val):
         num = float(val)
     return num
 
-def loadChemFile(filePath):
-    if os.path.isfile(filePath):
-        Dir = os.path.dirname(filePath)
-    else:
-        Dir = filePath
+def chemGetSizes(pars):
+    """ Returns the sizes, the frequency and the spectral widths from Chemagnetics parameters """
     sizeTD1 = 1
     sw1 = 1
-    pars = chemGetPars(Dir)
     sizeTD2 = int(float(pars['al']))
     freq = pars['sf' + str(int(float(pars['ch1'])))]
     if type(freq) is list: #load only first value when list
@@ -1049,9 +1717,34 @@ def loadChemFile(filePath):
             sizeTD1 = int(float(pars['al2']))
             if 'dw2' in pars:
                 sw1 = 1 /  convertChemVal(pars['dw2'])
+    return sizeTD1, sizeTD2, freq, sw, sw1
+
+def chemMetaData(pars):
+    metaData = dict()
+    try:
+        if isinstance(pars['na'],list):
+            metaData['# Scans'] = pars['na'][0]
+        else:
+            metaData['# Scans'] = pars['na']
+        metaData['Acquisition Time [s]'] = str(convertChemVal(pars['aqtm']))
+        metaData['Receiver Gain'] = str(float(pars['rg']))
+        metaData['Recycle Delay [s]'] = str(convertChemVal(pars['pd']))
+        metaData['Time Completed'] = pars['end_date'] + ' ' + pars['end_time']
+        metaData['Experiment Name'] = pars['ppfn']
+    except Exception:
+        pass
+    return metaData
+
+def loadChemFile(filePath):
+    if os.path.isfile(filePath):
+        Dir = os.path.dirname(filePath)
+    else:
+        Dir = filePath
+    pars = chemGetPars(Dir)
+    sizeTD1, sizeTD2, freq, sw, sw1 = chemGetSizes(pars)
     with open(Dir + os.path.sep + 'data', 'rb') as f:
         raw = np.fromfile(f, np.int32)
-        b = np.complex128(raw.byteswap())
+        b = raw.byteswap().astype(hc.getDtype())
     filePath = Dir + os.path.sep + 'data'
     fid = b[:int(len(b) / 2)] + 1j * b[int(len(b) / 2):]
     fid = np.reshape(fid, (len(fid)//sizeTD2, sizeTD2))
@@ -1063,20 +1756,22 @@ def loadChemFile(filePath):
     else:
         masterData = sc.Spectrum(data, (filePath, None), [freq * 1e6] * 2, [sw1, sw], spec * 2)
     masterData.addHistory("Chemagnetics data loaded from " + filePath)
-    try:
-        if isinstance(pars['na'],list):
-            masterData.metaData['# Scans'] = pars['na'][0]
-        else:
-            masterData.metaData['# Scans'] = pars['na']
-        masterData.metaData['Acquisition Time [s]'] = str(convertChemVal(pars['aqtm']))
-        masterData.metaData['Receiver Gain'] = str(float(pars['rg']))
-        masterData.metaData['Recycle Delay [s]'] = str(convertChemVal(pars['pd']))
-        masterData.metaData['Time Completed'] = pars['end_date'] + ' ' + pars['end_time']
-        masterData.metaData['Experiment Name'] = pars['ppfn']
-    except Exception:
-        pass
+    masterData.metaData.update(chemMetaData(pars))
     return masterData
 
+def probeChemFile(filePath):
+    if os.path.isfile(filePath):
+        Dir = os.path.dirname(filePath)
+    else:
+        Dir = filePath
+    pars = chemGetPars(Dir)
+    sizeTD1, sizeTD2, freq, sw, sw1 = chemGetSizes(pars)
+    filePath = Dir + os.path.sep + 'data'
+    numPoints = os.path.getsize(filePath) // 8 # Pairs of 4 byte integers
+    if sizeTD1 == 1:
+        return probeResult('Chemagnetics', filePath, [sizeTD2], '>i4', [freq * 1e6], [sw], [False], metaData=chemMetaData(pars))
+    return probeResult('Chemagnetics', filePath, [numPoints // sizeTD2, sizeTD2], '>i4', [freq * 1e6] * 2, [sw1, sw], [False] * 2, metaData=chemMetaData(pars))
+
 def loadMagritek(filePath):
     # Magritek load script based on some Matlab files by Ole Brauckman
     if os.path.isfile(filePath):
@@ -1091,9 +1786,7 @@ def loadMagritek(filePath):
     lastfreq1 = None
     ref1 = None
     # Start pars extraction
-    H = [line.strip().split('=') for line in open(Dir + os.path.sep + 'acqu.par', 'r')]
-    H = [[x[0].strip(),x[1].strip()] for x in H]
-    H = dict(H)
+    H = magritekGetPars(Dir)
     sw = float(H['bandwidth']) * 1000
     sizeTD2 = int(H['nrPnts'])
     freq = float(H['b1Freq']) * 1e6
@@ -1125,16 +1818,48 @@ def loadMagritek(filePath):
         ComplexData = Data[0:Data.shape[0]:2] - 1j * Data[1:Data.shape[0]:2]
         ComplexData[0] *= 2
         masterData = sc.Spectrum(ComplexData, (filePath, None), [freq], [sw], [False], ref=[ref])
+    masterData.metaData.update(magritekMetaData(H))
+    masterData.addHistory("Magritek data loaded from " + filePath)
+    return masterData
+
+def magritekGetPars(Dir):
+    H = [line.strip().split('=') for line in open(Dir + os.path.sep + 'acqu.par', 'r')]
+    H = [[x[0].strip(),x[1].strip()] for x in H]
+    return dict(H)
+
+def magritekMetaData(H):
+    metaData = dict()
     try:
-        masterData.metaData['# Scans'] = H['nrScans']
-        masterData.metaData['Acquisition Time [s]'] = str(int(H['nrPnts']) * float(H['dwellTime']) * 1e-6)
-        masterData.metaData['Experiment Name'] = H['expName'].strip('"')
-        masterData.metaData['Receiver Gain'] = H['rxGain']
-        masterData.metaData['Recycle Delay [s]'] = str(float(H['repTime'])/1e3)
+        metaData['# Scans'] = H['nrScans']
+        metaData['Acquisition Time [s]'] = str(int(H['nrPnts']) * float(H['dwellTime']) * 1e-6)
+        metaData['Experiment Name'] = H['expName'].strip('"')
+        metaData['Receiver Gain'] = H['rxGain']
+        metaData['Recycle Delay [s]'] = str(float(H['repTime'])/1e3)
     except Exception:
         pass
-    masterData.addHistory("Magritek data loaded from " + filePath)
-    return masterData
+    return metaData
+
+def probeMagritek(filePath):
+    if os.path.isfile(filePath):
+        Dir = os.path.dirname(filePath)
+    else:
+        Dir = filePath
+    Files2D = [x for x in os.listdir(Dir) if '.2d' in x]
+    H = magritekGetPars(Dir)
+    sw = float(H['bandwidth']) * 1000
+    sizeTD2 = int(H['nrPnts'])
+    freq = float(H['b1Freq']) * 1e6
+    ref = -np.floor(sizeTD2 / 2) / sizeTD2 * sw + freq - float(H['lowestFrequency'])
+    nucleus = H.get('rxChannel', '').strip('"') or None
+    if len(Files2D) != 1:
+        return probeResult('Magritek', filePath, [sizeTD2], np.float32, [freq], [sw], [False], [ref], metaData=magritekMetaData(H), nucleus=nucleus)
+    sizeTD1 = int(H['nrSteps'])
+    sw1 = 50e3
+    ref1 = None
+    if 'bandwidth2' in H.keys():
+        sw1 = float(H['bandwidth2']) * 1000
+        ref1 = -np.floor(sizeTD1 / 2) / sizeTD1 * sw1 + freq - float(H['lowestFrequency2'])
+    return probeResult('Magritek', filePath, [sizeTD1, sizeTD2], np.float32, [freq] * 2, [sw1, sw], [False] * 2, [ref1, ref], metaData=magritekMetaData(H), nucleus=nucleus)
 
 def saveSimpsonFile(filePath, spectrum):
     data = spectrum.getHyperData(0) # SIMPSON does not support hypercomplex
@@ -1184,7 +1909,7 @@ def loadSimpsonFile(filePath):
             FORMAT = re.sub('FORMAT=', '', Lines[s])
     if 'Normal' in FORMAT:
         length = DataEnd - DataStart - 1
-        data = np.zeros(length, dtype=complex)
+        data = np.zeros(length, dtype=hc.getDtype())
         for i in range(length):
             temp = Lines[DataStart + 1 + i].split()
             data[i] = float(temp[0]) + 1j * float(temp[1])
@@ -1233,6 +1958,33 @@ def loadSimpsonFile(filePath):
     masterData.addHistory("SIMPSON data loaded from " + filePath)
     return masterData
 
+def probeSimpsonFile(filePath):
+    NP, NI, SW, SW1, TYPE, FORMAT = 0, 1, 0, 0, '', 'Normal'
+    with open(filePath, 'r') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if line == 'DATA':
+                break
+            if line.startswith('NP='):
+                NP = int(line[3:])
+            elif line.startswith('NI='):
+                NI = int(line[3:])
+            elif line.startswith('SW='):
+                SW = float(line[3:])
+            elif line.startswith('SW1='):
+                SW1 = float(line[4:])
+            elif line.startswith('TYPE='):
+                TYPE = line[5:]
+            elif line.startswith('FORMAT='):
+                FORMAT = line[7:]
+    spec = 'SPE' in TYPE
+    dtype = None
+    if 'BINARY' in FORMAT:
+        dtype = np.complex64
+    if NI == 1:
+        return probeResult('SIMPSON', filePath, [NP], dtype, [0], [SW], [spec])
+    return probeResult('SIMPSON', filePath, [NI, NP], dtype, [0, 0], [SW1, SW], [spec] * 2)
+
 def convertDIFDUB(dat):
     def checkWrite(dup, currentNum, step, numberList):
         if dup != '':
@@ -1389,6 +2141,32 @@ def loadJCAMP(filePath):
         masterData = sc.Spectrum(spectDat, (filePath, None), [freq], [sw], [True], ref=[None])
     return masterData
 
+def probeJCAMP(filePath):
+    # Only the labelled data records (lines starting with ##) are parsed
+    pars = dict()
+    with open(filePath, 'r') as f:
+        for line in f:
+            if not line.lstrip().startswith('##') or '=' not in line:
+                continue
+            name = re.sub('[\t ]*', '', line[:line.index('=')]).upper()
+            pars[name] = line[line.index('=') + 1:].strip()
+    def firstValue(name):
+        return re.sub('[\t\r]*', '', re.sub(',[\t ][\t ]*', ' ', pars[name])).split()[0]
+    freq = float(pars['##.OBSERVEFREQUENCY']) * 1e6
+    dataType = pars['##DATATYPE']
+    if 'NMR FID' in dataType:
+        nPoints = int(firstValue('##VAR_DIM'))
+        first = float(firstValue('##FIRST').replace(',', '.'))
+        last = float(firstValue('##LAST').replace(',', '.'))
+        sw = 1.0 / ((last - first) / (nPoints - 1))
+        return probeResult('JCAMP', filePath, [nPoints], None, [freq], [sw], [False])
+    NPoints = int(pars['##NPOINTS'])
+    sw = abs(float(pars['##FIRSTX']) - float(pars['##LASTX']))
+    if re.sub('[ \t]*', '', pars['##XUNITS']) == 'PPM':
+        sw *= freq
+    sw = sw + sw / NPoints
+    return probeResult('JCAMP', filePath, [NPoints], None, [freq], [sw], [True])
+
 def saveASCIIFile(filePath, spectrum, axMult=1):
     axis = np.array([spectrum.xaxArray[-1] * axMult]).transpose()
     tmpData = spectrum.data.getHyperData(0)
@@ -1488,6 +2266,17 @@ def loadMinispec(filePath):
     masterData.addHistory("Minispec data loaded from " + filePath)
     return masterData
 
+def probeMinispec(filePath):
+    with open(filePath, 'r') as f:
+        data = f.read().split('\n')
+    dataLimits = np.fromstring(data[2][data[2].index('=') + 1:], sep=',')
+    dw = (dataLimits[1] - dataLimits[0]) / (dataLimits[2] - 1)
+    sw = 1.0 / dw
+    if 'Time/ms' in data[3]:
+        sw *= 1000
+    numPoints = len([line for line in data[7:] if len(line) > 0])
+    return probeResult('Minispec', filePath, [numPoints], None, [0], [sw], [False])
+
 def loadBrukerEPR(filePath):
     with open(filePath + '.par', mode='r') as f:
         textdata = [row.split() for row in f.read().replace('\r', '\n').split('\n')]
@@ -1506,6 +2295,20 @@ def loadBrukerEPR(filePath):
     masterData.addHistory("Bruker EPR data loaded from " + filePath)
     return masterData
 
+def probeBrukerEPR(filePath):
+    with open(filePath + '.par', mode='r') as f:
+        textdata = [row.split() for row in f.read().replace('\r', '\n').split('\n')]
+    for row in textdata:
+        if len(row) < 2:
+            continue
+        if row[0] == 'ANZ':
+            numOfPoints = int(row[1])
+        elif row[0] == 'GSI':
+            sweepWidth = float(row[1])
+        elif row[0] == 'GST':
+            leftX = float(row[1])
+    return probeResult('Bruker EPR', filePath, [numOfPoints], np.float32, [(sweepWidth + 2 * leftX) / 2], [sweepWidth], [True], [0])
+
 def loadSiemensIMA(filePath):
     """Load Siemens IMA file
 
@@ -20,14 +20,17 @@
 import numpy as np
 import scipy.optimize
 import copy
-from nus import ffm, clean, ist
-import multiprocessing
+import nus
 import itertools
 import reimplement as reim
 import functions as func
+import snapshot as snap
+import chunked as chunk
+import workers
 import hypercomplex as hc
 
 AUTOPHASETOL = 0.0002 #is ~0.01 degrees
+SHEARBLOCK = 16 * 1024**2 # Maximum number of bytes of the phase ramp of a shearing transformation that is made at once
 
 
 class SpectrumException(Exception):
@@ -52,6 +55,9 @@ class Spectrum(object):
         self.dFilter = dFilter #Digital filter first order phase in radian
         self.undoList = []
         self.redoList = []
+        self.undoStore = snap.SnapshotStore()
+        self.chunkSize = None
+        self.chunkToDisk = None
         self.noUndo = False
         if spec is None:
             self.spec = [0] * self.ndim()
@@ -140,6 +146,52 @@ class Spectrum(object):
         self.undoList = []
         self.redoList = []
 
+    def setChunking(self, chunkSize=None, toDisk=None):
+        # Process the data in chunks of at most chunkSize bytes, None for the default settings
+        self.chunkSize = chunkSize
+        self.chunkToDisk = toDisk
+
+    def getChunking(self):
+        chunkSize = self.chunkSize
+        if chunkSize is None:
+            chunkSize = chunk.CHUNKSIZE
+        toDisk = self.chunkToDisk
+        if toDisk is None:
+            toDisk = chunk.TODISK
+        return chunkSize, toDisk
+
+    def __useChunks(self, axes, select=slice(None)):
+        if not snap.isFullSelect(select):
+            return False
+        return chunk.needsChunks(self.data, axes, self.getChunking()[0])
+
+    def __chunkApply(self, method, axes, inPlace=True):
+        # Runs method on a temporary spectrum for each chunk of the data
+        axes = [self.checkAxis(axis) for axis in axes]
+        chunkSize, toDisk = self.getChunking()
+        lastSpec = [None]
+        def chunkFunc(data):
+            xax = [copy.copy(self.xaxArray[i]) if i in axes else np.arange(n) for i, n in enumerate(data.shape())]
+            tmpSpec = Spectrum(data, self.filePath, self.freq, self.sw, list(self.spec), list(self.wholeEcho), self.ref, xax, dFilter=self.dFilter)
+            tmpSpec.noUndo = True
+            method(tmpSpec)
+            lastSpec[0] = tmpSpec
+            return tmpSpec.data
+        self.data = chunk.applyChunked(self.data, chunkFunc, axes, chunkSize, toDisk, inPlace)
+        for axis in axes:
+            self.spec[axis] = lastSpec[0].spec[axis]
+            self.xaxArray[axis] = lastSpec[0].xaxArray[axis]
+
+    def setUndoBudget(self, budget):
+        # Maximum number of bytes of undo data kept in memory, None for the default budget
+        self.undoStore.setBudget(budget)
+
+    def getUndoStats(self):
+        stats = self.undoStore.stats()
+        stats['undo'] = len(self.undoList)
+        stats['redo'] = len(self.redoList)
+        return stats
+
     def reload(self):
         import specIO as io
         loadData = io.autoLoad(*self.filePath)
@@ -186,7 +238,7 @@ class Spectrum(object):
             if self.data.hyper == data.hyper: # If both sets have same hyper: easy undo can be used
                 returnValue = lambda self: self.delete(range(pos, pos + data.shape()[axis]), axis)
             else: # Otherwise: do a deep copy of the class
-                copyData = copy.deepcopy(self)
+                copyData = snap.DataSnapshot(self)
                 returnValue = lambda self: self.restoreData(copyData, lambda self: self.insert(data, pos, axis))
         axis = self.checkAxis(axis)
         # Check for a change in dimensions
@@ -199,11 +251,11 @@ class Spectrum(object):
 
     def delete(self, pos, axis=-1):
         axis = self.checkAxis(axis)
-        if not self.noUndo:
-            copyData = copy.deepcopy(self)
         tmpData = self.data.delete(pos, axis)
         if 0 in tmpData.shape():
             raise SpectrumException('Cannot delete all data')
+        if not self.noUndo:
+            copyData = snap.DeleteSnapshot(self, pos, axis)
         self.data = tmpData
         self.xaxArray[axis] = np.delete(self.xaxArray[axis], pos)
         if isinstance(pos, (int, float)):
@@ -243,7 +295,7 @@ class Spectrum(object):
             elif self.data.hyper == data.hyper: # If both sets have same hyper: easy subtract can be used for undo
                 returnValue = lambda self: self.subtract(data, axis, select=select)
             else: # Otherwise: do a deep copy of the class
-                copyData = copy.deepcopy(self)
+                copyData = snap.DataSnapshot(self)
                 returnValue = lambda self: self.restoreData(copyData, lambda self: self.add(data, axis, select))
         self.data[select] += data
         if isinstance(data, (float,int)):
@@ -282,7 +334,7 @@ class Spectrum(object):
             elif self.data.hyper == data.hyper: #If both sets have same hyper: easy subtract can be used for undo
                 returnValue = lambda self: self.add(data, axis, select=select)
             else: # Otherwise: do a deep copy of the class
-                copyData = copy.deepcopy(self)
+                copyData = snap.DataSnapshot(self)
                 returnValue = lambda self: self.restoreData(copyData, lambda self: self.subtract(data, axis, select))
         self.data[select] -= data
         if isinstance(data, (float,int)):
@@ -321,7 +373,7 @@ class Spectrum(object):
             elif self.data.hyper == data.hyper: #If both sets have same hyper: easy subtract can be used for undo
                 returnValue = lambda self: self.divide(data, axis, select=select)
             else: # Otherwise: do a deep copy of the class
-                copyData = copy.deepcopy(self)
+                copyData = snap.DataSnapshot(self)
                 returnValue = lambda self: self.restoreData(copyData, lambda self: self.multiply(data, axis, select))
         self.data[select] *= data
         if isinstance(data, (float,int)):
@@ -359,7 +411,7 @@ class Spectrum(object):
             elif self.data.hyper == data.hyper: #If both sets have same hyper: easy subtract can be used for undo
                 returnValue = lambda self: self.multiply(data, axis, select=select)
             else: # Otherwise: do a deep copy of the class
-                copyData = copy.deepcopy(self)
+                copyData = snap.DataSnapshot(self)
                 returnValue = lambda self: self.restoreData(copyData, lambda self: self.divide(data, axis, select))
         self.data[select] /= data
         if isinstance(data, (float,int)):
@@ -388,8 +440,11 @@ class Spectrum(object):
 
     def baselineCorrection(self, baseline, axis=-1, select=slice(None)):
         axis = self.checkAxis(axis)
-        baselinetmp = baseline.reshape((self.shape()[axis], ) + (1, ) * (self.ndim() - axis - 1))
-        self.data[select] -= baselinetmp
+        if self.__useChunks([axis], select):
+            self.__chunkApply(lambda spec: spec.baselineCorrection(baseline, axis), [axis])
+        else:
+            baselinetmp = baseline.reshape((self.shape()[axis], ) + (1, ) * (self.ndim() - axis - 1))
+            self.data[select] -= baselinetmp
         Message = "Baseline corrected dimension " + str(axis + 1)
         if type(select) is not slice:
             Message = Message + " with slice " + str(select)
@@ -400,13 +455,42 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.baselineCorrection(-baseline, axis, select=select))
 
+    def baselineCorrectionAll(self, bArray, axis=-1, method='polynomial', degree=3, lam=1e5, p=0.01, maxIter=10, plotType=0):
+        # Fits and subtracts a baseline for every trace along axis, using the points in bArray.
+        # The baseline is fitted to the real, imaginary, complex or absolute data (plotType) and is always real.
+        axis = self.checkAxis(axis)
+        if method not in func.BASELINEMETHODS:
+            raise SpectrumException("Unknown baseline method '" + str(method) + "'")
+        bArray = np.asarray(bArray, dtype=bool)
+        typeFunc = [np.real, np.imag, np.array, np.abs][plotType]
+        tmpData = np.moveaxis(self.data.getHyperData(0), axis, -1)
+        tmpShape = tmpData.shape
+        tmpData = tmpData.reshape((int(tmpData.size / tmpShape[-1]), tmpShape[-1]))
+        if method == 'polynomial':
+            baseline = np.real(typeFunc(func.baselinePolynomial(self.xaxArray[axis], tmpData, bArray, degree)))
+        else:
+            baseline = workers.mapTraces(func.baselineBlock, np.real(typeFunc(tmpData)), (method, bArray, lam, p, maxIter), float)
+        baseline = np.moveaxis(baseline.reshape(tmpShape), -1, axis)
+        self.__subtractBaseline(baseline)
+        if method == 'polynomial':
+            self.addHistory("Polynomial baseline correction of degree " + str(degree) + " per trace of dimension " + str(axis + 1))
+        else:
+            self.addHistory(method.upper() + " baseline correction (lambda = " + str(lam) + ", p = " + str(p) + ") per trace of dimension " + str(axis + 1))
+        self.redoList = []
+        if not self.noUndo:
+            copyData = snap.InverseOperation(lambda self: self.__subtractBaseline(-baseline))
+            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.baselineCorrectionAll(bArray, axis, method, degree, lam, p, maxIter, plotType)))
+
+    def __subtractBaseline(self, baseline):
+        self.data -= baseline
+
     def concatenate(self, axis=-1):
         axis = self.checkAxis(axis)
         splitVal = self.shape()[axis]
         copyData = None
         if self.data.isComplex(axis):
             if not self.noUndo:
-                copyData = copy.deepcopy(self)
+                copyData = snap.DataSnapshot(self)
             self.data = self.data.real(axis)
         invAxis = self.ndim() - axis
         self.data = self.data.concatenate(axis)
@@ -445,7 +529,7 @@ class Spectrum(object):
 
     def real(self, axis=-1):
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         axis = self.checkAxis(axis)
         self.data = self.data.real(axis)
         self.addHistory("Real along dimension " + str(axis+1))
@@ -455,7 +539,7 @@ class Spectrum(object):
 
     def imag(self, axis=-1):
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         axis = self.checkAxis(axis)
         self.data = self.data.imag(axis)
         self.addHistory("Imaginary along dimension " + str(axis+1))
@@ -465,7 +549,7 @@ class Spectrum(object):
 
     def abs(self, axis=-1):
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         axis = self.checkAxis(axis)
         self.data = self.data.abs(axis)
         self.addHistory("Absolute along dimension " + str(axis+1))
@@ -483,7 +567,7 @@ class Spectrum(object):
     def states(self, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.data.states(axis)
         self.resetXax(axis)
         self.addHistory("States conversion on dimension " + str(axis + 1))
@@ -494,7 +578,7 @@ class Spectrum(object):
     def statesTPPI(self, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.data.states(axis, TPPI=True)
         self.resetXax(axis)
         self.addHistory("States-TPPI conversion on dimension " + str(axis + 1))
@@ -505,7 +589,7 @@ class Spectrum(object):
     def echoAntiEcho(self, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.data.echoAntiEcho(axis)
         self.resetXax(axis)
         self.addHistory("Echo-antiecho conversion on dimension " + str(axis + 1))
@@ -553,50 +637,40 @@ class Spectrum(object):
                 keepdims = False
         else:
             keepdims = True
-        tmpdata = ()
-        for i in range(len(pos1)):
-            if not (0 <= pos1[i] <= self.shape()[axis]):
-                raise SpectrumException("Indices not within range")
-            if not (0 <= pos2[i] <= self.shape()[axis]):
-                raise SpectrumException("Indices not within range")
-            if pos1[i] == pos2[i]:
-                raise SpectrumException("Indices cannot be equal")
-            minPos = min(pos1[i], pos2[i])
-            maxPos = max(pos1[i], pos2[i])
-            slicing = (slice(None), ) * axis + (slice(minPos, maxPos), )
+        pos1 = np.array(pos1, dtype=int).flatten()
+        pos2 = np.array(pos2, dtype=int).flatten()
+        length = self.shape()[axis]
+        if np.any(pos1 < 0) or np.any(pos1 > length) or np.any(pos2 < 0) or np.any(pos2 > length):
+            raise SpectrumException("Indices not within range")
+        if np.any(pos1 == pos2):
+            raise SpectrumException("Indices cannot be equal")
+        minPos = np.minimum(pos1, pos2)
+        maxPos = np.maximum(pos1, pos2)
+        # All regions are reduced at once, so the result is allocated only once
+        dataAxis = axis + 1
+        if which in (0, 5, 6):
+            tmpData = func.regionSum(self.data.data, minPos, maxPos, dataAxis)
             if which == 0:
                 if self.spec[axis] == 0:
-                    tmp = self.data[slicing].sum(axis=axis) / self.sw[axis]
+                    tmpData /= self.sw[axis]
                 else:
-                    tmp = self.data[slicing].sum(axis=axis) * self.sw[axis] / (1.0 * self.shape()[axis])
-            elif which == 5:
-                tmp = self.data[slicing].sum(axis=axis)
-            elif which == 1:
-                tmp = self.data[slicing].max(axis=axis)
-            elif which == 2:
-                tmp = self.data[slicing].min(axis=axis)
-            elif which == 3:
-                tmp = self.data[slicing].argmax(axis=axis)
-                maxArgPos = np.array(tmp.data, dtype=int)
-                tmpmaxPos = maxArgPos.flatten()
-                tmp.data = self.xaxArray[axis][slice(minPos, maxPos)][tmpmaxPos].reshape(maxArgPos.shape)
-            elif which == 4:
-                tmp = self.data[slicing].argmin(axis=axis)
-                minArgPos = np.array(tmp.data, dtype=int)
-                tmpminPos = minArgPos.flatten()
-                tmp.data = self.xaxArray[axis][slice(minPos, maxPos)][tmpminPos].reshape(minArgPos.shape)
+                    tmpData *= self.sw[axis] / (1.0 * length)
             elif which == 6:
-                tmp = self.data[slicing].mean(axis=axis)
-            if keepdims:
-                tmpdata += (tmp.expand_dims(axis), )
+                tmpData /= (maxPos - minPos).reshape((-1, ) + (1, ) * (self.ndim() - axis - 1))
+            tmp = hc.HComplexData(tmpData, np.copy(self.data.hyper), self.data.dtype())
+        else:
+            argPos = func.regionArgExtreme(self.data.data[0], minPos, maxPos, axis, which in (1, 3))
+            if which in (1, 2):
+                tmp = hc.HComplexData(np.take_along_axis(self.data.data, argPos[np.newaxis], dataAxis), np.copy(self.data.hyper), self.data.dtype())
             else:
-                tmpdata += (tmp, )
+                tmp = hc.HComplexData(np.asarray(self.xaxArray[axis])[argPos])
         if not keepdims:
+            tmp = hc.HComplexData(np.take(tmp.data, 0, dataAxis), np.copy(tmp.hyper), tmp.dtype())
             if self.ndim() == 1:
-                self.data = tmpdata[0].reshape((1, ))
+                self.data = tmp.reshape((1, ))
                 self.resetXax(axis)
             else:
-                self.data = tmpdata[0]
+                self.data = tmp
                 self.freq = np.delete(self.freq, axis)
                 self.ref = np.delete(self.ref, axis)
                 self.sw = np.delete(self.sw, axis)
@@ -605,15 +679,13 @@ class Spectrum(object):
                 del self.xaxArray[axis]
                 self.data.removeDim(axis)
         else:
-            self.data = tmpdata[0]
-            for extra in tmpdata[1:]:
-                self.data = self.data.append(extra, axis=axis)
+            self.data = tmp
             self.resetXax(axis)
 
     def integrate(self, pos1=None, pos2=None, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.matrixManip(pos1, pos2, axis, which=0)
         self.redoList = []
         if not self.noUndo:
@@ -623,7 +695,7 @@ class Spectrum(object):
     def max(self, pos1=None, pos2=None, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.matrixManip(pos1, pos2, axis, which=1)
         self.redoList = []
         if not self.noUndo:
@@ -633,7 +705,7 @@ class Spectrum(object):
     def min(self, pos1=None, pos2=None, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.matrixManip(pos1, pos2, axis, which=2)
         self.redoList = []
         if not self.noUndo:
@@ -643,7 +715,7 @@ class Spectrum(object):
     def argmax(self, pos1=None, pos2=None, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.matrixManip(pos1, pos2, axis, which=3)
         self.redoList = []
         if not self.noUndo:
@@ -653,7 +725,7 @@ class Spectrum(object):
     def argmin(self, pos1=None, pos2=None, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.matrixManip(pos1, pos2, axis, which=4)
         self.redoList = []
         if not self.noUndo:
@@ -663,7 +735,7 @@ class Spectrum(object):
     def sum(self, pos1=None, pos2=None, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.matrixManip(pos1, pos2, axis, which=5)
         self.redoList = []
         if not self.noUndo:
@@ -673,7 +745,7 @@ class Spectrum(object):
     def average(self, pos1=None, pos2=None, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.matrixManip(pos1, pos2, axis, which=6)
         self.redoList = []
         if not self.noUndo:
@@ -687,7 +759,7 @@ class Spectrum(object):
         if pos2 is None:
             pos2 = self.shape()[axis]
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         minPos = min(pos1, pos2)
         maxPos = max(pos1, pos2)
         slicing = (slice(None), ) * axis + (slice(minPos, maxPos), )
@@ -712,7 +784,7 @@ class Spectrum(object):
         if len(refSpec) != axLen:
             raise SpectrumException("Reference FID does not have the correct length")
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         tmpSpec = np.fft.ifftshift(np.real(refSpec))
         pos = np.argmax(tmpSpec)
         refFid = np.fft.ifft(tmpSpec)
@@ -742,7 +814,7 @@ class Spectrum(object):
     def diff(self, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.data = self.data.diff(axis=axis)
         self.resetXax(axis)
         self.addHistory("Differences over dimension " + str(axis + 1))
@@ -753,7 +825,7 @@ class Spectrum(object):
     def cumsum(self, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.data = self.data.cumsum(axis=axis)
         self.addHistory("Cumulative sum over dimension " + str(axis + 1))
         self.redoList = []
@@ -772,7 +844,7 @@ class Spectrum(object):
     def hilbert(self, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.data.icomplexReorder(axis)
         self.data = self.data.hilbert(axis=axis)
         self.data.icomplexReorder(axis)
@@ -783,23 +855,51 @@ class Spectrum(object):
 
     def autoPhaseAll(self, phaseNum=0, axis=-1):
         axis = self.checkAxis(axis)
-        if not self.noUndo:
-            copyData = copy.deepcopy(self)
-        shape = self.data.shape()
-        shape = np.delete(shape, axis)
-        rangeList = [range(i) for i in shape]
-        for i in itertools.product(*rangeList):
-            locList = np.insert(i, axis, 0)
-            selectList = np.insert(np.array(i,dtype=object), axis, slice(None))
-            self.autoPhase(phaseNum, axis, locList, False, selectList)
+        self.data.icomplexReorder(axis)
+        if self.spec[axis] == 0:
+            self.__fourier(axis, tmp=True)
+        tmpData = np.rollaxis(self.data.getHyperData(0), axis, self.ndim())
+        tmpShape = tmpData.shape
+        tmpData = tmpData.reshape((int(tmpData.size / tmpShape[-1]), tmpShape[-1]))
+        phases = workers.mapTraces(func.autoPhaseBlock, tmpData, (self.__phaseAxis(axis), phaseNum), float, outWidth=2)
+        phase0 = phases[:, 0].reshape(tmpShape[:-1])
+        phase1 = phases[:, 1].reshape(tmpShape[:-1])
+        self.data *= self.__tracePhaseVector(phase0, phase1, axis)
+        if self.spec[axis] == 0:
+            self.__invFourier(axis, tmp=True)
+        self.data.icomplexReorder(axis)
         if phaseNum == 1:
             self.addHistory("Autophased per trace for 0 + 1 order along axis " + str(axis + 1))
         else:
             self.addHistory("Autophased per trace for 0 order along axis " + str(axis + 1))
         self.redoList = []
         if not self.noUndo:
+            copyData = snap.InverseOperation(lambda self: self.__phaseTraces(-phase0, -phase1, axis))
             self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.autoPhaseAll(phaseNum, axis)))
 
+    def __phaseAxis(self, axis):
+        # The frequency axis in units of the spectral width, as used by phase1
+        if self.ref[axis] is None:
+            offset = 0
+        else:
+            offset = self.freq[axis] - self.ref[axis]
+        return func.frequencyVector(self.shape()[axis], self.sw[axis], offset)
+
+    def __tracePhaseVector(self, phase0, phase1, axis):
+        # Phase correction of all data, phase0 and phase1 have a value for every trace along axis
+        vector = self.__phaseAxis(axis)
+        vector = vector.reshape(vector.shape + (1, )*(self.ndim()-axis-1))
+        return np.exp(1j * (np.expand_dims(phase0, axis) + np.expand_dims(phase1, axis) * vector))
+
+    def __phaseTraces(self, phase0, phase1, axis):
+        self.data.icomplexReorder(axis)
+        if self.spec[axis] == 0:
+            self.__fourier(axis, tmp=True)
+        self.data *= self.__tracePhaseVector(phase0, phase1, axis)
+        if self.spec[axis] == 0:
+            self.__invFourier(axis, tmp=True)
+        self.data.icomplexReorder(axis)
+
     def autoPhase(self, phaseNum=0, axis=-1, locList=None, returnPhases=False, select=slice(None)):
         axis = self.checkAxis(axis)
         if locList is None:
@@ -815,11 +915,11 @@ class Spectrum(object):
             self.__fourier(axis, tmp=True)
         tmp = self.data[locList]
         tmp = tmp.getHyperData(0)
-        x = np.fft.fftshift(np.fft.fftfreq(len(tmp), 1.0 / self.sw[axis])) / self.sw[axis]
+        x = self.__phaseAxis(axis)
         # only optimize on the hyper real data
         if phaseNum == 0:
             phases = scipy.optimize.minimize(self.ACMEentropy, [0], (tmp, x, False), method='Powell',options = {'xtol': AUTOPHASETOL})
-            phase0 = phases['x']
+            phase0 = np.atleast_1d(phases['x'])[0]
             phase1 = 0.0
         elif phaseNum == 1:
             phases = scipy.optimize.minimize(self.ACMEentropy, [0, 0], (tmp, x), method='Powell', options = {'xtol': AUTOPHASETOL})
@@ -829,9 +929,9 @@ class Spectrum(object):
             offset = 0
         else:
             offset = self.freq[axis] - self.ref[axis]
-        vector = np.exp(np.fft.fftshift(np.fft.fftfreq(self.shape()[axis], 1.0 / self.sw[axis]) + offset) / self.sw[axis] * phase1 * 1j)
+        vector = func.phaseVector(self.shape()[axis], self.sw[axis], offset, phase0, phase1)
         vector = vector.reshape(vector.shape + (1, )*(self.ndim()-axis-1))
-        self.data[select] *= np.exp(phase0 * 1j) * vector
+        self.data[select] *= vector
         if self.spec[axis] == 0:
             self.__invFourier(axis, tmp=True)
         self.data.icomplexReorder(axis)
@@ -868,12 +968,12 @@ class Spectrum(object):
         return H1 + 1000 * Pfun
 
     def __phase(self, phase0, phase1, offset, axis, select=slice(None)):
-        vector = np.exp(np.fft.fftshift(np.fft.fftfreq(self.shape()[axis], 1.0 / self.sw[axis]) + offset) / self.sw[axis] * phase1 * 1j)
+        vector = func.phaseVector(self.shape()[axis], self.sw[axis], offset, phase0, phase1)
         if self.spec[axis] == 0:
             self.__fourier(axis, tmp=True)
         vector = vector.reshape(vector.shape + (1, )*(self.ndim()-axis-1))
         self.data.icomplexReorder(axis)
-        self.data[select] *= np.exp(phase0 * 1j) * vector
+        self.data[select] *= vector
         self.data.icomplexReorder(axis)
         if self.spec[axis] == 0:
             self.__invFourier(axis, tmp=True)
@@ -884,7 +984,10 @@ class Spectrum(object):
             offset = 0
         else:
             offset = self.freq[axis] - self.ref[axis]
-        self.__phase(phase0, phase1, offset, axis, select=select)
+        if self.__useChunks([axis], select):
+            self.__chunkApply(lambda spec: spec.phase(phase0, phase1, axis, internal=True), [axis])
+        else:
+            self.__phase(phase0, phase1, offset, axis, select=select)
         if not internal:
             Message = "Phasing: phase0 = " + str(phase0 * 180 / np.pi) + " and phase1 = " + str(phase1 * 180 / np.pi) + " for dimension " + str(axis + 1)
             if type(select) is not slice:
@@ -910,11 +1013,18 @@ class Spectrum(object):
         if shiftingAxis is None:
             shiftingAxis = 0
             shifting = 0.0
-        if not self.noUndo:
-            copyData = copy.deepcopy(self)
+        chunkAxes = [axis] if shifting == 0.0 else [axis, shiftingAxis]
+        useChunks = not preview and self.__useChunks(chunkAxes, select)
+        if not self.noUndo and not preview:
+            # With chunks the result is stored in a new array, so the old data can be kept for undo
+            copyData = snap.DataSnapshot(self, select, copyData=not useChunks)
         axLen = self.shape()[axis]
         t = np.arange(0, axLen) / self.sw[axis]
-        if shifting != 0.0:
+        if useChunks:
+            self.__chunkApply(lambda spec: spec.apodize(lor, gauss, cos2, hamming, shift, shifting, shiftingAxis, axis), chunkAxes, inPlace=False)
+            if not self.noUndo:
+                copyData.register(self)
+        elif shifting != 0.0:
             if self.spec[shiftingAxis]:
                 shift1 = shift + shifting * np.arange(self.shape()[shiftingAxis]) / self.sw[shiftingAxis]
             else:
@@ -937,7 +1047,7 @@ class Spectrum(object):
             if self.spec[axis] > 0:
                 self.__fourier(axis, tmp=True)
         else:
-            x = func.apodize(t, shift, self.sw[axis], axLen, lor, gauss, cos2, hamming, self.wholeEcho[axis])
+            x = func.apodizeVector(axLen, self.sw[axis], shift, lor, gauss, cos2, hamming, self.wholeEcho[axis])
             if preview:
                 previewData = [x] * int(np.prod(self.data.shape()) / self.data.shape()[axis])
             if self.spec[axis] > 0:
@@ -1017,17 +1127,17 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.setRef(oldRef, axis))
 
-    def regrid(self, limits, numPoints, axis=-1):
+    def regrid(self, limits, numPoints, axis=-1, method='linear'):
         oldLimits = [self.xaxArray[axis][0], self.xaxArray[axis][-1]]
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         newSw = (limits[1] - limits[0]) / (numPoints - 1) * numPoints
         newAxis = np.fft.fftshift(np.fft.fftfreq(numPoints, 1.0 / newSw))
         newAxis = newAxis - (newAxis[0] + newAxis[-1]) / 2 + (limits[0] + limits[-1]) / 2  # Axis with correct min/max
         newFreq = self.freq[axis] + (newAxis[0] + newAxis[-1]) / 2
         if numPoints % 2 == 0:
             newFreq += newSw / numPoints / 2
-        self.data = self.data.regrid(newAxis, self.xaxArray[axis], axis)
+        self.data = self.data.regrid(newAxis, self.xaxArray[axis], axis, method)
         self.sw[axis] = newSw
         if self.ref[axis] is None:  # Set new 0 freq to those of the old view, if needed
             self.ref[axis] = self.freq[axis]
@@ -1035,10 +1145,13 @@ class Spectrum(object):
             newFreq += - self.freq[axis] + self.ref[axis]
         self.freq[axis] = newFreq
         self.resetXax(axis)
-        self.addHistory("Regrid dimension " + str(axis) + " between " + str(limits[0]) + ' and ' + str(limits[1]) + ' with ' + str(numPoints) + ' points')
+        Message = "Regrid dimension " + str(axis) + " between " + str(limits[0]) + ' and ' + str(limits[1]) + ' with ' + str(numPoints) + ' points'
+        if method != 'linear':
+            Message = Message + " using " + method + " interpolation"
+        self.addHistory(Message)
         self.redoList = []
         if not self.noUndo:
-            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.regrid(limits, numPoints, axis)))
+            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.regrid(limits, numPoints, axis, method)))
 
     def setWholeEcho(self, val, axis=-1):
         axis = self.checkAxis(axis)
@@ -1051,7 +1164,7 @@ class Spectrum(object):
     def resize(self, size, pos, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         if self.spec[axis]:
             self.__invFourier(axis, tmp=True)
         self.data = self.data.resize(size, pos, axis=axis)
@@ -1063,31 +1176,73 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.resize(size, pos, axis)))
 
+    def processPipeline(self, pipeline):
+        # Runs the steps of a pipeline.Pipeline as a single operation
+        axis = self.checkAxis(pipeline.axis)
+        useChunks = self.__useChunks([axis])
+        fused = pipeline.isFusable(self.spec[axis])
+        if not self.noUndo:
+            # The fused and chunked versions store the result in a new array
+            copyData = snap.DataSnapshot(self, copyData=not (fused or useChunks))
+        if useChunks:
+            self.__chunkApply(lambda spec: spec.processPipeline(pipeline), [axis], inPlace=False)
+        elif fused:
+            pipeline.run(self, axis)
+        else:
+            noUndo = self.noUndo
+            historyLength = len(self.history)
+            self.noUndo = True
+            try:
+                pipeline.runSteps(self, axis)
+            finally:
+                self.noUndo = noUndo
+                del self.history[historyLength:]
+        self.addHistory(pipeline.message(axis))
+        self.redoList = []
+        if not self.noUndo:
+            copyData.register(self) # Only now the data of the spectrum has been replaced
+            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.processPipeline(pipeline)))
+
     def lpsvd(self, nPredict, maxFreq, forward=False, numPoints=None, axis=-1):
-        failed = False
+        # Returns the indices of the traces for which the prediction failed, these are zero filled
         axis = self.checkAxis(axis)
+        nPredict = int(nPredict)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         self.data.icomplexReorder(axis)
         if self.spec[axis]:
             self.__invFourier(axis, tmp=True)
-        try:
-            self.data = self.data.apply_along_axis(func.lpsvd, axis, nPredict, maxFreq, forward, numPoints)
-        except Exception:
-            failed = True
+        tmpData = np.moveaxis(self.data.data, axis + 1, -1)
+        tmpShape = tmpData.shape
+        tmpData = tmpData.reshape((int(tmpData.size / tmpShape[-1]), tmpShape[-1]))
+        result = workers.mapTraces(func.lpsvdBlock, tmpData, (nPredict, maxFreq, forward, numPoints), complex, outWidth=tmpShape[-1] + nPredict)
+        failedRows = np.any(np.isnan(result), axis=1)
+        if not np.all(failedRows):
+            if forward:
+                result[failedRows] = np.concatenate((tmpData[failedRows], np.zeros((np.sum(failedRows), nPredict))), axis=1)
+            else:
+                result[failedRows] = np.concatenate((np.zeros((np.sum(failedRows), nPredict)), tmpData[failedRows]), axis=1)
+            result = np.moveaxis(result.reshape(tmpShape[:-1] + (tmpShape[-1] + nPredict, )), -1, axis + 1)
+            self.data = hc.HComplexData(result, np.copy(self.data.hyper), self.data.dtype())
         if self.spec[axis]:
             self.__fourier(axis, tmp=True)
         self.data.icomplexReorder(axis)
-        if failed:
+        if np.all(failedRows):
             raise SpectrumException('LPSVD: Could not determine any acceptable values')
+        # A trace failed when any of its hypercomplex parts failed
+        failed = [tuple(index) for index in np.argwhere(np.any(failedRows.reshape(tmpShape[:-1]), axis=0))]
         self.resetXax(axis)
         if forward:
-            self.addHistory("Forward LPSVD along axis "+ str(axis) + " with " + str(nPredict) + " points")
+            Message = "Forward LPSVD along axis "+ str(axis) + " with " + str(nPredict) + " points"
         else:
-            self.addHistory("Backward LPSVD along axis "+ str(axis) + " with " + str(nPredict) + " points")
+            Message = "Backward LPSVD along axis "+ str(axis) + " with " + str(nPredict) + " points"
+        if failed:
+            Message = Message + ", failed for " + str(len(failed)) + " traces: " + str(failed)
+        self.addHistory(Message)
         self.redoList = []
         if not self.noUndo:
             self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.lpsvd(nPredict, maxFreq, forward, numPoints, axis)))
+        return failed
 
     def setSpec(self, val, axis=-1):
         axis = self.checkAxis(axis)
@@ -1116,15 +1271,19 @@ class Spectrum(object):
     def shift(self, shift, axis=-1, select=slice(None), zeros=True):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self, select)
         if self.spec[axis] > 0:
             self.__invFourier(axis, tmp=True)
         mask = np.ones(self.shape()[axis])
+        numZeros = int(np.ceil(abs(shift)))
         if shift < 0:
-            mask[slice(shift, None)] = 0
+            mask[slice(-numZeros, None)] = 0
+        else:
+            mask[slice(None, numZeros)] = 0
+        if shift == int(shift):
+            self.data[select] = self.data.roll(int(shift), axis)[select]
         else:
-            mask[slice(None, shift)] = 0
-        self.data[select] = self.data.roll(shift, axis)[select]
+            self.data[select] = self.data.rollFraction(shift, axis)[select]
         if zeros:
             self.data[select] *= mask.reshape(mask.shape + (1,)*(self.ndim()-axis-1)) 
         if self.spec[axis] > 0:
@@ -1162,10 +1321,11 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.roll(-shift,axis))
 
-    def align(self, pos1=None, pos2=None, axis=-1):
+    def align(self, pos1=None, pos2=None, axis=-1, method='maximum', parallel=False):
+        # Aligns all traces with the first one, using the data between pos1 and pos2.
+        # 'maximum' rolls the maxima onto each other, the other methods use the cross correlation
+        # with the first trace, and roll the traces over a fraction of a point (see func.correlationShifts).
         axis = self.checkAxis(axis)
-        if not self.noUndo:
-            copyData = copy.deepcopy(self)
         if pos1 is None:
             pos1 = 0
         if pos2 is None:
@@ -1176,22 +1336,47 @@ class Spectrum(object):
             raise SpectrumException("Indices not within range")
         if pos1 == pos2:
             raise SpectrumException("Indices cannot be equal")
+        if method not in func.ALIGNMETHODS:
+            raise SpectrumException("Unknown align method '" + str(method) + "'")
         minPos = min(pos1, pos2)
         maxPos = max(pos1, pos2)
         slicing = (slice(None), ) * axis + (slice(minPos, maxPos), )
-        tmp = self.data[slicing].argmax(axis=axis)
-        maxArgPos = -np.array(tmp.data, dtype=int)
-        maxArgPos -= maxArgPos.flatten()[0]
+        if method == 'maximum':
+            tmp = self.data[slicing].argmax(axis=axis)
+            maxArgPos = -np.array(tmp.data, dtype=int)
+            maxArgPos -= maxArgPos.flatten()[0]
+            self.__rollTraces(maxArgPos[0], axis)
+            self.addHistory("Maxima aligned between " + str(minPos) + " and " + str(maxPos) + " along axis " + str(axis))
+        else:
+            tmpData = np.moveaxis(np.real(self.data.getHyperData(0)[slicing]), axis, -1)
+            tmpShape = tmpData.shape
+            tmpData = tmpData.reshape((int(tmpData.size / tmpShape[-1]), tmpShape[-1]))
+            if parallel:
+                shifts = workers.mapTraces(func.correlationShifts, tmpData, (tmpData[0], method), float, outWidth=1)
+            else:
+                shifts = func.correlationShifts(tmpData, tmpData[0], method)
+            shifts = -shifts.reshape(tmpShape[:-1])
+            self.__rollFraction(shifts, axis)
+            self.addHistory("Aligned by cross correlation between " + str(minPos) + " and " + str(maxPos) + " along axis " + str(axis))
+        self.redoList = []
+        if not self.noUndo:
+            if method == 'maximum':
+                copyData = snap.InverseOperation(lambda self: self.__rollTraces(-maxArgPos[0], axis))
+            else:
+                copyData = snap.InverseOperation(lambda self: self.__rollFraction(-shifts, axis))
+            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.align(pos1, pos2, axis, method, parallel)))
+
+    def __rollFraction(self, shifts, axis):
+        self.data = self.data.rollFraction(shifts, axis)
+
+    def __rollTraces(self, shifts, axis):
+        # Roll every trace along axis over its own number of points
         shape = self.data.shape()
         shape = np.delete(shape, axis)
         rangeList = [range(i) for i in shape]
         for i in itertools.product(*rangeList):
             selectList = np.insert(np.array(i,dtype=object), axis, slice(None))
-            self.data[selectList] = self.data[selectList].roll(maxArgPos[0][tuple(i)], 0)
-        self.addHistory("Maxima aligned between " + str(minPos) + " and " + str(maxPos) + " along axis " + str(axis))
-        self.redoList = []
-        if not self.noUndo:
-            self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.align(pos1, pos2, axis)))
+            self.data[selectList] = self.data[selectList].roll(shifts[tuple(i)], 0)
             
     def __fourier(self, axis, tmp=False, reorder=[True,True]):
         axis = self.checkAxis(axis)
@@ -1200,7 +1385,7 @@ class Spectrum(object):
         if not self.wholeEcho[axis] and not tmp:
             slicing = (slice(None), ) * axis + (0, )
             self.data[slicing] = self.data[slicing] * 0.5
-        self.data = self.data.fft(axis).fftshift(axis)
+        self.data = self.data.fft(axis, shift=True)
         if not tmp:
             self.spec[axis] = 1
         if reorder[1]:
@@ -1211,7 +1396,7 @@ class Spectrum(object):
         axis = self.checkAxis(axis)
         if reorder[0]:
             self.data.icomplexReorder(axis)
-        self.data = self.data.ifftshift(axis).ifft(axis)
+        self.data = self.data.ifft(axis, shift=True)
         if not self.wholeEcho[axis] and not tmp:
             slicing = (slice(None), ) * axis + (0, )
             self.data[slicing] *= 2.0
@@ -1223,18 +1408,22 @@ class Spectrum(object):
 
     def complexFourier(self, axis=-1):
         if self.spec[axis] == 0:
-            self.__fourier(axis)
             self.addHistory("Fourier transform dimension " + str(axis + 1))
         else:
-            self.__invFourier(axis)
             self.addHistory("Inverse fourier transform dimension " + str(axis + 1))
+        if self.__useChunks([axis]):
+            self.__chunkApply(lambda spec: spec.complexFourier(axis), [axis])
+        elif self.spec[axis] == 0:
+            self.__fourier(axis)
+        else:
+            self.__invFourier(axis)
         self.redoList = []
         if not self.noUndo:
             self.undoList.append(lambda self: self.complexFourier(axis))
 
     def realFourier(self, axis=-1):
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         axis = self.checkAxis(axis)
         self.data = self.data.real(axis)
         if self.spec[axis] == 0:
@@ -1266,6 +1455,16 @@ class Spectrum(object):
             raise SpectrumException('Both shearing axes cannot be equal')
         if self.ndim() < 2:
             raise SpectrumException("The data does not have enough dimensions for a shearing transformation")
+        if self.__useChunks([axis, axis2]):
+            self.__chunkApply(lambda spec: spec.shear(shear, axis, axis2, toRef), [axis, axis2])
+        else:
+            self.__shear(shear, axis, axis2, toRef)
+        self.addHistory("Shearing transform with shearing value " + str(shear) + " over dimensions " + str(axis + 1) + " and " + str(axis2 + 1))
+        self.redoList = []
+        if not self.noUndo:
+            self.undoList.append(lambda self: self.shear(-shear, axis, axis2, toRef))
+
+    def __shear(self, shear, axis, axis2, toRef):
         if self.spec[axis] > 0: #rorder and fft for spec
             self.__invFourier(axis, tmp=True, reorder=[True,False])
         else: #Reorder if FID
@@ -1276,27 +1475,31 @@ class Spectrum(object):
         else:
             vec2 = np.fft.fftshift(np.fft.fftfreq(shape[axis2], 1 / self.sw[axis2]))
         vec1 = np.linspace(0, shear * 2 * np.pi * shape[axis] / self.sw[axis], shape[axis] + 1)[:-1]
-        newShape = [1, ] * self.ndim()
-        newShape[axis] = shape[axis]
-        newShape[axis2] = shape[axis2]
-        if axis > axis2:
-            shearMatrix = np.exp(1j * np.outer(vec2, vec1))
-        elif axis < axis2:
-            shearMatrix = np.exp(1j * np.outer(vec1, vec2))
-        self.data *= shearMatrix.reshape(shape)
+        # The phase ramp is made and applied for a block of points along axis2 at a time,
+        # so the full matrix for both axes is never in memory
+        step = max(1, SHEARBLOCK // (16 * shape[axis]))
+        newShape = [1, ] * (self.ndim() + 1)
+        newShape[axis + 1] = shape[axis]
+        for start in range(0, shape[axis2], step):
+            block = slice(start, start + step)
+            shearMatrix = np.exp(1j * np.outer(vec2[block], vec1))
+            if axis < axis2:
+                shearMatrix = shearMatrix.T
+            newShape[axis2 + 1] = len(vec2[block])
+            self.data.data[(slice(None), ) * (axis2 + 1) + (block, )] *= shearMatrix.reshape(newShape)
         if self.spec[axis] > 0:
             self.__fourier(axis, tmp=True, reorder=[False,True])
         else:
             self.data.icomplexReorder(axis)
-        self.addHistory("Shearing transform with shearing value " + str(shear) + " over dimensions " + str(axis + 1) + " and " + str(axis2 + 1))
-        self.redoList = []
-        if not self.noUndo:
-            self.undoList.append(lambda self: self.shear(-shear, axis, axis2, toRef))
 
     def reorder(self, pos, newLength, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            if len(np.unique(pos)) == len(pos): # Unique positions: the data can be taken back from the positions
+                oldXax = self.xaxArray[axis]
+                copyData = snap.InverseOperation(lambda self: self.__unReorder(pos, oldXax, axis))
+            else:
+                copyData = snap.DataSnapshot(self)
         self.data = self.data.reorder(pos, newLength, axis)
         self.resetXax(axis)
         self.addHistory("Reorder dimension " + str(axis + 1) + " to obtain a new length of " + str(newLength) + " with positions " + str(pos))
@@ -1304,10 +1507,14 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.restoreData(copyData, lambda self: self.reorder(pos, newLength, axis)))
 
+    def __unReorder(self, pos, xax, axis):
+        self.data = self.data[(slice(None), ) * axis + (np.array(pos, dtype=int), )]
+        self.xaxArray[axis] = xax
+
     def ffm(self, pos, typeVal, axis=-1):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         # pos contains the values of fixed points which not to be translated to missing points
         posList = np.delete(range(self.shape()[axis]), pos)
         if typeVal == 1:  # type is States or States-TPPI, the positions need to be divided by 2
@@ -1320,11 +1527,8 @@ class Spectrum(object):
         tmpData = np.rollaxis(tmpData, axis, tmpData.ndim)
         tmpShape = tmpData.shape
         tmpData = tmpData.reshape((int(tmpData.size / tmpShape[-1]), tmpShape[-1]))
-        pool = multiprocessing.Pool(multiprocessing.cpu_count())
-        fit = pool.map_async(ffm, [(i, posList) for i in tmpData])
-        pool.close()
-        pool.join()
-        tmpData = np.rollaxis(np.array(fit.get()).reshape(tmpShape), -1, axis)
+        tmpData = workers.mapTraces(nus.ffmBlock, tmpData, (posList, ), complex)
+        tmpData = np.rollaxis(tmpData.reshape(tmpShape), -1, axis)
         self.data = hc.HComplexData(tmpData)
         #Transform back to FID
         self.__invFourier(axis, tmp=True)
@@ -1336,7 +1540,7 @@ class Spectrum(object):
     def clean(self, pos, typeVal, axis, gamma, threshold, maxIter):
         axis = self.checkAxis(axis)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         # pos contains the values of fixed points which not to be translated to missing points
         posList = np.delete(range(self.shape()[axis]), pos)
         if typeVal == 1:  # type is States or States-TPPI, the positions need to be divided by 2
@@ -1352,11 +1556,8 @@ class Spectrum(object):
         mask = np.ones(tmpShape[-1]) / float(tmpShape[-1])
         mask[posList] = 0.0
         mask = np.fft.fft(mask) # abs or real???
-        pool = multiprocessing.Pool(multiprocessing.cpu_count())
-        fit = pool.map_async(clean, [(i, mask, gamma, threshold, maxIter) for i in tmpData])
-        pool.close()
-        pool.join()
-        tmpData = np.rollaxis(np.array(fit.get()).reshape(tmpShape), -1, axis)
+        tmpData = workers.mapTraces(nus.cleanBlock, tmpData, (mask, gamma, threshold, maxIter), float)
+        tmpData = np.rollaxis(tmpData.reshape(tmpShape), -1, axis)
         self.data = hc.HComplexData(tmpData)
         #Transform back to FID
         self.__invFourier(axis, tmp=True)
@@ -1366,11 +1567,13 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.restoreData(copyData, None))
         
-    def ist(self,pos, typeVal, axis, threshold, maxIter, tracelimit):
+    def ist(self,pos, typeVal, axis, threshold, maxIter, tracelimit, axis2=None):
         import scipy.signal
         axis = self.checkAxis(axis)
+        if axis2 is not None:
+            return self.__ist2D(pos, typeVal, axis, self.checkAxis(axis2), threshold, maxIter, tracelimit)
         if not self.noUndo:
-            copyData = copy.deepcopy(self)
+            copyData = snap.DataSnapshot(self)
         # pos contains the values of fixed points which not to be translated to missing points
         self.data.icomplexReorder(axis)
         tmpData = self.data.getHyperData(0)
@@ -1383,11 +1586,8 @@ class Spectrum(object):
         tmpData = np.rollaxis(tmpData, axis, tmpData.ndim)
         tmpShape = tmpData.shape
         tmpData = tmpData.reshape((int(tmpData.size / tmpShape[-1]), tmpShape[-1]))
-        pool = multiprocessing.Pool(multiprocessing.cpu_count())
-        fit = pool.map_async(ist, [(i, posList, threshold, maxIter, tracelimit, NDmax) for i in tmpData])
-        pool.close()
-        pool.join()
-        tmpData = np.rollaxis(np.array(fit.get()).reshape(tmpShape), -1, axis)
+        tmpData = workers.mapTraces(nus.istBlock, tmpData, (posList, threshold, maxIter, tracelimit, NDmax), float)
+        tmpData = np.rollaxis(tmpData.reshape(tmpShape), -1, axis)
         self.data = hc.HComplexData(tmpData)
         #Transform back to FID
         self.__invFourier(axis, tmp=True)
@@ -1397,6 +1597,51 @@ class Spectrum(object):
         if not self.noUndo:
             self.undoList.append(lambda self: self.restoreData(copyData, None))
 
+    def __ist2D(self, pos, typeVal, axis, axis2, threshold, maxIter, tracelimit):
+        # Joint reconstruction of two dimensions, pos is a list of sampled (axis, axis2) index pairs.
+        # When the data is hypercomplex along axis, the real and imaginary part along axis are reconstructed
+        # together, so the quadrature of both dimensions is kept. As in the 1D IST, only the real part
+        # along the other dimensions is kept.
+        if axis == axis2:
+            raise SpectrumException("IST: the two dimensions should be different")
+        if not self.noUndo:
+            copyData = snap.DataSnapshot(self)
+        pos = np.array(pos, dtype=int).reshape(-1, 2)
+        if typeVal == 1:  # type is States or States-TPPI, the positions need to be divided by 2
+            pos = np.array(np.floor(pos / 2), dtype=int)
+        # After this, the imaginary part along axis (if any) is the 2**axis part, and the data is complex along axis2
+        self.data.icomplexReorder(axis2)
+        hyperList = [0]
+        if self.data.isHyperComplex(axis):
+            hyperList.append(2**axis)
+        tmpData = np.array([np.moveaxis(self.data.getHyperData(hyper), (axis, axis2), (-2, -1)) for hyper in hyperList], dtype=complex)
+        tmpData = np.moveaxis(tmpData, 0, -3)
+        tmpShape = tmpData.shape
+        sampled = np.zeros(tmpShape[-2:], dtype=bool)
+        sampled[pos[:, 0], pos[:, 1]] = True
+        # The first points are scaled as in the 1D IST. The spectra of the planes
+        # give NDmax and are the start of the iterations of istPlaneBlock.
+        tmpData[..., 0, :] *= 0.5
+        tmpData[..., :, 0] *= 0.5
+        tmpData = nus.planeFft(tmpData.reshape((-1, ) + tmpShape[-3:]))
+        NDmax = np.sqrt(np.max(np.sum(tmpData.real**2 + tmpData.imag**2, axis=1))) #Get max of ND matrix
+        tmpData = tmpData.reshape((tmpData.shape[0], -1))
+        tmpData = workers.mapTraces(nus.istPlaneBlock, tmpData, (tmpShape[-3:], sampled, threshold, maxIter, tracelimit, NDmax), complex)
+        tmpData = np.moveaxis(np.moveaxis(tmpData.reshape(tmpShape), -3, 0), (-2, -1), (axis + 1, axis2 + 1))
+        self.data = hc.HComplexData(tmpData, np.array(hyperList))
+        #Transform back to FID
+        self.__invFourier(axis, tmp=True)
+        self.__invFourier(axis2, tmp=True)
+        if len(hyperList) > 1:
+            kept = "hypercomplex "
+        else:
+            kept = "complex "
+        self.addHistory("Joint IST reconstruction (threshold = " + str(threshold) + " , maxIter = " + str(maxIter) + " , tracelimit = " + str(tracelimit*100) + ") " + 
+        "of dimensions " + str(axis + 1) + " and " + str(axis2 + 1) + " at positions " + str(pos.tolist()) + ", keeping the " + kept + "data of these dimensions")
+        self.redoList = []
+        if not self.noUndo:
+            self.undoList.append(lambda self: self.restoreData(copyData, None))
+
     def getSlice(self, axes, locList, stack=None):
         locList = np.array(locList, dtype=object)
         if stack is None:
@@ -1404,34 +1649,44 @@ class Spectrum(object):
         for i, axis in enumerate(axes):
             axes[i] = self.checkAxis(axis)
         locList[axes] = stack
-        sliceData = self.data[locList].copy()
-        sliceData.icomplexReorder(axes[-1])
         orderInd = np.argsort(axes)
-        sliceData = sliceData.moveaxis(np.arange(sliceData.ndim()), orderInd)
-        sliceSpec = copy.deepcopy(Spectrum(hc.HComplexData(sliceData.getHyperData(0)),
-                                           self.filePath,
-                                           [self.freq[axis] for axis in axes],
-                                           [self.sw[axis] for axis in axes],
-                                           [self.spec[axis] for axis in axes],
-                                           [self.wholeEcho[axis] for axis in axes],
-                                           [self.ref[axis] for axis in axes],
-                                           [self.xaxArray[axis][stack[i]] for i, axis in enumerate(axes)],
-                                           self.history,
-                                           name=self.name))
+        if self.data.isLazy() or self.data.isHyperComplex(axes[-1]):
+            sliceData = self.data[locList]
+            sliceData.icomplexReorder(axes[-1])
+            sliceData = sliceData.moveaxis(np.arange(sliceData.ndim()), orderInd)
+            sliceData = hc.HComplexData(sliceData.getHyperData(0))
+        else:
+            # The slice shares the data of the spectrum, it is only copied when the slice is changed (e.g. by a preview)
+            view = self.data.data[(np.flatnonzero(self.data.hyper == 0)[0], ) + tuple(locList)]
+            view = np.moveaxis(view, np.arange(view.ndim), orderInd)
+            sliceData = hc.HComplexData(source=hc.ViewSource(view))
+        sliceSpec = Spectrum(sliceData,
+                             self.filePath,
+                             [self.freq[axis] for axis in axes],
+                             [self.sw[axis] for axis in axes],
+                             [self.spec[axis] for axis in axes],
+                             [self.wholeEcho[axis] for axis in axes],
+                             [self.ref[axis] for axis in axes],
+                             [np.copy(self.xaxArray[axis][stack[i]]) for i, axis in enumerate(axes)],
+                             list(self.history),
+                             name=self.name)
         sliceSpec.noUndo = True
         return sliceSpec
                 
-    def restoreData(self, copyData, returnValue):  # restore data from an old copy for undo purposes
+    def restoreData(self, copyData, returnValue):  # restore data from an old copy or a snapshot for undo purposes
         if (not self.noUndo) and returnValue is None:
-            copyData2 = copy.deepcopy(self)
-        self.data = copyData.data
-        self.freq = copyData.freq  # array of center frequency (length is dim, MHz)
-        self.filePath = copyData.filePath
-        self.sw = copyData.sw  # array of sweepwidths
-        self.spec = copyData.spec
-        self.wholeEcho = copyData.wholeEcho
-        self.xaxArray = copyData.xaxArray
-        self.ref = copyData.ref
+            copyData2 = snap.DataSnapshot(self)
+        if isinstance(copyData, Spectrum):
+            self.data = copyData.data
+            self.freq = copyData.freq  # array of center frequency (length is dim, MHz)
+            self.filePath = copyData.filePath
+            self.sw = copyData.sw  # array of sweepwidths
+            self.spec = copyData.spec
+            self.wholeEcho = copyData.wholeEcho
+            self.xaxArray = copyData.xaxArray
+            self.ref = copyData.ref
+        else:
+            copyData.restore(self)
         self.addHistory("Data was restored to a previous state ")
         self.redoList = []
         if (not self.noUndo) and returnValue is None:
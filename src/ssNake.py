@@ -82,6 +82,10 @@ importList = [['matplotlib.figure', 'Figure', 'Figure'],
               ['webbrowser', 'webbrowser', None],
               ['spectrum', 'sc', None],
               ['hypercomplex', 'hc', None],
+              ['snapshot', 'snap', None],
+              ['fftBackend', 'fftb', None],
+              ['chunked', 'chunk', None],
+              ['workers', 'workers', None],
               ['fitting', 'fit', None],
               ['safeEval', 'safeEval', 'safeEval'],
               ['widgetClasses', 'wc', None],
@@ -89,6 +93,7 @@ importList = [['matplotlib.figure', 'Figure', 'Figure'],
               ['saveFigure', 'SaveFigureWindow', 'SaveFigureWindow'],
               ['functions', 'func', None],
               ['specIO', 'io', None],
+              ['datasetIndex', 'di', None],
               ['views', 'views', None],
               ['simFunctions', 'sim', None],
               ['loadIsotopes','loadIsotopes',None],
@@ -260,6 +265,15 @@ class MainProgram(QtWidgets.QMainWindow):
         self.defaultNegColor = '#FF7F0E'
         self.defaultStartupBool = False
         self.defaultStartupDir = '~'
+        self.defaultUndoBudget = 0
+        self.defaultUndoCompress = False
+        self.defaultFftBackend = fftb.DEFAULTBACKEND
+        self.defaultFftWorkers = 0
+        self.defaultSinglePrecision = False
+        self.defaultChunkSize = 0
+        self.defaultChunkToDisk = False
+        self.defaultNusWorkers = 0
+        self.defaultNusChunkSize = 0
         self.defaultToolbarActionList = ['File --> Open',
                                          'File -- > Save --> Matlab',
                                          'File --> Export --> Figure',
@@ -355,6 +369,46 @@ class MainProgram(QtWidgets.QMainWindow):
             self.defaultHeightRatio = settings.value("contour/height_ratio", self.defaultHeightRatio, float)
         except TypeError:
             self.dispMsg("Incorrect value in the config file for the contour/height_ratio")
+        try:
+            self.defaultUndoBudget = settings.value("processing/undobudget", self.defaultUndoBudget, int)
+        except TypeError:
+            self.dispMsg("Incorrect value in the config file for the processing/undobudget")
+        self.defaultUndoCompress = settings.value("processing/undocompress", self.defaultUndoCompress, bool)
+        self.defaultFftBackend = settings.value("processing/fftbackend", self.defaultFftBackend, str)
+        if not str(self.defaultFftBackend) in fftb.BACKENDLIST:
+            self.dispMsg("FFT backend from the config file is not available")
+            self.defaultFftBackend = fftb.DEFAULTBACKEND
+        try:
+            self.defaultFftWorkers = settings.value("processing/fftworkers", self.defaultFftWorkers, int)
+        except TypeError:
+            self.dispMsg("Incorrect value in the config file for the processing/fftworkers")
+        self.defaultSinglePrecision = settings.value("processing/singleprecision", self.defaultSinglePrecision, bool)
+        try:
+            self.defaultChunkSize = settings.value("processing/chunksize", self.defaultChunkSize, int)
+        except TypeError:
+            self.dispMsg("Incorrect value in the config file for the processing/chunksize")
+        self.defaultChunkToDisk = settings.value("processing/chunktodisk", self.defaultChunkToDisk, bool)
+        try:
+            self.defaultNusWorkers = settings.value("processing/nusworkers", self.defaultNusWorkers, int)
+        except TypeError:
+            self.dispMsg("Incorrect value in the config file for the processing/nusworkers")
+        try:
+            self.defaultNusChunkSize = settings.value("processing/nuschunksize", self.defaultNusChunkSize, int)
+        except TypeError:
+            self.dispMsg("Incorrect value in the config file for the processing/nuschunksize")
+        self.setProcessingDefaults()
+
+    def setProcessingDefaults(self):
+        snap.setDefaultBudget(self.defaultUndoBudget * 1024**2, self.defaultUndoCompress)
+        fftb.setBackend(str(self.defaultFftBackend))
+        if self.defaultFftWorkers > 0:
+            fftb.setWorkers(self.defaultFftWorkers)
+        else:
+            fftb.setWorkers(-1)
+        hc.setSinglePrecision(self.defaultSinglePrecision)
+        chunk.setChunking(self.defaultChunkSize * 1024**2, self.defaultChunkToDisk)
+        workers.setWorkers(self.defaultNusWorkers)
+        workers.setChunkSize(self.defaultNusChunkSize)
 
     def saveDefaults(self):
         QtCore.QSettings.setDefaultFormat(QtCore.QSettings.IniFormat)
@@ -389,6 +443,16 @@ class MainProgram(QtWidgets.QMainWindow):
         settings.setValue("contour/height_ratio", self.defaultHeightRatio)
         settings.setValue("contour/diagonalbool", self.defaultDiagonalBool)
         settings.setValue("contour/diagonalmult", self.defaultDiagonalMult)
+        settings.setValue("processing/undobudget", self.defaultUndoBudget)
+        settings.setValue("processing/undocompress", self.defaultUndoCompress)
+        settings.setValue("processing/fftbackend", self.defaultFftBackend)
+        settings.setValue("processing/fftworkers", self.defaultFftWorkers)
+        settings.setValue("processing/singleprecision", self.defaultSinglePrecision)
+        settings.setValue("processing/chunksize", self.defaultChunkSize)
+        settings.setValue("processing/chunktodisk", self.defaultChunkToDisk)
+        settings.setValue("processing/nusworkers", self.defaultNusWorkers)
+        settings.setValue("processing/nuschunksize", self.defaultNusChunkSize)
+        self.setProcessingDefaults()
 
     def dispMsg(self, msg, color='black'):
         if color == 'red':
@@ -408,6 +472,7 @@ class MainProgram(QtWidgets.QMainWindow):
                                    ['File --> Open', self.openAct],
                                    ['File --> Save --> JSON', self.saveAct],
                                    ['File -- > Save --> Matlab', self.saveMatAct],
+                                   ['File --> Save --> ssNake', self.saveSsnakeAct],
                                    ['File --> Export --> Figure', self.savefigAct],
                                    ['File --> Export --> Simpson', self.saveSimpsonAct],
                                    ['File --> Export --> ASCII (1D/2D)', self.saveASCIIAct],
@@ -539,12 +604,16 @@ class MainProgram(QtWidgets.QMainWindow):
         self.openAct.setToolTip('Open a File')
         self.combineLoadAct = self.filemenu.addAction(QtGui.QIcon(IconDirectory + 'combine.png'), '&Open && Combine', self.createCombineLoadWindow)
         self.combineLoadAct.setToolTip('Open and Combine Multiple Files')
+        self.indexAct = self.filemenu.addAction(QtGui.QIcon(IconDirectory + 'open.png'), 'Search &Index', self.createDatasetIndexWindow)
+        self.indexAct.setToolTip('Search the Dataset Index')
         self.savemenu = QtWidgets.QMenu('&Save', self)
         self.filemenu.addMenu(self.savemenu)
         self.saveAct = self.savemenu.addAction(QtGui.QIcon(IconDirectory + 'JSON.png'), 'JSON', self.saveJSONFile, QtGui.QKeySequence.Save)
         self.saveAct.setToolTip('Save as JSON File')
         self.saveMatAct = self.savemenu.addAction(QtGui.QIcon(IconDirectory + 'Matlab.png'), 'MATLAB', self.saveMatlabFile)
         self.saveMatAct.setToolTip('Save as MATLAB File')
+        self.saveSsnakeAct = self.savemenu.addAction(QtGui.QIcon(IconDirectory + 'ssnake.png'), 'ssNake', self.saveSsnakeFile)
+        self.saveSsnakeAct.setToolTip('Save as binary ssNake File')
         self.exportmenu = QtWidgets.QMenu('&Export', self)
         self.filemenu.addMenu(self.exportmenu)
         self.savefigAct = self.exportmenu.addAction(QtGui.QIcon(IconDirectory + 'figure.png'), 'Figure', self.saveFigure, QtGui.QKeySequence.Print)
@@ -557,11 +626,11 @@ class MainProgram(QtWidgets.QMainWindow):
         self.preferencesAct.setToolTip('Open Preferences Window')
         self.quitAct = self.filemenu.addAction(QtGui.QIcon(IconDirectory + 'quit.png'), '&Quit', self.fileQuit, QtGui.QKeySequence.Quit)
         self.quitAct.setToolTip('Close ssNake')
-        self.saveActList = [self.saveAct, self.saveMatAct]
+        self.saveActList = [self.saveAct, self.saveMatAct, self.saveSsnakeAct]
         self.exportActList = [self.savefigAct, self.saveSimpsonAct, self.saveASCIIAct]
-        self.fileActList = [self.openAct, self.saveAct, self.saveMatAct,
+        self.fileActList = [self.openAct, self.saveAct, self.saveMatAct, self.saveSsnakeAct,
                             self.savefigAct, self.saveSimpsonAct, self.saveASCIIAct,
-                            self.combineLoadAct, self.preferencesAct, self.quitAct]
+                            self.combineLoadAct, self.indexAct, self.preferencesAct, self.quitAct]
         # Workspaces menu
         self.workspacemenu = QtWidgets.QMenu('&Workspaces', self)
         self.menubar.addMenu(self.workspacemenu)
@@ -1455,6 +1524,9 @@ class MainProgram(QtWidgets.QMainWindow):
     def createCombineLoadWindow(self):
         CombineLoadWindow(self)
 
+    def createDatasetIndexWindow(self):
+        DatasetIndexWindow(self)
+
     def combineWorkspace(self, combineNames):
         wsname = self.askName()
         if wsname is None:
@@ -1531,7 +1603,16 @@ class MainProgram(QtWidgets.QMainWindow):
         return fileName
 
     def loadAndCombine(self, filePathList):
-        masterData = io.autoLoad(filePathList)
+        progressDialog = QtWidgets.QProgressDialog('Loading files...', None, 0, len(filePathList), self)
+        progressDialog.setWindowModality(QtCore.Qt.WindowModal)
+        progressDialog.setMinimumDuration(500)
+        def progress(done, total):
+            progressDialog.setValue(done)
+            QtWidgets.qApp.processEvents()
+        try:
+            masterData = io.autoLoad(filePathList, progress=progress)
+        finally:
+            progressDialog.close()
         wsname = self.askName()
         if wsname is None:
             return
@@ -1574,6 +1655,9 @@ class MainProgram(QtWidgets.QMainWindow):
     def saveMatlabFile(self):
         self.mainWindow.get_mainWindow().saveMatlabFile()
 
+    def saveSsnakeFile(self):
+        self.mainWindow.get_mainWindow().saveSsnakeFile()
+
     def saveFigure(self):
         if self.mainWindow is None:
             return
@@ -1659,6 +1743,7 @@ class MainProgram(QtWidgets.QMainWindow):
         if reply == QtWidgets.QMessageBox.Yes:
             for item in fit.stopDict.keys():  # Send stop commands to all threads
                 fit.stopDict[item] = True
+            workers.shutdown()
             event.accept()
         else:
             event.ignore()
@@ -1779,13 +1864,15 @@ class Main1DWindow(QtWidgets.QWidget):
 
     def saveJSONFile(self):
         WorkspaceName = self.father.workspaceNames[self.father.workspaceNum]  # Set name of file to be saved to workspace name to start
-        name = QtWidgets.QFileDialog.getSaveFileName(self, 'Save File', self.father.lastLocation + os.path.sep + WorkspaceName + '.json', 'JSON (*.json)')
+        name = QtWidgets.QFileDialog.getSaveFileName(self, 'Save File', self.father.lastLocation + os.path.sep + WorkspaceName + '.json', 'JSON (*.json);;JSON with binary data (*.json)')
+        binary = False
         if isinstance(name, tuple):
+            binary = 'binary' in name[1]
             name = name[0]
         if not name:
             return
         self.father.lastLocation = os.path.dirname(name)  # Save used path
-        io.saveJSONFile(name, self.masterData)
+        io.saveJSONFile(name, self.masterData, binary)
 
     def saveMatlabFile(self):
         WorkspaceName = self.father.workspaceNames[self.father.workspaceNum]  # Set name of file to be saved to workspace name to start
@@ -1797,6 +1884,16 @@ class Main1DWindow(QtWidgets.QWidget):
         self.father.lastLocation = os.path.dirname(name)  # Save used path
         io.saveMatlabFile(name, self.masterData, self.father.workspaceNames[self.father.workspaceNum])
 
+    def saveSsnakeFile(self):
+        WorkspaceName = self.father.workspaceNames[self.father.workspaceNum]  # Set name of file to be saved to workspace name to start
+        name = QtWidgets.QFileDialog.getSaveFileName(self, 'Save File', self.father.lastLocation + os.path.sep + WorkspaceName + '.ssnake', 'ssNake file (*.ssnake)')
+        if isinstance(name, tuple):
+            name = name[0]
+        if not name:
+            return
+        self.father.lastLocation = os.path.dirname(name)  # Save used path
+        io.saveSsnakeFile(name, self.masterData)
+
     def SaveSimpsonFile(self):
         if self.masterData.ndim() > 2:
             raise SsnakeException('Saving to Simpson format only allowed for 1D and 2D data!')
@@ -4255,25 +4352,42 @@ class BaselineWindow(wc.ToolWindows):
 
     def __init__(self, parent):
         super(BaselineWindow, self).__init__(parent)
-        self.grid.addWidget(wc.QLabel("Polynomial Degree:"), 0, 0, 1, 2)
+        self.grid.addWidget(wc.QLabel("Method:"), 0, 0, 1, 2)
+        self.methodDrop = QtWidgets.QComboBox(parent=self)
+        self.methodDrop.addItems(["Polynomial", "ALS", "arPLS"])
+        self.methodDrop.currentIndexChanged.connect(self.changeMethod)
+        self.grid.addWidget(self.methodDrop, 1, 0, 1, 2)
+        self.degreeLabel = wc.QLabel("Polynomial Degree:")
+        self.grid.addWidget(self.degreeLabel, 2, 0, 1, 2)
         self.removeList = []
         self.degreeEntry = wc.SsnakeSpinBox()
         self.degreeEntry.setMaximum(100)
         self.degreeEntry.setMinimum(1)
         self.degreeEntry.setValue(3)
         self.degreeEntry.setAlignment(QtCore.Qt.AlignCenter)
-        self.grid.addWidget(self.degreeEntry, 1, 0, 1, 2)
+        self.grid.addWidget(self.degreeEntry, 3, 0, 1, 2)
+        self.lamLabel = wc.QLeftLabel("Smoothness:")
+        self.lamLabel.setToolTip("Smoothness parameter (lambda) of the baseline")
+        self.grid.addWidget(self.lamLabel, 4, 0)
+        self.lamEntry = wc.QLineEdit("1e5", self.preview)
+        self.grid.addWidget(self.lamEntry, 4, 1)
+        self.pLabel = wc.QLeftLabel("Asymmetry:")
+        self.pLabel.setToolTip("Weight (p) of the points above the ALS baseline")
+        self.grid.addWidget(self.pLabel, 5, 0)
+        self.pEntry = wc.QLineEdit("0.01", self.preview)
+        self.grid.addWidget(self.pEntry, 5, 1)
         self.invertButton = QtWidgets.QCheckBox("Invert selection")
         self.invertButton.stateChanged.connect(self.preview)
-        self.grid.addWidget(self.invertButton, 2, 0, 1, 2)
+        self.grid.addWidget(self.invertButton, 6, 0, 1, 2)
         self.allFitButton = QtWidgets.QCheckBox("Fit traces separately")
-        self.grid.addWidget(self.allFitButton, 3, 0, 1, 2)
+        self.grid.addWidget(self.allFitButton, 7, 0, 1, 2)
         resetButton = QtWidgets.QPushButton("&Reset")
         resetButton.clicked.connect(self.reset)
-        self.grid.addWidget(resetButton, 4, 0)
+        self.grid.addWidget(resetButton, 8, 0)
         fitButton = QtWidgets.QPushButton("&Fit")
         fitButton.clicked.connect(self.preview)
-        self.grid.addWidget(fitButton, 4, 1)
+        self.grid.addWidget(fitButton, 8, 1)
+        self.changeMethod()
         self.father.current.peakPickFunc = lambda pos, self=self: self.picked(pos)
         self.father.current.peakPick = True
 
@@ -4283,10 +4397,30 @@ class BaselineWindow(wc.ToolWindows):
         self.father.current.peakPickFunc = lambda pos, self=self: self.picked(pos)
         self.father.current.peakPick = True
 
+    def changeMethod(self, *args):
+        polynomial = self.methodDrop.currentIndex() == 0
+        self.degreeLabel.setVisible(polynomial)
+        self.degreeEntry.setVisible(polynomial)
+        self.lamLabel.setVisible(not polynomial)
+        self.lamEntry.setVisible(not polynomial)
+        self.pLabel.setVisible(self.methodDrop.currentIndex() == 1)
+        self.pEntry.setVisible(self.methodDrop.currentIndex() == 1)
+
+    def getMethod(self):
+        method = func.BASELINEMETHODS[self.methodDrop.currentIndex()]
+        lam = safeEval(self.lamEntry.text(), type='FI')
+        if lam is None or lam <= 0:
+            raise SsnakeException("Baseline correction: 'Smoothness' input not valid")
+        p = safeEval(self.pEntry.text(), type='FI')
+        if p is None or not 0 < p < 1:
+            raise SsnakeException("Baseline correction: 'Asymmetry' input not valid")
+        return method, lam, p
+
     def preview(self, *args):
         inp = self.degreeEntry.value()
+        method, lam, p = self.getMethod()
         self.father.current.previewRemoveList(self.removeList, invert=self.invertButton.isChecked())
-        self.father.current.previewBaselineCorrection(inp, self.removeList, invert=self.invertButton.isChecked())
+        self.father.current.previewBaselineCorrection(inp, self.removeList, invert=self.invertButton.isChecked(), method=method, lam=lam, p=p)
         self.father.current.peakPickFunc = lambda pos, self=self: self.picked(pos)
         self.father.current.peakPick = True
 
@@ -4302,10 +4436,11 @@ class BaselineWindow(wc.ToolWindows):
 
     def applyFunc(self):
         inp = self.degreeEntry.value()
+        method, lam, p = self.getMethod()
         if self.allFitButton.isChecked():
-            self.father.current.baselineCorrectionAll(inp, self.removeList, self.singleSlice.isChecked(), invert=self.invertButton.isChecked())
+            self.father.current.baselineCorrectionAll(inp, self.removeList, self.singleSlice.isChecked(), invert=self.invertButton.isChecked(), method=method, lam=lam, p=p)
         else:
-            self.father.current.baselineCorrection(inp, self.removeList, self.singleSlice.isChecked(), invert=self.invertButton.isChecked())
+            self.father.current.baselineCorrection(inp, self.removeList, self.singleSlice.isChecked(), invert=self.invertButton.isChecked(), method=method, lam=lam, p=p)
         self.father.current.peakPickReset()
         self.father.current.resetPreviewRemoveList()
 
@@ -4707,9 +4842,14 @@ class AlignDataWindow(regionWindow2):
 
     def __init__(self, parent):
         super(AlignDataWindow, self).__init__(parent, 'Align Maxima', False)
+        self.grid.addWidget(wc.QLabel("Method:"), 4, 0)
+        self.methodDrop = QtWidgets.QComboBox(parent=self)
+        self.methodDrop.addItems(["Maxima", "Cross correlation (parabolic)", "Cross correlation (phase)"])
+        self.methodDrop.setToolTip("The cross correlation methods shift the traces over a fraction of a point")
+        self.grid.addWidget(self.methodDrop, 5, 0)
 
     def apply(self, maximum, minimum, newSpec):
-        self.father.current.align(maximum, minimum)
+        self.father.current.align(maximum, minimum, func.ALIGNMETHODS[self.methodDrop.currentIndex()])
         self.father.updAllFrames()
         return 1
 
@@ -5579,6 +5719,10 @@ class RegridWindow(wc.ToolWindows):
             self.grid.addWidget(self.maxLabel, 2, 0)
             self.grid.addWidget(self.pointsLabel, 3, 0)
             self.grid.addWidget(self.points, 3, 1)
+            self.grid.addWidget(wc.QLeftLabel('Interpolation:'), 4, 0)
+            self.methodDrop = QtWidgets.QComboBox(parent=self)
+            self.methodDrop.addItems(["Linear", "Spline", "Sinc"])
+            self.grid.addWidget(self.methodDrop, 4, 1)
         else:
             self.closeEvent()
 
@@ -5603,7 +5747,7 @@ class RegridWindow(wc.ToolWindows):
         elif self.unit == 'ppm':
             maxVal *= self.father.masterData.ref[self.father.current.axes[-1]] / 1e6
             minVal *= self.father.masterData.ref[self.father.current.axes[-1]] / 1e6
-        self.father.current.regrid([minVal, maxVal], numPoints)
+        self.father.current.regrid([minVal, maxVal], numPoints, func.REGRIDMETHODS[self.methodDrop.currentIndex()])
 
 ##########################################################################################
 
@@ -5738,6 +5882,12 @@ class ISTWindow(wc.ToolWindows):
         self.grid.addWidget(wc.QLabel("Stop when residual below (% of ND max):"), 9, 0)
         self.tracelimitEntry = wc.QLineEdit("2.0")
         self.grid.addWidget(self.tracelimitEntry, 10, 0)
+        self.grid.addWidget(wc.QLabel("Joint reconstruction with dimension:"), 11, 0)
+        self.axis2Drop = QtWidgets.QComboBox(parent=self)
+        self.axis2List = [i for i in range(self.father.current.ndim()) if i != self.father.current.axes[-1]]
+        self.axis2Drop.addItems(["None"] + [str(i + 1) for i in self.axis2List])
+        self.axis2Drop.setToolTip("For joint IST, the positions are pairs of indices along the current dimension and this dimension")
+        self.grid.addWidget(self.axis2Drop, 12, 0)
 
     def preview(self, *args):
         pass
@@ -5768,7 +5918,12 @@ class ISTWindow(wc.ToolWindows):
         if maxIter is None:
             raise SsnakeException("IST: 'Max. iter.' input is not valid")
         maxIter = int(maxIter)
-        check = self.father.current.ist(val, self.typeDrop.currentIndex(), threshold, maxIter, tracelimit)
+        axis2 = None
+        if self.axis2Drop.currentIndex() > 0:
+            axis2 = self.axis2List[self.axis2Drop.currentIndex() - 1]
+            if val.ndim != 2 or val.shape[1] != 2:
+                raise SsnakeException("IST: 'Positions' should be a list of index pairs for a joint reconstruction")
+        check = self.father.current.ist(val, self.typeDrop.currentIndex(), threshold, maxIter, tracelimit, axis2)
         if check is False:
             raise SsnakeException("IST: error")
 
@@ -6184,8 +6339,15 @@ class HistoryWindow(wc.ToolWindows):
         self.valEntry.setLineWrapMode(QtWidgets.QTextEdit.NoWrap)
         self.valEntry.setText(self.father.masterData.getHistory())
         self.grid.addWidget(self.valEntry, 1, 0)
+        stats = self.father.masterData.getUndoStats()
+        undoText = "Undo steps: " + str(stats['undo']) + ", redo steps: " + str(stats['redo'])
+        undoText += "\nUndo data in memory: " + self.sizeString(stats['memory']) + ", on disk: " + self.sizeString(stats['disk']) + " (moved to disk " + str(stats['spills']) + " times)"
+        self.grid.addWidget(wc.QLabel(undoText), 2, 0)
         self.resize(550, 700)
 
+    def sizeString(self, nbytes):
+        return '%.1f MB' % (nbytes / 1024.0**2)
+
 #########################################################################################
 
 
@@ -6328,6 +6490,98 @@ class CombineLoadWindow(wc.ToolWindows):
 ##########################################################################################
 
 
+class DatasetIndexWindow(wc.ToolWindows):
+
+    NAME = "Dataset Index"
+    BROWSE = True
+    RESIZABLE = True
+    MENUDISABLE = False
+    OKNAME = "&Load"
+    MAXRESULTS = 1000
+
+    def __init__(self, parent):
+        super(DatasetIndexWindow, self).__init__(parent)
+        self.browseButton.setText("&Add Directory")
+        self.index = di.DatasetIndex()
+        self.grid.addWidget(wc.QLabel("Search:"), 0, 0)
+        self.searchLine = wc.QLineEdit()
+        self.searchLine.setToolTip('Words to search for in the path, format, nucleus and pulse program')
+        self.searchLine.textChanged.connect(self.search)
+        self.grid.addWidget(self.searchLine, 0, 1)
+        updateButton = QtWidgets.QPushButton("&Update Index")
+        updateButton.setToolTip('Update all directories in the index')
+        updateButton.clicked.connect(self.updateIndex)
+        self.grid.addWidget(updateButton, 0, 2)
+        self.resultList = QtWidgets.QListWidget(self)
+        self.resultList.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        self.resultList.itemDoubleClicked.connect(self.applyAndClose)
+        self.grid.addWidget(self.resultList, 1, 0, 1, 3)
+        self.countLabel = wc.QLabel("")
+        self.grid.addWidget(self.countLabel, 2, 0, 1, 3)
+        self.resize(700, 400)
+        self.search()
+
+    def search(self, *args):
+        self.resultList.clear()
+        results = self.index.search(self.searchLine.text(), limit=self.MAXRESULTS + 1)
+        for result in results[:self.MAXRESULTS]:
+            info = [result['format']]
+            if result['shape'] is not None:
+                info.append('x'.join([str(n) for n in result['shape']]))
+            for key in ['nucleus', 'pulseProgram']:
+                if result[key]:
+                    info.append(result[key])
+            item = QtWidgets.QListWidgetItem(result['path'] + '  (' + ', '.join(info) + ')', self.resultList)
+            item.setData(QtCore.Qt.UserRole, result['path'])
+            tip = ['Format: ' + result['format']]
+            if result['shape'] is not None:
+                tip.append('Shape: ' + str(result['shape']))
+            for key, name in [('nucleus', 'Nucleus'), ('pulseProgram', 'Pulse program'), ('scans', '# Scans'),
+                              ('acquisitionTime', 'Acquisition time [s]'), ('completed', 'Completed')]:
+                if result[key] is not None:
+                    tip.append(name + ': ' + str(result[key]))
+            item.setToolTip('\n'.join(tip))
+        if len(results) > self.MAXRESULTS:
+            self.countLabel.setText("Showing the first " + str(self.MAXRESULTS) + " datasets")
+        else:
+            self.countLabel.setText(str(len(results)) + " datasets")
+
+    def runUpdate(self, update):
+        progressDialog = QtWidgets.QProgressDialog('Indexing...', None, 0, 0, self)
+        progressDialog.setWindowModality(QtCore.Qt.WindowModal)
+        progressDialog.setMinimumDuration(500)
+        def progress(numDirs, numDatasets):
+            progressDialog.setLabelText('Indexing... ' + str(numDirs) + ' directories, ' + str(numDatasets) + ' datasets')
+            QtWidgets.qApp.processEvents()
+        try:
+            update(progress)
+        finally:
+            progressDialog.close()
+        self.search()
+
+    def updateIndex(self):
+        self.runUpdate(self.index.updateAll)
+
+    def browse(self):
+        dirName = QtWidgets.QFileDialog.getExistingDirectory(self, 'Add Directory to the Index', self.father.lastLocation)
+        if not dirName:
+            return
+        self.father.lastLocation = dirName
+        self.runUpdate(lambda progress: self.index.update(dirName, progress))
+
+    def applyFunc(self, *args):
+        paths = [item.data(QtCore.Qt.UserRole) for item in self.resultList.selectedItems()]
+        if len(paths) == 0:
+            raise SsnakeException("Please select at least one dataset")
+        self.father.loadData(paths)
+
+    def closeEvent(self, *args):
+        self.index.close()
+        self.deleteLater()
+
+##########################################################################################
+
+
 class MonitorWindow(QtWidgets.QWidget):
 
     def __init__(self, parent):
@@ -6582,21 +6836,27 @@ class PreferenceWindow(QtWidgets.QWidget):
         tab1 = QtWidgets.QWidget()
         tab2 = QtWidgets.QWidget()
         tab3 = QtWidgets.QWidget()
+        tab4 = QtWidgets.QWidget()
         tabWidget.addTab(tab1, "Window")
         tabWidget.addTab(tab2, "Plot")
         tabWidget.addTab(tab3, "Contour")
+        tabWidget.addTab(tab4, "Processing")
         grid1 = QtWidgets.QGridLayout()
         grid2 = QtWidgets.QGridLayout()
         grid3 = QtWidgets.QGridLayout()
+        grid4 = QtWidgets.QGridLayout()
         tab1.setLayout(grid1)
         tab2.setLayout(grid2)
         tab3.setLayout(grid3)
+        tab4.setLayout(grid4)
         grid1.setColumnStretch(10, 1)
         grid1.setRowStretch(10, 1)
         grid2.setColumnStretch(10, 1)
         grid2.setRowStretch(10, 1)
         grid3.setColumnStretch(10, 1)
         grid3.setRowStretch(10, 1)
+        grid4.setColumnStretch(10, 1)
+        grid4.setRowStretch(10, 1)
         # grid1.addWidget(wc.QLabel("Window size:"), 0, 0, 1, 2)
         grid1.addWidget(wc.QLabel("Width:"), 1, 0)
         self.widthSpinBox = wc.SsnakeSpinBox()
@@ -6717,6 +6977,56 @@ class PreferenceWindow(QtWidgets.QWidget):
         self.HRSpinBox.setSingleStep(0.1)
         self.HRSpinBox.setValue(self.father.defaultHeightRatio)
         grid3.addWidget(self.HRSpinBox, 5, 1)
+        # grid4 definitions
+        grid4.addWidget(QtWidgets.QLabel("Undo memory [MB]:"), 0, 0)
+        self.undoBudgetSpinBox = wc.SsnakeSpinBox()
+        self.undoBudgetSpinBox.setMaximum(1000000)
+        self.undoBudgetSpinBox.setMinimum(0)
+        self.undoBudgetSpinBox.setSpecialValueText("No limit")
+        self.undoBudgetSpinBox.setValue(self.father.defaultUndoBudget)
+        grid4.addWidget(self.undoBudgetSpinBox, 0, 1)
+        self.undoCompressCheck = QtWidgets.QCheckBox("Compress undo data on disk")
+        self.undoCompressCheck.setChecked(self.father.defaultUndoCompress)
+        grid4.addWidget(self.undoCompressCheck, 1, 0, 1, 2)
+        grid4.addWidget(QtWidgets.QLabel("FFT backend:"), 2, 0)
+        self.fftBackendEntry = QtWidgets.QComboBox(self)
+        self.fftBackendEntry.addItems(fftb.BACKENDLIST)
+        self.fftBackendEntry.setCurrentIndex(fftb.BACKENDLIST.index(self.father.defaultFftBackend))
+        grid4.addWidget(self.fftBackendEntry, 2, 1)
+        grid4.addWidget(QtWidgets.QLabel("FFT threads:"), 3, 0)
+        self.fftWorkersSpinBox = wc.SsnakeSpinBox()
+        self.fftWorkersSpinBox.setMaximum(1024)
+        self.fftWorkersSpinBox.setMinimum(0)
+        self.fftWorkersSpinBox.setSpecialValueText("All cores")
+        self.fftWorkersSpinBox.setValue(self.father.defaultFftWorkers)
+        grid4.addWidget(self.fftWorkersSpinBox, 3, 1)
+        self.singlePrecisionCheck = QtWidgets.QCheckBox("Single precision data (new data only)")
+        self.singlePrecisionCheck.setChecked(self.father.defaultSinglePrecision)
+        grid4.addWidget(self.singlePrecisionCheck, 4, 0, 1, 2)
+        grid4.addWidget(QtWidgets.QLabel("Chunk size [MB]:"), 5, 0)
+        self.chunkSizeSpinBox = wc.SsnakeSpinBox()
+        self.chunkSizeSpinBox.setMaximum(1000000)
+        self.chunkSizeSpinBox.setMinimum(0)
+        self.chunkSizeSpinBox.setSpecialValueText("No chunks")
+        self.chunkSizeSpinBox.setValue(self.father.defaultChunkSize)
+        grid4.addWidget(self.chunkSizeSpinBox, 5, 1)
+        self.chunkToDiskCheck = QtWidgets.QCheckBox("Store results of chunked processing on disk")
+        self.chunkToDiskCheck.setChecked(self.father.defaultChunkToDisk)
+        grid4.addWidget(self.chunkToDiskCheck, 6, 0, 1, 2)
+        grid4.addWidget(QtWidgets.QLabel("NUS worker processes:"), 7, 0)
+        self.nusWorkersSpinBox = wc.SsnakeSpinBox()
+        self.nusWorkersSpinBox.setMaximum(1024)
+        self.nusWorkersSpinBox.setMinimum(0)
+        self.nusWorkersSpinBox.setSpecialValueText("All cores")
+        self.nusWorkersSpinBox.setValue(self.father.defaultNusWorkers)
+        grid4.addWidget(self.nusWorkersSpinBox, 7, 1)
+        grid4.addWidget(QtWidgets.QLabel("NUS traces per task:"), 8, 0)
+        self.nusChunkSpinBox = wc.SsnakeSpinBox()
+        self.nusChunkSpinBox.setMaximum(1000000)
+        self.nusChunkSpinBox.setMinimum(0)
+        self.nusChunkSpinBox.setSpecialValueText("Automatic")
+        self.nusChunkSpinBox.setValue(self.father.defaultNusChunkSize)
+        grid4.addWidget(self.nusChunkSpinBox, 8, 1)
         layout = QtWidgets.QGridLayout(self)
         layout.addWidget(tabWidget, 0, 0, 1, 4)
         cancelButton = QtWidgets.QPushButton("&Cancel")
@@ -6780,6 +7090,15 @@ class PreferenceWindow(QtWidgets.QWidget):
         self.father.defaultNegColor = self.negColor
         self.father.defaultWidthRatio = self.WRSpinBox.value()
         self.father.defaultHeightRatio = self.HRSpinBox.value()
+        self.father.defaultUndoBudget = self.undoBudgetSpinBox.value()
+        self.father.defaultUndoCompress = self.undoCompressCheck.isChecked()
+        self.father.defaultFftBackend = self.fftBackendEntry.currentText()
+        self.father.defaultFftWorkers = self.fftWorkersSpinBox.value()
+        self.father.defaultSinglePrecision = self.singlePrecisionCheck.isChecked()
+        self.father.defaultChunkSize = self.chunkSizeSpinBox.value()
+        self.father.defaultChunkToDisk = self.chunkToDiskCheck.isChecked()
+        self.father.defaultNusWorkers = self.nusWorkersSpinBox.value()
+        self.father.defaultNusChunkSize = self.nusChunkSpinBox.value()
         self.father.saveDefaults()
         self.closeEvent()
 
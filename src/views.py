@@ -25,6 +25,7 @@ import matplotlib.ticker as ticker
 import spectrum as sc
 from spectrumFrame import PlotFrame
 import reimplement as reim
+import functions as func
 
 COLORMAPLIST = ['seismic', 'BrBG', 'bwr', 'coolwarm', 'PiYG', 'PRGn', 'PuOr',
                 'RdBu', 'RdGy', 'RdYlBu', 'RdYlGn', 'Spectral', 'rainbow', 'jet']
@@ -402,9 +403,9 @@ class Current1D(PlotFrame):
                 self.xmaxlim = self.xmaxlim + (oldref - ref) / 10**(val * 3)
         self.showFid()
 
-    def regrid(self, limits, numPoints):
-        self.root.addMacro(['regrid', (limits, numPoints, self.axes[-1] - self.data.ndim())])
-        self.data.regrid(limits, numPoints, self.axes[-1])
+    def regrid(self, limits, numPoints, method='linear'):
+        self.root.addMacro(['regrid', (limits, numPoints, self.axes[-1] - self.data.ndim(), method)])
+        self.data.regrid(limits, numPoints, self.axes[-1], method)
         self.upd()
         self.showFid()
         self.plotReset()
@@ -555,11 +556,13 @@ class Current1D(PlotFrame):
 
     def lpsvd(self, nPredict, maxFreq, forward, numPoints):
         self.root.addMacro(['lpsvd', (nPredict, maxFreq, forward, numPoints, self.axes[-1] - self.data.ndim())])
-        self.data.lpsvd(nPredict, maxFreq, forward, numPoints, self.axes[-1])
+        failed = self.data.lpsvd(nPredict, maxFreq, forward, numPoints, self.axes[-1])
         self.upd()
         self.showFid()
         if not self.spec():
             self.plotReset(True, False)
+        if failed:
+            self.root.father.dispMsg("LPSVD: prediction failed for " + str(len(failed)) + " traces, these are zero filled", 'red')
 
     def setSpec(self, val):  # change from time to freq domain of the actual data
         self.root.addMacro(['setSpec', (val, self.axes[-1] - self.data.ndim())])
@@ -617,9 +620,9 @@ class Current1D(PlotFrame):
         self.showFid()
         self.upd()
 
-    def align(self, pos1, pos2):
-        self.root.addMacro(['align', (pos1, pos2, self.axes[-1] - self.data.ndim())])
-        self.data.align(pos1, pos2, self.axes[-1])
+    def align(self, pos1, pos2, method='maximum'):
+        self.root.addMacro(['align', (pos1, pos2, self.axes[-1] - self.data.ndim(), method)])
+        self.data.align(pos1, pos2, self.axes[-1], method)
         self.upd()
         self.showFid()
 
@@ -637,12 +640,13 @@ class Current1D(PlotFrame):
         self.showFid()
         self.upd()
 
-    def baselinePolyFit(self, x, data, bArray, degree):
-        import numpy.polynomial.polynomial as poly
-        polyCoeff = poly.polyfit(x[bArray], data[bArray], degree)
-        return poly.polyval(x, polyCoeff)
+    def baselineFit(self, x, data, bArray, degree, method='polynomial', lam=1e5, p=0.01):
+        # The baseline of the displayed part of the data (real, imaginary or absolute)
+        if method == 'polynomial':
+            return np.real(self.getDataType(func.baselinePolynomial(x, data[np.newaxis], bArray, degree)[0]))
+        return func.baselineBlock(np.real(self.getDataType(data))[np.newaxis], method, bArray, lam, p, 10)[0]
 
-    def baselineCorrectionAll(self, degree, removeList, select=False, invert=False):
+    def baselineCorrectionAll(self, degree, removeList, select=False, invert=False, method='polynomial', lam=1e5, p=0.01):
         tmpAx = np.arange(self.len())
         bArray = np.array([True] * self.len())
         for i in range(int(np.floor(len(removeList) / 2.0))):
@@ -651,12 +655,12 @@ class Current1D(PlotFrame):
             bArray = np.logical_and(bArray, np.logical_or((tmpAx < minVal), (tmpAx > maxVal)))
         if invert:
             bArray = np.logical_not(bArray)
-        y = np.apply_along_axis(lambda data: self.baselinePolyFit(self.xax(), data, bArray, degree), self.axes[-1], self.data.getHyperData(0))
-        y = np.real(self.getDataType(y))
-        self.root.addMacro(['subtract', (y)])
-        self.data.subtract(y)
+        axis = self.axes[-1] - self.data.ndim()
+        plotType = self.viewSettings["plotType"]
+        self.root.addMacro(['baselineCorrectionAll', (bArray, axis, method, degree, lam, p, 10, plotType)])
+        self.data.baselineCorrectionAll(bArray, axis, method, degree, lam, p, 10, plotType)
 
-    def baselineCorrection(self, degree, removeList, select=False, invert=False):
+    def baselineCorrection(self, degree, removeList, select=False, invert=False, method='polynomial', lam=1e5, p=0.01):
         if select:
             selectSlice = self.getSelect()
         else:
@@ -671,12 +675,11 @@ class Current1D(PlotFrame):
             bArray = np.logical_and(bArray, np.logical_or((tmpAx < minVal), (tmpAx > maxVal)))
         if invert:
             bArray = np.logical_not(bArray)
-        y = self.baselinePolyFit(self.xax(), tmpData, bArray, degree)
-        y = np.real(self.getDataType(y))
+        y = self.baselineFit(self.xax(), tmpData, bArray, degree, method, lam, p)
         self.root.addMacro(['baselineCorrection', (y, self.axes[-1] - self.data.ndim(), selectSlice)])
         self.data.baselineCorrection(y, self.axes[-1], select=selectSlice)
 
-    def previewBaselineCorrection(self, degree, removeList, invert=False):
+    def previewBaselineCorrection(self, degree, removeList, invert=False, method='polynomial', lam=1e5, p=0.01):
         tmpData = self.data1D.getHyperData(0)
         tmpData = tmpData[(0,)*(self.ndim()-1) + (slice(None), )]
         tmpAx = np.arange(self.len())
@@ -687,8 +690,7 @@ class Current1D(PlotFrame):
             bArray = np.logical_and(bArray, np.logical_or((tmpAx < minVal), (tmpAx > maxVal)))
         if invert:
             bArray = np.logical_not(bArray)
-        y = self.baselinePolyFit(self.xax(), tmpData, bArray, degree)
-        y = np.real(self.getDataType(y))
+        y = self.baselineFit(self.xax(), tmpData, bArray, degree, method, lam, p)
         self.resetPreviewRemoveList()
         if self.NDIM_PLOT > 1:
             if isinstance(self, CurrentContour):
@@ -934,9 +936,12 @@ class Current1D(PlotFrame):
         self.upd()
         self.showFid()
 
-    def ist(self, posList, typeVal, threshold, maxIter, tracelimit):
-        self.root.addMacro(['ist', (posList, typeVal, self.axes[-1] - self.data.ndim(), threshold, maxIter, tracelimit)])
-        self.data.ist(posList, typeVal, self.axes[-1], threshold, maxIter, tracelimit)
+    def ist(self, posList, typeVal, threshold, maxIter, tracelimit, axis2=None):
+        if axis2 is None:
+            self.root.addMacro(['ist', (posList, typeVal, self.axes[-1] - self.data.ndim(), threshold, maxIter, tracelimit)])
+        else:
+            self.root.addMacro(['ist', (posList, typeVal, self.axes[-1] - self.data.ndim(), threshold, maxIter, tracelimit, axis2 - self.data.ndim())])
+        self.data.ist(posList, typeVal, self.axes[-1], threshold, maxIter, tracelimit, axis2)
         self.upd()
         self.showFid()
 
@@ -19,6 +19,7 @@
 
 from safeEval import safeEval
 import os
+import specIO as io
 from ssNake import QtGui, QtCore, QtWidgets, QT
 
 class SsnakeTabs(QtWidgets.QTabWidget):
@@ -97,6 +98,37 @@ class SsnakeTreeWidget(QtWidgets.QTreeView):
 
     def loadAct(self,path):
         self.father.loadData(path)
+
+    def viewportEvent(self, event):
+        # Show the size and parameters of data files as tooltip, only the headers are read
+        if event.type() == QtCore.QEvent.ToolTip:
+            index = self.indexAt(event.pos())
+            text = None
+            if index.isValid():
+                text = self.probeText(self.dirmodel.filePath(index))
+            if text:
+                QtWidgets.QToolTip.showText(event.globalPos(), text, self)
+            else:
+                QtWidgets.QToolTip.hideText()
+            return True
+        return super(SsnakeTreeWidget, self).viewportEvent(event)
+
+    def probeText(self, path):
+        try:
+            info = io.probe(path, allowLoad=False)
+        except Exception:
+            return None
+        if info is None or info['shape'] is None:
+            return None
+        text = info['format'] + ' data, ' + ' x '.join([str(x) for x in info['shape']]) + ' points'
+        if len(info['hyper']) > 1:
+            text += ' (hypercomplex)'
+        for i, sw in enumerate(info['sw']):
+            text += '\nD' + str(i + 1) + ': ' + ['time', 'spectrum'][info['spec'][i]] + ', sw = ' + str(sw) + ' Hz, freq = ' + str(info['freq'][i] * 1e-6) + ' MHz'
+        for key in sorted(info['metaData'].keys()):
+            if info['metaData'][key] != '-':
+                text += '\n' + key + ': ' + info['metaData'][key]
+        return text
         
 class SsnakeSlider(QtWidgets.QSlider):
     def wheelEvent(self, event):
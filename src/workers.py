@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+# Copyright 2016 - 2019 Bas van Meerten and Wouter Franssen
+
+# This file is part of ssNake.
+#
+# ssNake is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# ssNake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with ssNake. If not, see <http://www.gnu.org/licenses/>.
+
+import atexit
+import multiprocessing
+import numpy as np
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+#########################################################################
+# A persistent pool of worker processes for trace-wise calculations.
+# The pool is started on first use and reused until the number of workers
+# changes or shutdown is called. The traces are passed to the workers via
+# shared memory when it is available (python 3.8 and higher), otherwise
+# the blocks of traces are pickled.
+
+WORKERS = None # Number of worker processes, None uses all cpu cores
+CHUNKSIZE = None # Number of traces per task, None for automatic
+
+pool = None
+poolSize = None
+
+
+def setWorkers(num):
+    global WORKERS
+    if num is not None and num <= 0:
+        num = None
+    WORKERS = num
+    if pool is not None and poolSize != numWorkers():
+        shutdown()
+
+
+def setChunkSize(num):
+    global CHUNKSIZE
+    if num is not None and num <= 0:
+        num = None
+    CHUNKSIZE = num
+
+
+def numWorkers():
+    if WORKERS is None:
+        return multiprocessing.cpu_count()
+    return WORKERS
+
+
+def getPool():
+    global pool, poolSize
+    if pool is None:
+        poolSize = numWorkers()
+        pool = multiprocessing.Pool(poolSize)
+    return pool
+
+
+def shutdown():
+    global pool, poolSize
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+    pool = None
+    poolSize = None
+
+
+atexit.register(shutdown)
+
+
+def blockRanges(nTraces, chunkSize=None):
+    if chunkSize is None:
+        chunkSize = CHUNKSIZE
+    if chunkSize is None:
+        # A few tasks per worker to balance the load
+        chunkSize = int(np.ceil(nTraces / (4.0 * numWorkers())))
+    chunkSize = max(1, chunkSize)
+    return [(start, min(start + chunkSize, nTraces)) for start in range(0, nTraces, chunkSize)]
+
+
+def sharedArray(shape, dtype):
+    dtype = np.dtype(dtype)
+    size = max(1, int(np.prod(shape)) * dtype.itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def attachShared(name):
+    # Only the process that creates the shared memory should remove it
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError: # Before python 3.13
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def sharedBlock(inp):
+    # Runs in the worker: calculates a block of traces from the shared input
+    # and writes it to the shared output
+    func, inDesc, outDesc, start, stop, args = inp
+    inShm = attachShared(inDesc[0])
+    outShm = attachShared(outDesc[0])
+    try:
+        inData = np.ndarray(inDesc[1], dtype=inDesc[2], buffer=inShm.buf)
+        outData = np.ndarray(outDesc[1], dtype=outDesc[2], buffer=outShm.buf)
+        outData[start:stop] = func(np.array(inData[start:stop]), *args)
+        del inData, outData
+    finally:
+        inShm.close()
+        outShm.close()
+
+
+def pickledBlock(inp):
+    func, data, args = inp
+    return func(data, *args)
+
+
+def mapTraces(func, data, args=(), dtype=None, chunkSize=None, outWidth=None):
+    # Calls func(block, *args) on blocks of traces (the rows of data) in the worker pool.
+    # func should be a module level function that returns the processed block with the same shape,
+    # or with rows of length outWidth when this is given.
+    data = np.asarray(data)
+    if dtype is None:
+        dtype = data.dtype
+    if outWidth is None:
+        outShape = data.shape
+    else:
+        outShape = (data.shape[0], outWidth)
+    ranges = blockRanges(data.shape[0], chunkSize)
+    workPool = getPool()
+    if shared_memory is None:
+        result = workPool.map(pickledBlock, [(func, data[start:stop], args) for start, stop in ranges])
+        return np.concatenate(result).astype(dtype, copy=False)
+    inShm, inData = sharedArray(data.shape, data.dtype)
+    outShm, outData = sharedArray(outShape, dtype)
+    try:
+        inData[...] = data
+        inDesc = (inShm.name, data.shape, data.dtype.str)
+        outDesc = (outShm.name, outShape, np.dtype(dtype).str)
+        workPool.map(sharedBlock, [(func, inDesc, outDesc, start, stop, args) for start, stop in ranges])
+        result = np.array(outData)
+    finally:
+        del inData, outData
+        inShm.close()
+        inShm.unlink()
+        outShm.close()
+        outShm.unlink()
+    return result